@@ -1,9 +1,10 @@
 import streamlit as st
-from database import load_full_db
-from utils import cop, cash_bank_balances, credit_saldo
+from database import lazy_db, begin_trace, header_metrics
+from utils import cop
 from tabs import (
     render_inventory, render_purchases, render_sales, render_fiados,
-    render_investor, render_reports, render_suppliers, render_cash_bank, render_settings
+    render_investor, render_reports, render_suppliers, render_cash_bank, render_settings,
+    render_performance
 )
 
 # Cargar CSS personalizado
@@ -43,27 +44,23 @@ st.markdown("""
 
 st.markdown("---")
 
-# Cargar DB
+# Consultas de esta ejecución (panel "Performance" de la barra lateral)
+trace = begin_trace()
+
+# Cargar DB (cada tabla se descarga la primera vez que se lee)
 try:
-    db = load_full_db()
+    db = lazy_db()
 except Exception as e:
     st.error(f"Error al cargar la base de datos: {e}")
     st.stop()
 
-# Migración: asegurar campos nuevos
-for p in db.get("inventory", []):
-    if "inv" not in p:
-        p["inv"] = True
-
-for s in db.get("sales", []):
-    if "inv" not in s:
-        s["inv"] = None
-
 # ==================== MÉTRICAS SUPERIORES ====================
 try:
-    caja, banco = cash_bank_balances(db)
-    stock_cost = sum((p.get("cost", 0) or 0) * (p.get("stock", 0) or 0) for p in db["inventory"])
-    total_cobrar = sum(credit_saldo(c) for c in db["credits"])
+    # Totales calculados en el servidor (sql/header_metrics.sql), sin descargar las tablas
+    metrics = header_metrics(db)
+    caja, banco = metrics["cash"], metrics["bank"]
+    stock_cost = metrics["inventory_value"]
+    total_cobrar = metrics["receivable"]
 
     # Mostrar métricas en tarjetas
     col1, col2, col3, col4 = st.columns(4)
@@ -93,7 +90,7 @@ try:
         )
 
     with col4:
-        clientes_con_deuda = len([c for c in db['credits'] if credit_saldo(c) > 0])
+        clientes_con_deuda = metrics["open_credits"]
         st.metric(
             label="Por Cobrar",
             value=cop(total_cobrar),
@@ -106,45 +103,32 @@ except Exception as e:
 st.markdown("---")
 
 # ==================== PESTAÑAS ====================
-tabs = st.tabs([
-    "Inventario", 
-    "Compras", 
-    "Ventas", 
-    "Créditos", 
-    "Inversionista",
-    "Reportes", 
-    "Proveedores", 
-    "Caja y Banco",
-    "Configuración"
-])
+# st.tabs ejecuta todas las pestañas en cada interacción; con un selector solo
+# se dibuja la sección abierta y solo se descargan las tablas que ella usa.
+SECCIONES = {
+    "Inventario": render_inventory,
+    "Compras": render_purchases,
+    "Ventas": render_sales,
+    "Créditos": render_fiados,
+    "Inversionista": render_investor,
+    "Reportes": render_reports,
+    "Proveedores": render_suppliers,
+    "Caja y Banco": render_cash_bank,
+    "Configuración": render_settings,
+}
+
+seccion = st.radio(
+    "Sección",
+    list(SECCIONES),
+    horizontal=True,
+    label_visibility="collapsed",
+    key="nav_section"
+)
 
 try:
-    with tabs[0]:
-        render_inventory(db)
-
-    with tabs[1]:
-        render_purchases(db)
-
-    with tabs[2]:
-        render_sales(db)
-
-    with tabs[3]:
-        render_fiados(db)
-
-    with tabs[4]:
-        render_investor(db)
-
-    with tabs[5]:
-        render_reports(db)
-
-    with tabs[6]:
-        render_suppliers(db)
-
-    with tabs[7]:
-        render_cash_bank(db)
-
-    with tabs[8]:
-        render_settings(db)
+    SECCIONES[seccion](db)
 except Exception as e:
     st.error(f"Error al cargar pestaña: {e}")
-    st.exception(e)
\ No newline at end of file
+    st.exception(e)
+
+render_performance(trace)
\ No newline at end of file
@@ -0,0 +1,83 @@
+# database/__init__.py
+from .connection import (
+    init_connection,
+    connection_health,
+    reset_connection
+)
+
+from .tracing import begin_trace, current_trace
+
+from .loader import TABLES, PAGE_SIZE, iter_pages
+
+from .snapshot import (
+    load_full_db,
+    current_snapshot,
+    invalidate_snapshot,
+    last_load_report,
+    local_replica
+)
+
+from .lazy import LazyDB, lazy_db
+
+from .frames import FRAME_SCHEMA, to_frame, table_frame
+
+from .models import (
+    Record,
+    InventoryItem,
+    Purchase,
+    Sale,
+    Credit,
+    InvestorMovement,
+    CreditPayment,
+    SupplierCredit,
+    SupplierPayment,
+    RECORD_CLASSES,
+    to_records,
+    table_records
+)
+
+from .dates import DateIndex, date_index, rows_between
+
+from .indexes import id_index, row_by_id
+
+from .parties import party_key, party_index, party_rows, open_party_credits
+
+from .search import fold, search_index, search_ids, search_products
+
+from .stock import adjust_stock
+
+from .unit_of_work import UnitOfWork
+
+from .write_queue import get_write_queue
+
+from .records import (
+    insert_record,
+    update_record,
+    delete_record,
+    update_settings,
+    save_db_sync
+)
+
+from .logo import logo_bytes, logo_hash, save_logo, remove_logo
+
+from .metrics import header_metrics, cash_balances, check_cash_balances
+
+__all__ = [
+    'init_connection', 'connection_health', 'reset_connection', 'TABLES', 'PAGE_SIZE', 'iter_pages',
+    'load_full_db', 'lazy_db', 'LazyDB', 'current_snapshot', 'invalidate_snapshot', 'last_load_report',
+    'local_replica',
+    'insert_record', 'update_record', 'delete_record',
+    'update_settings', 'save_db_sync',
+    'UnitOfWork', 'adjust_stock', 'get_write_queue',
+    'begin_trace', 'current_trace',
+    'logo_bytes', 'logo_hash', 'save_logo', 'remove_logo',
+    'header_metrics', 'cash_balances', 'check_cash_balances',
+    'FRAME_SCHEMA', 'to_frame', 'table_frame',
+    'Record', 'InventoryItem', 'Purchase', 'Sale', 'Credit', 'InvestorMovement',
+    'CreditPayment', 'SupplierCredit', 'SupplierPayment', 'RECORD_CLASSES',
+    'to_records', 'table_records',
+    'DateIndex', 'date_index', 'rows_between',
+    'id_index', 'row_by_id',
+    'party_key', 'party_index', 'party_rows', 'open_party_credits',
+    'fold', 'search_index', 'search_ids', 'search_products'
+]
@@ -0,0 +1,793 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from .loader import TABLES, SYNC_COLUMN, TOMBSTONE_TABLE
+
+# Backends locales con la misma interfaz que el cliente de Supabase
+# (conn.table(t).select(...).eq(...).order(...).limit(...).execute().data y
+# conn.rpc(nombre, params).execute().data), para correr la app, pruebas de
+# carga y de latencia sin un proyecto de Supabase.
+#
+#   MemoryBackend  datos en memoria del proceso
+#   SqliteBackend  datos en un archivo SQLite (persisten entre reinicios)
+#
+# Los dos comparten el motor de consultas, así que filtros, orden (nulos al
+# final en ascendente y al inicio en descendente, como Postgres), limit y
+# range se comportan igual en ambos (SqliteBackend resuelve en SQL, con
+# índices, lo que toca id, updated_at y la columna de orden). También imitan
+# los triggers de sql/delta_sync.sql (updated_at y lápidas) y de
+# sql/cash_balances.sql, y las funciones de sql/ que la app llama por RPC.
+# Nada aquí llama a `st`.
+
+# Tablas que existen en el esquema local y su clave primaria
+LOCAL_TABLES = {
+    "settings": "id",
+    **{table: "id" for table in TABLES},
+    TOMBSTONE_TABLE: "id",
+    "applied_batches": "key",
+    "logos": "hash",
+    "cash_balances": "medio",
+    "cash_balances_daily": ("medio", "day"),
+}
+
+# Tablas cuyos cambios mueven los saldos de cash_balances (sql/cash_balances.sql)
+_CASH_TABLES = ("sales", "credit_payments", "purchases", "supplier_payments")
+
+# Códigos de Postgres / PostgREST que la app revisa
+_UNIQUE_VIOLATION = "23505"
+_UNDEFINED_TABLE = "42P01"
+_MISSING_FUNCTION = "PGRST202"
+
+class BackendError(Exception):
+    """Error con código, como postgrest.APIError (e.code, e.message)"""
+
+    def __init__(self, code, message):
+        super().__init__(f"{{'code': '{code}', 'message': '{message}'}}")
+        self.code = code
+        self.message = message
+
+class Response:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+def _row_key(table, row):
+    """Clave primaria de la fila como texto (las compuestas unidas con '|')"""
+    pk = LOCAL_TABLES[table]
+    if isinstance(pk, tuple):
+        return "|".join(str(row.get(c)) for c in pk)
+    return str(row.get(pk))
+
+# ---------- filtros ----------
+
+def _coerce(value, target):
+    """Convierte el valor del filtro (texto en PostgREST) al tipo de la columna"""
+    if isinstance(value, bool):
+        return str(target).lower() in ("true", "t", "1") if isinstance(target, str) else bool(target)
+    if isinstance(value, (int, float)) and isinstance(target, str):
+        try:
+            return float(target)
+        except ValueError:
+            return target
+    if isinstance(value, str) and not isinstance(target, str):
+        return str(target)
+    return target
+
+_COMPARE = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+
+def _like(pattern, flags=0):
+    regex = re.compile("^" + ".*".join(re.escape(p) for p in pattern.split("%")) + "$", flags | re.DOTALL)
+    return lambda value: value is not None and regex.match(str(value)) is not None
+
+def _predicate(column, op, value):
+    """Filtro sobre una fila; NULL no cumple ninguna comparación (como en SQL)"""
+    if op in _COMPARE:
+        compare = _COMPARE[op]
+
+        def check(row):
+            current = row.get(column)
+            if current is None or value is None:
+                return False
+            try:
+                return compare(current, _coerce(current, value))
+            except TypeError:
+                return False
+        return check
+    if op == "is":
+        expected = {"null": None, "true": True, "false": False}.get(str(value).lower(), value)
+        return lambda row: row.get(column) is expected if expected is None else row.get(column) == expected
+    if op == "in":
+        values = list(value)
+        return lambda row: row.get(column) is not None and any(
+            row.get(column) == _coerce(row.get(column), v) for v in values
+        )
+    if op in ("like", "ilike"):
+        match = _like(str(value), re.IGNORECASE if op == "ilike" else 0)
+        return lambda row: match(row.get(column))
+    raise BackendError("PGRST100", f"Operador no soportado: {op}")
+
+def _split_top(expr):
+    """Separa por comas de primer nivel (fuera de paréntesis y comillas)"""
+    parts, depth, quoted, start, i = [], 0, False, 0, 0
+    while i < len(expr):
+        ch = expr[i]
+        if quoted:
+            if ch == "\\":
+                i += 1
+            elif ch == '"':
+                quoted = False
+        elif ch == '"':
+            quoted = True
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(expr[start:i])
+            start = i + 1
+        i += 1
+    parts.append(expr[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+def _parse_condition(text):
+    """
+    Condición de un or=(...) de PostgREST (col.op.valor, and(...), or(...))
+    como nodo: ("cmp", columna, op, valor) o ("and" / "or", [nodos]).
+    """
+    for group in ("and", "or"):
+        if text.startswith(group + "(") and text.endswith(")"):
+            return (group, [_parse_condition(p) for p in _split_top(text[len(group) + 1:-1])])
+    column, op, value = text.split(".", 2)
+    if op == "in":
+        return ("cmp", column, op, [_unquote(v) for v in _split_top(value.strip("()"))])
+    return ("cmp", column, op, _unquote(value))
+
+def _node_predicate(node):
+    """Filtro sobre una fila a partir de un nodo de condición"""
+    if node[0] == "cmp":
+        return _predicate(*node[1:])
+    subs = [_node_predicate(n) for n in node[1]]
+    combine = all if node[0] == "and" else any
+    return lambda row: combine(f(row) for f in subs)
+
+# ---------- orden ----------
+
+def _sort_value(value):
+    # Números antes que texto para no comparar tipos distintos
+    if isinstance(value, (int, float)):
+        return (0, value)
+    return (1, str(value))
+
+def _sort(rows, orders):
+    """Orden estable por varias columnas; nullsfirst por defecto = desc (Postgres)"""
+    for column, desc, nullsfirst in reversed(orders):
+        if nullsfirst is None:
+            nullsfirst = desc
+        nulls = [r for r in rows if r.get(column) is None]
+        values = [r for r in rows if r.get(column) is not None]
+        values.sort(key=lambda r: _sort_value(r[column]), reverse=desc)
+        rows = nulls + values if nullsfirst else values + nulls
+    return rows
+
+# ---------- consultas ----------
+
+class Query:
+    """Subconjunto del constructor de consultas de postgrest-py"""
+
+    def __init__(self, backend, table):
+        self._backend = backend
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.count = None
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.filters = []
+        # Las mismas condiciones como nodos (ver _parse_condition), para
+        # que SqliteBackend las traduzca a SQL
+        self.conditions = []
+        self.key = None
+        self.orders = []
+        self.offset = 0
+        self.max_rows = None
+
+    # ---------- acción ----------
+
+    def select(self, *columns, count=None):
+        self.columns = ",".join(columns) or "*"
+        self.count = count
+        return self
+
+    def insert(self, rows, **kwargs):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self.action, self.payload = "upsert", rows
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, data, **kwargs):
+        self.action, self.payload = "update", data
+        return self
+
+    def delete(self, **kwargs):
+        self.action = "delete"
+        return self
+
+    # ---------- filtros ----------
+
+    def filter(self, column, op, value):
+        self.filters.append(_predicate(column, op, value))
+        self.conditions.append(("cmp", column, op, value))
+        if op == "eq" and column == LOCAL_TABLES.get(self.table) and self.key is None:
+            # Búsqueda directa por clave primaria en vez de recorrer la tabla
+            self.key = str(value)
+        return self
+
+    def eq(self, column, value):
+        return self.filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self.filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self.filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self.filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self.filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self.filter(column, "lte", value)
+
+    def is_(self, column, value):
+        return self.filter(column, "is", value)
+
+    def in_(self, column, values):
+        return self.filter(column, "in", values)
+
+    def like(self, column, pattern):
+        return self.filter(column, "like", pattern)
+
+    def ilike(self, column, pattern):
+        return self.filter(column, "ilike", pattern)
+
+    def or_(self, expr):
+        node = ("or", [_parse_condition(p) for p in _split_top(expr)])
+        self.filters.append(_node_predicate(node))
+        self.conditions.append(node)
+        return self
+
+    # ---------- orden y páginas ----------
+
+    def order(self, column, desc=False, nullsfirst=None):
+        self.orders.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size):
+        self.max_rows = size
+        return self
+
+    def range(self, start, end):
+        """Filas start..end inclusive, como en PostgREST"""
+        self.offset = start
+        self.max_rows = end - start + 1
+        return self
+
+    def matches(self, row):
+        return all(f(row) for f in self.filters)
+
+    def execute(self):
+        return self._backend.execute(self)
+
+class RpcCall:
+    def __init__(self, backend, name, params):
+        self._backend = backend
+        self.name = name
+        self.params = params or {}
+
+    def execute(self):
+        return self._backend.call(self.name, self.params)
+
+# ---------- funciones SQL (sustitutos locales de sql/) ----------
+
+LOCAL_RPCS = {}
+
+def local_rpc(name):
+    """Registra el sustituto local de una función SQL llamada por RPC"""
+    def register(func):
+        LOCAL_RPCS[name] = func
+        return func
+    return register
+
+@local_rpc("adjust_stock")
+def _rpc_adjust_stock(backend, params):
+    """sql/adjust_stock.sql"""
+    from .stock import stock_after
+
+    item_id = str(params["p_item_id"])
+    rows = backend.table("inventory").select("stock").eq("id", item_id).execute().data
+    if not rows:
+        return None
+    new_stock = stock_after(rows[0].get("stock"), params["p_delta"], params.get("p_floor"))
+    backend.table("inventory").update({"stock": new_stock}).eq("id", item_id).execute()
+    return new_stock
+
+@local_rpc("apply_unit_of_work")
+def _rpc_apply_unit_of_work(backend, params):
+    """sql/unit_of_work.sql"""
+    key = params.get("idem_key")
+    if key is not None:
+        previous = backend.table("applied_batches").select("result").eq("key", key).execute().data
+        if previous:
+            return previous[0]["result"]
+    stock = {}
+    for op in params.get("ops") or []:
+        table = op.get("table")
+        if table not in TABLES and table != "settings":
+            raise BackendError("P0001", f"Tabla no permitida: {table}")
+        if op["op"] == "insert":
+            backend.table(table).upsert(op["rows"], on_conflict="id", ignore_duplicates=True).execute()
+        elif op["op"] == "update":
+            backend.table(table).update(op["data"]).eq("id", op["id"]).execute()
+        elif op["op"] == "adjust_stock":
+            stock[str(op["id"])] = _rpc_adjust_stock(backend, {
+                "p_item_id": op["id"], "p_delta": int(op["delta"]), "p_floor": op.get("floor")
+            })
+        elif op["op"] == "delete":
+            backend.table(table).delete().eq("id", op["id"]).execute()
+        else:
+            raise BackendError("P0001", f"Operación no soportada: {op['op']}")
+    result = {"stock": stock}
+    if key is not None:
+        backend.table("applied_batches").insert({"key": key, "result": result, "applied_at": _now()}).execute()
+    return result
+
+@local_rpc("header_metrics")
+def _rpc_header_metrics(backend, params):
+    """sql/header_metrics.sql (versión de sql/cash_balances.sql), con los saldos materializados"""
+    from utils import credit_saldo
+
+    balances = {r["medio"]: r["amount"] for r in backend.table("cash_balances").select("medio,amount").execute().data}
+    saldos = [credit_saldo(c) for c in backend.table("credits").select("total,paid").execute().data]
+    inventory = backend.table("inventory").select("cost,stock").execute().data
+    return {
+        "inventory_value": sum((p.get("cost") or 0) * (p.get("stock") or 0) for p in inventory),
+        "cash": balances.get("Caja", 0),
+        "bank": balances.get("Banco", 0),
+        "receivable": sum(saldos),
+        "open_credits": len([s for s in saldos if s > 0]),
+    }
+
+@local_rpc("rebuild_cash_balances")
+def _rpc_rebuild_cash_balances(backend, params):
+    """sql/cash_balances.sql"""
+    return backend.rebuild_cash_balances()
+
+# ---------- motor común ----------
+
+class LocalBackend:
+    """
+    Motor de consultas sobre un almacén de filas por tabla.
+
+    Las subclases solo guardan y leen filas (_scan, _get, _put, _remove) y
+    manejan la transacción (_begin, _commit, _rollback). Cada execute() y
+    cada RPC corre en una transacción: si algo falla no queda a medias.
+
+    `latency` (segundos) se espera antes de cada consulta para simular la
+    red en pruebas de latencia.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._next_tombstone = 0
+
+    # ---------- interfaz del cliente de Supabase ----------
+
+    def table(self, name):
+        return Query(self, name)
+
+    def from_(self, name):
+        return Query(self, name)
+
+    def rpc(self, name, params=None):
+        return RpcCall(self, name, params)
+
+    # ---------- transacciones ----------
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            self._depth += 1
+            if self._depth == 1:
+                self._begin()
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._rollback()
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._commit()
+
+    # ---------- ejecución ----------
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _check_table(self, table):
+        if table not in LOCAL_TABLES:
+            raise BackendError(_UNDEFINED_TABLE, f'relation "public.{table}" does not exist')
+
+    def call(self, name, params):
+        self._wait()
+        func = LOCAL_RPCS.get(name)
+        if func is None:
+            raise BackendError(_MISSING_FUNCTION, f"Could not find the function public.{name} in the schema cache")
+        with self.transaction():
+            return Response(func(self, params))
+
+    def execute(self, query):
+        self._wait()
+        self._check_table(query.table)
+        with self.transaction():
+            if query.action == "select":
+                return self._select(query)
+            if query.action in ("insert", "upsert"):
+                return Response(self._insert(query))
+            matched = [r for r in self._candidates(query) if query.matches(r)]
+            if query.action == "update":
+                return Response(self._update(query.table, matched, query.payload))
+            return Response(self._delete(query.table, matched))
+
+    def _candidates(self, query):
+        if query.key is not None:
+            row = self._get(query.table, query.key)
+            return [row] if row is not None else []
+        return self._scan(query.table)
+
+    def _select(self, query):
+        rows = [r for r in self._candidates(query) if query.matches(r)]
+        count = len(rows) if query.count else None
+        if query.orders:
+            rows = _sort(rows, query.orders)
+        end = None if query.max_rows is None else query.offset + query.max_rows
+        rows = rows[query.offset:end]
+        if query.columns.strip() != "*":
+            names = [c.strip() for c in query.columns.split(",") if c.strip()]
+            rows = [{c: r.get(c) for c in names} for r in rows]
+        else:
+            rows = [dict(r) for r in rows]
+        return Response(rows, count)
+
+    def _insert(self, query):
+        table = query.table
+        pk = LOCAL_TABLES[table]
+        conflict = query.on_conflict or pk
+        if isinstance(conflict, str) and "," in conflict:
+            conflict = tuple(c.strip() for c in conflict.split(","))
+        rows = query.payload if isinstance(query.payload, list) else [query.payload]
+        written = []
+        for row in rows:
+            row = dict(row)
+            if table == TOMBSTONE_TABLE and row.get(pk) is None:
+                self._next_tombstone += 1
+                row[pk] = self._next_tombstone
+            existing = self._get(table, _row_key(table, row)) if conflict == pk else next(
+                (r for r in self._scan(table) if r.get(conflict) == row.get(conflict)), None
+            )
+            if existing is not None:
+                if query.action == "insert":
+                    raise BackendError(_UNIQUE_VIOLATION, f'duplicate key value violates unique constraint "{table}_pkey"')
+                if query.ignore_duplicates:
+                    continue
+                row = {**existing, **row}
+            if table in TABLES:
+                row[SYNC_COLUMN] = _now()
+            self._put(table, _row_key(table, row), row)
+            self._after_write(table, existing, row)
+            written.append(dict(row))
+        return written
+
+    def _update(self, table, rows, data):
+        updated = []
+        for old in rows:
+            row = {**old, **data}
+            if table in TABLES:
+                row[SYNC_COLUMN] = _now()
+            self._put(table, _row_key(table, row), row)
+            self._after_write(table, old, row)
+            updated.append(dict(row))
+        return updated
+
+    def _delete(self, table, rows):
+        for row in rows:
+            key = _row_key(table, row)
+            self._remove(table, key)
+            self._after_write(table, row, None)
+            if table in TABLES:
+                # Trigger record_deletion de sql/delta_sync.sql
+                self._insert(Query(self, TOMBSTONE_TABLE).insert({
+                    "table_name": table, "record_id": key, "deleted_at": _now()
+                }))
+        return [dict(r) for r in rows]
+
+    # ---------- triggers ----------
+
+    def _after_write(self, table, old, new):
+        """Trigger cash_balances_trigger: resta la fila vieja y suma la nueva"""
+        if table not in _CASH_TABLES:
+            return
+        from utils.finance import cash_delta
+
+        for row, sign in ((old, -1), (new, 1)):
+            delta = cash_delta(table, row) if row is not None else None
+            if delta is None or not delta[2]:
+                continue
+            medio, day, amount = delta
+            total = self._get("cash_balances", medio) or {"medio": medio, "amount": 0}
+            self._put("cash_balances", medio, {**total, "amount": total["amount"] + sign * amount, "updated_at": _now()})
+            daily = self._get("cash_balances_daily", f"{medio}|{day}") or {"medio": medio, "day": day, "amount": 0}
+            self._put("cash_balances_daily", f"{medio}|{day}", {**daily, "amount": daily["amount"] + sign * amount})
+
+    def rebuild_cash_balances(self):
+        """rebuild_cash_balances() de sql/cash_balances.sql"""
+        from utils.finance import cash_delta
+
+        with self.transaction():
+            before = {r["medio"]: r["amount"] for r in self._scan("cash_balances")}
+            for table in ("cash_balances", "cash_balances_daily"):
+                for row in self._scan(table):
+                    self._remove(table, _row_key(table, row))
+            totals, daily = {}, {}
+            for table in _CASH_TABLES:
+                for row in self._scan(table):
+                    delta = cash_delta(table, row)
+                    if delta is None:
+                        continue
+                    medio, day, amount = delta
+                    totals[medio] = totals.get(medio, 0) + amount
+                    daily[(medio, day)] = daily.get((medio, day), 0) + amount
+            for (medio, day), amount in daily.items():
+                self._put("cash_balances_daily", f"{medio}|{day}", {"medio": medio, "day": day, "amount": amount})
+            for medio, amount in totals.items():
+                self._put("cash_balances", medio, {"medio": medio, "amount": amount, "updated_at": _now()})
+            return {"before": before, "after": totals}
+
+class MemoryBackend(LocalBackend):
+    """Tablas en diccionarios del proceso; se pierden al reiniciar"""
+
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self._tables = {table: {} for table in LOCAL_TABLES}
+        self._undo = None
+
+    def _scan(self, table):
+        return list(self._tables[table].values())
+
+    def _get(self, table, key):
+        return self._tables[table].get(key)
+
+    def _put(self, table, key, row):
+        self._undo.append((table, key, self._tables[table].get(key)))
+        self._tables[table][key] = row
+
+    def _remove(self, table, key):
+        self._undo.append((table, key, self._tables[table].get(key)))
+        self._tables[table].pop(key, None)
+
+    def _begin(self):
+        self._undo = []
+
+    def _commit(self):
+        self._undo = None
+
+    def _rollback(self):
+        for table, key, previous in reversed(self._undo):
+            if previous is None:
+                self._tables[table].pop(key, None)
+            else:
+                self._tables[table][key] = previous
+        self._undo = None
+
+# Columnas que SqliteBackend indexa (índices sobre json_extract) y puede
+# filtrar y ordenar en SQL: id, updated_at y la columna de orden de cada
+# tabla de datos, y la fecha de las lápidas. Se comparan como texto, igual
+# que en Postgres, donde son text, date o timestamptz.
+_SQL_KEYS = {
+    **{table: ("id", SYNC_COLUMN, order[0]) for table, order in TABLES.items()},
+    TOMBSTONE_TABLE: ("deleted_at",),
+}
+
+# Operadores de PostgREST con equivalente directo en SQL
+_SQL_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+def _json_column(column):
+    return f"json_extract(data, '$.{column}')"
+
+class SqliteBackend(LocalBackend):
+    """
+    Tablas en un archivo SQLite, cada fila guardada como JSON por su clave.
+
+    Las condiciones sobre las columnas de _SQL_KEYS se resuelven en SQL con
+    sus índices; si toda la consulta se puede traducir (filtros y orden),
+    también el orden, limit y offset, y solo se decodifican las filas que se
+    devuelven. Lo demás lo termina el motor común en Python.
+    """
+
+    def __init__(self, path, latency=0.0):
+        super().__init__(latency)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("pragma journal_mode=wal")
+        for table in LOCAL_TABLES:
+            self._db.execute(f'create table if not exists "{table}" (pk text primary key, data text not null)')
+        for table, columns in _SQL_KEYS.items():
+            for column in columns:
+                self._db.execute(
+                    f'create index if not exists "{table}_{column}" on "{table}" ({_json_column(column)})'
+                )
+            if table in TABLES:
+                # Orden de las cargas por páginas (loader.iter_pages): (columna de orden, id)
+                column = TABLES[table][0]
+                self._db.execute(
+                    f'create index if not exists "{table}_{column}_id" on "{table}" '
+                    f'({_json_column(column)}, {_json_column("id")})'
+                )
+        self._next_tombstone = self._db.execute(
+            f'select coalesce(max(cast(pk as integer)), 0) from "{TOMBSTONE_TABLE}"'
+        ).fetchone()[0]
+
+    # ---------- traducción a SQL ----------
+
+    def _sql_condition(self, table, node, params):
+        """Nodo de condición como SQL (agrega sus parámetros), o None si no se puede"""
+        if node[0] in ("and", "or"):
+            local = []
+            parts = [self._sql_condition(table, n, local) for n in node[1]]
+            if not parts or None in parts:
+                return None
+            params.extend(local)
+            return "(" + f" {node[0]} ".join(parts) + ")"
+        _, column, op, value = node
+        if column not in _SQL_KEYS.get(table, ()):
+            return None
+        expr = _json_column(column)
+        if op == "is" and str(value).lower() == "null":
+            return f"{expr} is null"
+        if op in _SQL_OPS and isinstance(value, str):
+            params.append(value)
+            return f"{expr} {_SQL_OPS[op]} ?"
+        if op == "in" and value and all(isinstance(v, str) for v in value):
+            params.extend(value)
+            return f"{expr} in ({', '.join('?' * len(value))})"
+        return None
+
+    def _sql_where(self, query):
+        """
+        Condiciones de la consulta que se resuelven en SQL.
+
+        Returns:
+            tuple: (cláusula where o "", parámetros, True si entraron todas)
+        """
+        parts, params = [], []
+        for node in query.conditions:
+            sql = self._sql_condition(query.table, node, params)
+            if sql is not None:
+                parts.append(sql)
+        where = f" where {' and '.join(parts)}" if parts else ""
+        return where, params, len(parts) == len(query.conditions)
+
+    def _sql_order(self, query):
+        """order by equivalente a _sort, o None si alguna columna no está en _SQL_KEYS"""
+        keys = _SQL_KEYS.get(query.table, ())
+        terms = []
+        for column, desc, nullsfirst in query.orders:
+            if column not in keys:
+                return None
+            if nullsfirst is None:
+                nullsfirst = desc
+            terms.append(
+                f"{_json_column(column)} {'desc' if desc else 'asc'} nulls {'first' if nullsfirst else 'last'}"
+            )
+        if not terms or query.orders[-1][0] != LOCAL_TABLES[query.table]:
+            # Desempate por orden de llegada, como el orden estable de _sort
+            terms.append("rowid")
+        return " order by " + ", ".join(terms)
+
+    def _candidates(self, query):
+        if query.key is not None:
+            return super()._candidates(query)
+        where, params, _ = self._sql_where(query)
+        if not where:
+            return self._scan(query.table)
+        sql = f'select data from "{query.table}"{where} order by rowid'
+        return [json.loads(d) for (d,) in self._db.execute(sql, params)]
+
+    def _select(self, query):
+        where, params, complete = self._sql_where(query)
+        order = self._sql_order(query)
+        if query.key is not None or not complete or order is None:
+            return super()._select(query)
+        table = query.table
+        count = None
+        if query.count:
+            count = self._db.execute(f'select count(*) from "{table}"{where}', params).fetchone()[0]
+        limit = -1 if query.max_rows is None else query.max_rows
+        sql = f'select data from "{table}"{where}{order} limit ? offset ?'
+        rows = [json.loads(d) for (d,) in self._db.execute(sql, [*params, limit, query.offset])]
+        if query.columns.strip() != "*":
+            names = [c.strip() for c in query.columns.split(",") if c.strip()]
+            rows = [{c: r.get(c) for c in names} for r in rows]
+        return Response(rows, count)
+
+    # ---------- almacenamiento ----------
+
+    def _scan(self, table):
+        return [json.loads(d) for (d,) in self._db.execute(f'select data from "{table}" order by rowid')]
+
+    def _get(self, table, key):
+        row = self._db.execute(f'select data from "{table}" where pk = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put(self, table, key, row):
+        self._db.execute(
+            f'insert into "{table}" (pk, data) values (?, ?) on conflict (pk) do update set data = excluded.data',
+            (key, json.dumps(row, default=str))
+        )
+
+    def _remove(self, table, key):
+        self._db.execute(f'delete from "{table}" where pk = ?', (key,))
+
+    def _begin(self):
+        self._db.execute("begin")
+
+    def _commit(self):
+        self._db.execute("commit")
+
+    def _rollback(self):
+        self._db.execute("rollback")
+
+def open_backend(kind, path=None, latency=0.0):
+    """
+    Crea un backend local.
+
+    Args:
+        kind: "memory" o "sqlite"
+        path: archivo de SQLite (solo "sqlite")
+        latency: segundos de espera simulada por consulta
+    """
+    if kind == "memory":
+        return MemoryBackend(latency)
+    if kind == "sqlite":
+        return SqliteBackend(path, latency)
+    raise ValueError(f"Backend desconocido: {kind}")
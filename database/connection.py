@@ -0,0 +1,189 @@
+import threading
+import time
+import httpx
+import streamlit as st
+from supabase import create_client, ClientOptions
+from .backends import open_backend
+from .tracing import TracedClient, configure_log
+
+# Tiempo máximo por consulta a Supabase (segundos). Se puede cambiar con el secreto SUPABASE_TIMEOUT
+DEFAULT_TIMEOUT_SECONDS = 10
+
+# Si el cliente lleva más de este tiempo sin usarse se verifica antes de entregarlo
+HEALTH_CHECK_IDLE_SECONDS = 60
+
+# Backend por defecto (secreto DB_BACKEND): "supabase", "memory" o "sqlite"
+DEFAULT_BACKEND = "supabase"
+DEFAULT_SQLITE_PATH = "local_db.sqlite3"
+
+# Log rotativo de consultas si no se configura PERF_LOG_PATH (vacío lo desactiva)
+DEFAULT_PERF_LOG_PATH = "perf_log.jsonl"
+
+# Errores de PostgREST cuando no logra hablar con la base de datos
+_TRANSIENT_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003"}
+
+# Tabla inexistente: Postgres (42P01) o la caché de esquema de PostgREST (PGRST205)
+_MISSING_TABLE_CODES = {"42P01", "PGRST205"}
+
+class ClientRegistry:
+    """
+    Clientes de Supabase reutilizados por todo el proceso.
+
+    Cada cliente mantiene su propia sesión HTTP con conexiones keep-alive, así que
+    reutilizarlo evita volver a leer secretos y abrir conexiones en cada escritura.
+
+    Los backends locales (database.backends) se registran igual, pero reset()
+    no los descarta: tienen los datos y no hay conexión que se caiga.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._local = {}
+        self._last_used = {}
+        self._default = None
+        self._last_args = None
+
+    def connect(self, url, key, timeout=DEFAULT_TIMEOUT_SECONDS):
+        """Devuelve el cliente para (url, key), creándolo la primera vez"""
+        with self._lock:
+            client = self._clients.get((url, key))
+            if client is None:
+                options = ClientOptions(postgrest_client_timeout=timeout)
+                client = TracedClient(create_client(url, key, options=options))
+                self._clients[(url, key)] = client
+            self._default = (url, key)
+            self._last_args = (url, key, timeout)
+            self._last_used[(url, key)] = time.monotonic()
+            return client
+
+    def connect_local(self, kind, path=None, latency=0.0):
+        """Devuelve el backend local (memory/sqlite), creándolo la primera vez"""
+        with self._lock:
+            ident = ("local", kind, path)
+            client = self._local.get(ident)
+            if client is None:
+                client = TracedClient(open_backend(kind, path, latency))
+                self._local[ident] = client
+            self._clients[ident] = client
+            self._default = ident
+            self._last_args = ident
+            self._last_used[ident] = time.monotonic()
+            return client
+
+    def reconnect(self):
+        """Cliente vigente, o uno nuevo con los últimos datos de conexión (hilos de fondo)"""
+        client = self.default()
+        if client is None and self._last_args is not None:
+            if self._last_args[0] == "local":
+                client = self.connect_local(*self._last_args[1:])
+            else:
+                client = self.connect(*self._last_args)
+        return client
+
+    def default(self):
+        """Último cliente entregado, verificado si estuvo inactivo mucho tiempo"""
+        with self._lock:
+            ident = self._default
+            if ident is None:
+                return None
+            client = self._clients.get(ident)
+            idle = time.monotonic() - self._last_used.get(ident, 0)
+        if client is None:
+            return None
+        if idle > HEALTH_CHECK_IDLE_SECONDS and not self.health_check(client)["ok"]:
+            self.reset()
+            return None
+        with self._lock:
+            self._last_used[ident] = time.monotonic()
+        return client
+
+    def health_check(self, client=None):
+        """Consulta mínima contra Supabase; devuelve estado y latencia"""
+        if client is None:
+            with self._lock:
+                client = self._clients.get(self._default) if self._default else None
+        if client is None:
+            return {"ok": False, "ms": None, "error": "Sin conexión"}
+        t0 = time.perf_counter()
+        try:
+            client.table("settings").select("id").limit(1).execute()
+            return {"ok": True, "ms": (time.perf_counter() - t0) * 1000, "error": None}
+        except Exception as e:
+            return {"ok": False, "ms": (time.perf_counter() - t0) * 1000, "error": str(e)}
+
+    def reset(self):
+        """Descarta los clientes; el próximo uso abre conexiones nuevas"""
+        with self._lock:
+            self._clients.clear()
+            self._last_used.clear()
+            self._default = None
+
+@st.cache_resource
+def get_client_registry():
+    """Registro de clientes compartido por todas las sesiones del proceso"""
+    try:
+        configure_log(st.secrets.get("PERF_LOG_PATH", DEFAULT_PERF_LOG_PATH))
+    except Exception as e:
+        st.warning(f"⚠️ No se pudo abrir el log de consultas: {e}")
+    return ClientRegistry()
+
+def init_connection():
+    """Establece la conexión buscando llaves en Hugging Face o en local."""
+    registry = get_client_registry()
+    client = registry.default()
+    if client is not None:
+        return client
+
+    try:
+        # 0. Backend local (pruebas de carga o sin proyecto de Supabase)
+        backend = st.secrets.get("DB_BACKEND", DEFAULT_BACKEND)
+        if backend != DEFAULT_BACKEND:
+            path = st.secrets.get("DB_SQLITE_PATH", DEFAULT_SQLITE_PATH)
+            latency = float(st.secrets.get("DB_LATENCY_MS", 0)) / 1000
+            return registry.connect_local(backend, path if backend == "sqlite" else None, latency)
+
+        # 1. Intentar leer desde los Secretos de Hugging Face (Prioridad)
+        url = st.secrets.get("SUPABASE_URL")
+        key = st.secrets.get("SUPABASE_KEY")
+
+        # 2. Si no existen (porque estás en tu PC), buscarlos en la estructura local
+        if not url:
+            try:
+                url = st.secrets["connections"]["supabase"]["url"]
+                key = st.secrets["connections"]["supabase"]["key"]
+            except:
+                st.error("❌ No se encontraron las llaves de Supabase. Configura los 'Secrets' en Hugging Face o el archivo secrets.toml local.")
+                st.stop()
+
+        timeout = float(st.secrets.get("SUPABASE_TIMEOUT", DEFAULT_TIMEOUT_SECONDS))
+        return registry.connect(url, key, timeout)
+    except Exception as e:
+        st.error(f"Error de configuración: {e}")
+        st.stop()
+
+def connection_health():
+    """Verifica la conexión actual (para el panel de configuración)"""
+    return get_client_registry().health_check()
+
+def background_connection():
+    """
+    Cliente para hilos de fondo, que no pueden usar st.error/st.stop.
+    None si el proceso aún no se ha conectado nunca.
+    """
+    return get_client_registry().reconnect()
+
+def is_transient_error(error):
+    """True si el error es de red o de disponibilidad (vale la pena reintentar)"""
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    return getattr(error, "code", None) in _TRANSIENT_CODES
+
+def is_missing_table(error):
+    """True si el error es por una tabla que no existe (no se aplicó su script de sql/)"""
+    return getattr(error, "code", None) in _MISSING_TABLE_CODES
+
+def reset_connection(error=None):
+    """Descarta los clientes reutilizados si el error fue de red (conexión caída o timeout)"""
+    if error is None or isinstance(error, httpx.TransportError):
+        get_client_registry().reset()
@@ -0,0 +1,56 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+# Índice por fecha de cada tabla: las posiciones de las filas ordenadas por día
+# (ordinal de date), para filtrar un período con bisect en vez de recorrer la
+# tabla. Se arma una vez por versión del snapshot (Snapshot.date_index).
+
+# Columna de fecha por tabla (las que no están usan "date")
+DATE_COLUMNS = {"inventory": "created_at"}
+
+def _ordinal(value):
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+class DateIndex:
+    """
+    Posiciones de las filas ordenadas por día. Las filas sin fecha legible
+    no entran en ningún período.
+    """
+    __slots__ = ("ordinals", "positions")
+
+    def __init__(self, table, rows):
+        column = DATE_COLUMNS.get(table, "date")
+        keyed = sorted(
+            (o, i) for i, o in enumerate(_ordinal(r.get(column)) for r in rows) if o is not None
+        )
+        self.ordinals = array("l", (o for o, _ in keyed))
+        self.positions = array("l", (i for _, i in keyed))
+
+    def between(self, start=None, end=None):
+        """
+        Posiciones (en el orden de la tabla) de las filas con fecha entre
+        `start` y `end`, ambos incluidos (date o texto ISO; None = sin límite).
+        """
+        lo = 0 if start is None else bisect_left(self.ordinals, _ordinal(start))
+        hi = len(self.ordinals) if end is None else bisect_right(self.ordinals, _ordinal(end))
+        return sorted(self.positions[lo:hi])
+
+    def __len__(self):
+        return len(self.ordinals)
+
+def date_index(db, table):
+    """Índice de la tabla: cacheado por versión si `db` es un LazyDB, si no se arma al vuelo"""
+    if hasattr(db, "date_index"):
+        return db.date_index(table)
+    return DateIndex(table, db.get(table, []))
+
+def rows_between(db, table, start=None, end=None):
+    """Filas de la tabla con fecha en el período [start, end]"""
+    rows = db[table]
+    return [rows[i] for i in date_index(db, table).between(start, end)]
@@ -0,0 +1,95 @@
+import pandas as pd
+
+# Tablas en columnas (pandas) con tipos fijos, para agregaciones vectorizadas.
+#
+#   float     número; nulo o vacío -> 0 (igual que `float(x or 0)`)
+#   int       entero; nulo -> 0
+#   category  texto repetido (medios de pago, clientes, proveedores); nulo -> ""
+#   date      día parseado (datetime64, NaT si no se puede leer)
+#   bool      booleano con nulos (pd.BooleanDtype: None se distingue de False)
+#   text      texto o id tal cual (object); la columna existe aunque falte
+#
+# Las columnas que no están aquí se dejan como vienen (object).
+FRAME_SCHEMA = {
+    "inventory": {
+        "cost": "float", "price": "float", "stock": "int", "size_ml": "float",
+        "name": "text", "brand": "category", "inv": "bool", "created_at": "date",
+    },
+    "purchases": {
+        "date": "date", "item_id": "text", "quantity": "float", "unit_cost": "float",
+        "supplier": "category", "cash_method": "category",
+    },
+    "sales": {
+        "date": "date", "item_id": "text", "quantity": "float", "unit_price": "float", "cost_at_sale": "float",
+        "customer": "category", "payment": "category", "inv": "bool",
+    },
+    "credits": {
+        "date": "date", "due_date": "date", "total": "float", "paid": "float",
+        "customer": "category",
+    },
+    "investor": {
+        "date": "date", "amount": "float", "type": "category",
+    },
+    "credit_payments": {
+        "date": "date", "amount": "float", "customer": "category", "method": "category",
+    },
+    "supplier_credits": {
+        "date": "date", "due_date": "date", "total": "float", "paid": "float",
+        "supplier": "category",
+    },
+    "supplier_payments": {
+        "date": "date", "amount": "float", "supplier": "category", "method": "category",
+    },
+}
+
+def _typed(series, kind):
+    if kind == "float":
+        return pd.to_numeric(series, errors="coerce").fillna(0.0).astype("float64")
+    if kind == "int":
+        return pd.to_numeric(series, errors="coerce").fillna(0).astype("int64")
+    if kind == "category":
+        return series.where(series.notna(), "").astype(str).astype("category")
+    if kind == "date":
+        # Solo el día (YYYY-MM-DD): un formato fijo se parsea vectorizado
+        return pd.to_datetime(series.astype(str).str[:10], errors="coerce", format="%Y-%m-%d")
+    if kind == "bool":
+        return series.map(lambda v: None if v is None or v != v else bool(v)).astype("boolean")
+    if kind == "text":
+        return series.astype(object)
+    return series
+
+def _empty(kind):
+    return {
+        "float": pd.Series(dtype="float64"),
+        "int": pd.Series(dtype="int64"),
+        "category": pd.Series(dtype="category"),
+        "date": pd.Series(dtype="datetime64[ns]"),
+        "bool": pd.Series(dtype="boolean"),
+        "text": pd.Series(dtype="object"),
+    }[kind]
+
+def to_frame(table, rows):
+    """
+    DataFrame tipado de una tabla (lista de dicts del snapshot).
+
+    Las columnas de FRAME_SCHEMA están siempre, aunque la tabla esté vacía o
+    la fila no las traiga, con el valor por defecto de su tipo.
+    """
+    schema = FRAME_SCHEMA.get(table, {})
+    df = pd.DataFrame.from_records(rows) if rows else pd.DataFrame()
+    for column, kind in schema.items():
+        if column in df.columns:
+            df[column] = _typed(df[column], kind)
+        elif df.empty:
+            df[column] = _empty(kind)
+        else:
+            df[column] = _typed(pd.Series([None] * len(df), index=df.index), kind)
+    if "id" not in df.columns:
+        df["id"] = pd.Series(dtype="object")
+    return df
+
+def table_frame(db, table):
+    """Frame de la tabla: cacheado por versión si `db` es un LazyDB, si no se arma al vuelo"""
+    if hasattr(db, "frame"):
+        return db.frame(table)
+    return to_frame(table, db.get(table, []))
@@ -0,0 +1,18 @@
+# Índice hash por id sobre las tablas cargadas, para cruzar tablas en O(1) en
+# vez de recorrerlas con next((p for p in ... if p["id"] == x)). Se arma una
+# vez por versión del snapshot (Snapshot.id_index) y contiene las mismas filas
+# (dicts) del snapshot, no copias.
+
+def build_id_index(table, rows):
+    """id -> fila"""
+    return {r.get("id"): r for r in rows}
+
+def id_index(db, table):
+    """id -> fila de la tabla: cacheado por versión si `db` es un LazyDB"""
+    if hasattr(db, "id_index"):
+        return db.id_index(table)
+    return build_id_index(table, db.get(table, []))
+
+def row_by_id(db, table, record_id, default=None):
+    """La fila con ese id, o `default`"""
+    return id_index(db, table).get(record_id, default)
@@ -0,0 +1,129 @@
+from collections.abc import Mapping
+import streamlit as st
+from .connection import init_connection
+from .loader import TABLES, profile_columns
+from .snapshot import get_snapshot_store
+from .write_queue import get_write_queue
+
+def _show_errors(report):
+    for level, message in (report or {}).get("errors", []):
+        getattr(st, level)(message)
+
+class LazyDB(Mapping):
+    """
+    Vista de solo lectura del snapshot compartido que descarga cada tabla
+    la primera vez que alguien la lee.
+
+    Se usa igual que el dict de load_full_db (db["sales"], db.get(...)), pero
+    una sesión que solo abre Inversionista no descarga compras ni proveedores.
+    Las tablas ya cargadas por cualquier sesión quedan en el snapshot y las
+    siguientes lecturas son de memoria.
+
+    Cada vista tiene un perfil de columnas (database.loader.PROFILES): solo
+    se descargan las columnas que el perfil pide, y si la tabla ya estaba
+    cargada con menos columnas se traen solo las que faltan.
+    """
+
+    def __init__(self, store, profile="default", snap=None):
+        self._store = store
+        self.profile = profile
+        self._snap = snap or store.get(init_connection, tables=(), profile=profile)
+        # Tablas que fallaron al descargarse en esta vista (se reintentan en la siguiente)
+        self._failed = set()
+
+    @property
+    def version(self):
+        """Versión del snapshot que se está leyendo"""
+        return self._snap.version
+
+    @property
+    def report(self):
+        return self._snap.report
+
+    def view(self, profile):
+        """Otra vista del mismo snapshot con otro perfil de columnas"""
+        return LazyDB(self._store, profile, self._snap)
+
+    def preload(self, *tables, profile=None):
+        """Descarga en paralelo, de una sola vez, las tablas o columnas que aún falten"""
+        profile = profile or self.profile
+        missing = [t for t in tables if not self._snap.covers(t, profile_columns(profile, t))]
+        if missing:
+            self._snap, report = self._store.extend(init_connection(), missing, profile)
+            _show_errors(report)
+        return self
+
+    def __getitem__(self, key):
+        if key != "settings" and key not in TABLES:
+            raise KeyError(key)
+        if key not in self._failed and not self._snap.covers(key, profile_columns(self.profile, key)):
+            self.preload(key)
+            if key not in self._snap.db:
+                self._failed.add(key)
+        return self._snap.db.get(key, [])
+
+    def frame(self, table):
+        """
+        La tabla en columnas tipadas (database.frames.to_frame), armada una
+        vez por versión del snapshot y compartida entre sesiones.
+        """
+        self[table]
+        return self._snap.frame(table)
+
+    def records(self, table):
+        """
+        La tabla como registros con __slots__ (database.models), armados una
+        vez por versión del snapshot y compartidos entre sesiones.
+        """
+        self[table]
+        return self._snap.records(table)
+
+    def date_index(self, table):
+        """Índice por fecha de la tabla (database.dates), uno por versión del snapshot"""
+        self[table]
+        return self._snap.date_index(table)
+
+    def id_index(self, table):
+        """id -> fila de la tabla (database.indexes), uno por versión del snapshot"""
+        self[table]
+        return self._snap.id_index(table)
+
+    def party_index(self, table):
+        """Filas por cliente/proveedor (database.parties), uno por versión del snapshot"""
+        self[table]
+        return self._snap.party_index(table)
+
+    def search_index(self, table):
+        """Índice de búsqueda de la tabla (database.search), uno por versión del snapshot"""
+        self[table]
+        return self._snap.search_index(table)
+
+    def __contains__(self, key):
+        # Sin descargar nada
+        return key == "settings" or key in TABLES
+
+    def __iter__(self):
+        return iter(["settings", *TABLES])
+
+    def __len__(self):
+        return len(TABLES) + 1
+
+def lazy_db(profile="default"):
+    """
+    Base de datos con carga perezosa por tabla.
+
+    Al inicio solo se descargan settings (y las lápidas de sincronización);
+    cada tabla se trae al primer acceso con las columnas de `profile`.
+    Comparte snapshot, revalidación en segundo plano y parches de escritura
+    con load_full_db.
+    """
+    # Instala los cambios pendientes de la cola y arranca su reenvío
+    queue = get_write_queue()
+    db = LazyDB(get_snapshot_store(), profile)
+    _show_errors(db.report)
+    blocked = queue.blocked() if queue is not None else None
+    if blocked is not None:
+        error, behind = blocked
+        st.error(f"❌ Un cambio guardado en este equipo no se pudo enviar a Supabase y detiene "
+                 f"{behind} envío(s) posterior(es): {error}. Reinténtalo o descártalo en Configuración.")
+    return db
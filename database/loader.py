@@ -0,0 +1,496 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from .tracing import propagate
+
+# Tablas de datos y su orden de carga (columna, descendente)
+TABLES = {
+    "inventory": ("created_at", True),
+    "purchases": ("date", True),
+    "sales": ("date", True),
+    "credits": ("date", True),
+    "investor": ("date", True),
+    "credit_payments": ("date", True),
+    "supplier_credits": ("date", True),
+    "supplier_payments": ("date", True),
+}
+
+# Columnas de cada tabla sin las "anchas". id, la columna de orden y updated_at
+# se agregan siempre al select (ver _select_list).
+COLUMNS = {
+    "settings": ("currency", "investor_share", "gsheets_sheet_id", "gsheets_sync", "logo_hash"),
+    "inventory": ("name", "brand", "size_ml", "cost", "price", "stock", "inv"),
+    "purchases": ("date", "item_id", "quantity", "unit_cost", "supplier", "invoice", "cash_method"),
+    "sales": ("date", "item_id", "quantity", "unit_price", "cost_at_sale", "customer", "payment", "inv"),
+    "credits": ("date", "customer", "sale_id", "total", "paid", "due_date", "phone"),
+    "investor": ("date", "type", "amount"),
+    "credit_payments": ("date", "customer", "amount", "method"),
+    "supplier_credits": ("date", "supplier", "purchase_id", "invoice", "total", "paid", "due_date"),
+    "supplier_payments": ("date", "supplier", "amount", "method"),
+}
+
+# Texto libre e imágenes: solo los piden las vistas de detalle y los PDF
+WIDE_COLUMNS = {table: ("notes",) for table in TABLES}
+WIDE_COLUMNS["settings"] = ("logo_b64",)
+
+# Columnas que necesita cada consumidor. Una tabla que el perfil no nombra se
+# lee con COLUMNS; el perfil "full" trae todo (select *), incluidas las anchas.
+FULL_PROFILE = "full"
+PROFILES = {
+    "default": COLUMNS,
+    # Libro de caja y banco (utils.finance)
+    "ledger": {
+        "sales": ("date", "quantity", "unit_price", "payment", "customer"),
+        "purchases": ("date", "item_id", "quantity", "unit_cost", "supplier", "cash_method"),
+        "credit_payments": ("date", "customer", "amount", "method"),
+        "supplier_payments": ("date", "supplier", "amount", "method"),
+    },
+    # Pestaña de reportes
+    "reports": {
+        "sales": ("date", "item_id", "quantity", "unit_price", "cost_at_sale", "customer", "payment", "inv"),
+        "inventory": ("name", "cost", "inv"),
+        "investor": ("date", "type", "amount"),
+        "settings": ("investor_share",),
+    },
+    # Listados y valor del inventario
+    "inventory_list": {
+        "inventory": ("name", "brand", "size_ml", "cost", "price", "stock", "inv"),
+    },
+}
+
+def profile_columns(profile, table):
+    """Columnas que pide el perfil para la tabla (None = todas, select *)"""
+    if profile == FULL_PROFILE:
+        return None
+    return PROFILES[profile].get(table, COLUMNS.get(table))
+
+# Tablas a las que les falta alguna columna de COLUMNS (p. ej. updated_at sin
+# sql/delta_sync.sql): en este proceso se leen siempre con select *
+_STAR_ONLY = set()
+
+# Columna inexistente: Postgres (42703) o la caché de esquema de PostgREST (PGRST204)
+_UNDEFINED_COLUMN_CODES = {"42703", "PGRST204"}
+
+def _is_undefined_column(error):
+    """True si el select falló por pedir una columna que la tabla no tiene"""
+    return getattr(error, "code", None) in _UNDEFINED_COLUMN_CODES
+
+def _select_list(table, columns, order_column=None):
+    """Lista para select(); siempre incluye id, la columna de orden y updated_at"""
+    if columns is None or table in _STAR_ONLY:
+        return "*"
+    keys = ["id"]
+    if order_column:
+        keys.append(order_column)
+    if table in TABLES:
+        keys.append(SYNC_COLUMN)
+    return ",".join(dict.fromkeys(keys + list(columns)))
+
+# Sincronización incremental (ver sql/delta_sync.sql)
+SYNC_COLUMN = "updated_at"
+TOMBSTONE_TABLE = "deleted_records"
+SYNC_OVERLAP_SECONDS = 5
+
+# Consultas simultáneas al cargar (una por tabla)
+LOAD_WORKERS = 10
+
+# Filas por página al descargar una tabla. No debe superar el max-rows del
+# servidor PostgREST (1000 por defecto en Supabase): una página más corta que
+# esto se toma como la última.
+PAGE_SIZE = 1000
+
+# Las funciones de este módulo no llaman a `st`: pueden correr en un hilo de fondo.
+# Los problemas se devuelven en report["errors"] como (nivel, mensaje) para mostrarlos después.
+
+def _empty_db(tables=TABLES):
+    """Estructura base de la base de datos en memoria (solo con las tablas pedidas)"""
+    db = {
+        "settings": {
+            "currency": "COP",
+            "investor_share": 50,
+            "logo_b64": None,
+            "logo_hash": None,
+            "gsheets_sheet_id": "",
+            "gsheets_sync": False
+        }
+    }
+    for table in tables:
+        db[table] = []
+    return db
+
+def _migrate_rows(table, rows):
+    """Migración: asegurar campos nuevos"""
+    if table == "inventory":
+        for p in rows:
+            if "inv" not in p:
+                p["inv"] = True
+    elif table == "sales":
+        for s in rows:
+            if "inv" not in s:
+                s["inv"] = None
+    return rows
+
+def _quote(value):
+    """Valor entre comillas para filtros or=(...) (fechas con ':' o '.')"""
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+def _after(query, column, desc, last):
+    """Filtro keyset: filas posteriores a `last` en el orden (column, id), nulos al final"""
+    value, last_id = last.get(column), last.get("id")
+    if value is None:
+        # Ya estamos en el bloque de nulos: solo desempata el id
+        query = query.is_(column, "null")
+        return query.lt("id", last_id) if desc else query.gt("id", last_id)
+    op = "lt" if desc else "gt"
+    return query.or_(
+        f"{column}.{op}.{_quote(value)},"
+        f"and({column}.eq.{_quote(value)},id.{op}.{_quote(last_id)}),"
+        f"{column}.is.null"
+    )
+
+def iter_pages(conn, table, order=None, since=None, page_size=None, columns=None):
+    """
+    Recorre una tabla por páginas con paginación keyset (columna de orden, id).
+
+    A diferencia de un solo select, no se trunca al pasar el límite de filas
+    del servidor y cada página cuesta lo mismo sin importar su posición
+    (no hay OFFSET). Es un generador: se puede ir indexando o acumulando
+    mientras llegan los datos.
+
+    Args:
+        table: nombre de la tabla
+        order: (columna, descendente); por defecto el de TABLES
+        since: solo filas con updated_at >= since (sincronización incremental)
+        page_size: filas por página (PAGE_SIZE si no se indica)
+        columns: columnas a traer (None = todas)
+
+    Yields:
+        list: filas de cada página, ya migradas
+    """
+    column, desc = order or TABLES[table]
+    page_size = page_size or PAGE_SIZE
+    select = _select_list(table, columns, column)
+    last = None
+    while True:
+        query = conn.table(table).select(select)
+        if since:
+            query = query.gte(SYNC_COLUMN, since)
+        if last is not None:
+            query = _after(query, column, desc, last)
+        query = query.order(column, desc=desc, nullsfirst=False).order("id", desc=desc)
+        page = query.limit(page_size).execute().data or []
+        if page:
+            yield _migrate_rows(table, page)
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+def _fetch_table(conn, table, since=None, columns=None):
+    """
+    Descarga una tabla completa (o sus cambios desde `since`) con su orden por
+    defecto. Si el select por columnas falla porque falta una columna se
+    reintenta con select *; con otro error (red, timeout) no, para no
+    dejar la tabla sin proyección el resto del proceso.
+    """
+    # Inventario - ordenado por created_at si existe, o por nombre
+    orders = [None, ("name", False)] if table == "inventory" else [None]
+    attempts = [columns, None] if columns is not None else [None]
+    error = None
+    for order in orders:
+        for cols in attempts:
+            try:
+                rows = [r for page in iter_pages(conn, table, order, since, columns=cols) for r in page]
+            except Exception as e:
+                error = e
+                if cols is not None and _is_undefined_column(e):
+                    continue
+                break
+            if cols is None and columns is not None:
+                _STAR_ONLY.add(table)
+            return rows
+    raise error
+
+def widen_rows(rows, extra):
+    """Agrega a filas ya cargadas columnas descargadas aparte (por id)"""
+    by_id = {r.get("id"): r for r in extra}
+    return [{**r, **by_id[r.get("id")]} if r.get("id") in by_id else r for r in rows]
+
+def _sort_rows(table, rows):
+    """Reaplica el orden por defecto de la tabla tras una fusión"""
+    column, desc = TABLES[table]
+    if table == "inventory" and not any(column in r for r in rows):
+        rows.sort(key=lambda r: r.get("name") or "")
+    else:
+        rows.sort(key=lambda r: r.get(column) or "", reverse=desc)
+
+def _high_water(rows, current=None):
+    """Mayor valor de updated_at visto en las filas (marca de agua)"""
+    mark = current
+    for r in rows:
+        value = r.get(SYNC_COLUMN)
+        if value and (mark is None or value > mark):
+            mark = value
+    return mark
+
+def _since(mark):
+    """Marca de agua menos un margen de solapamiento para no perder commits tardíos"""
+    try:
+        return (datetime.fromisoformat(mark) - timedelta(seconds=SYNC_OVERLAP_SECONDS)).isoformat()
+    except (TypeError, ValueError):
+        return mark
+
+def _merge_rows(table, rows, changed, deleted_ids):
+    """Fusiona filas nuevas/modificadas y elimina las borradas, por id"""
+    if not changed and not deleted_ids:
+        return rows
+    by_id = {r.get("id"): r for r in rows}
+    for r in changed:
+        by_id[r.get("id")] = r
+    for rid in deleted_ids:
+        by_id.pop(rid, None)
+    merged = list(by_id.values())
+    _sort_rows(table, merged)
+    return merged
+
+def _fetch_deletions(conn, mark, full=False, page_size=None):
+    """
+    Lee las lápidas (registros borrados) desde la última sincronización.
+
+    Se recorren por (deleted_at, id) en páginas, como iter_pages: un select
+    sin orden cortado por el max-rows del servidor dejaría la marca por
+    delante de lápidas que nunca llegaron. En una carga completa (`full`)
+    las tablas llegan enteras y solo hace falta la marca: la lápida más
+    reciente.
+
+    Returns:
+        tuple: ({tabla: ids borrados}, marca de agua de las lápidas)
+    """
+    if full:
+        data = (conn.table(TOMBSTONE_TABLE).select("deleted_at")
+                .order("deleted_at", desc=True).limit(1).execute().data or [])
+        return {}, data[0].get("deleted_at") if data else mark
+    page_size = page_size or PAGE_SIZE
+    deleted = {}
+    last = None
+    while True:
+        query = conn.table(TOMBSTONE_TABLE).select("id,table_name,record_id,deleted_at")
+        if mark:
+            query = query.gte("deleted_at", _since(mark))
+        if last is not None:
+            query = _after(query, "deleted_at", False, last)
+        page = query.order("deleted_at").order("id").limit(page_size).execute().data or []
+        for d in page:
+            deleted.setdefault(d.get("table_name"), set()).add(d.get("record_id"))
+        mark = _high_water([{SYNC_COLUMN: d.get("deleted_at")} for d in page], mark)
+        if len(page) < page_size:
+            return deleted, mark
+        last = page[-1]
+
+def _run_parallel(tasks):
+    """
+    Ejecuta las consultas a la vez en un pool de hilos.
+
+    Args:
+        tasks: dict nombre -> función sin argumentos
+
+    Returns:
+        dict nombre -> (resultado, excepción, segundos)
+    """
+    def timed(fn):
+        t0 = time.perf_counter()
+        try:
+            return fn(), None, time.perf_counter() - t0
+        except Exception as e:
+            return None, e, time.perf_counter() - t0
+
+    workers = max(1, min(LOAD_WORKERS, len(tasks)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {name: pool.submit(timed, propagate(fn)) for name, fn in tasks.items()}
+        return {name: f.result() for name, f in futures.items()}
+
+def _new_report(mode):
+    return {"mode": mode, "errors": [], "timings": {}, "elapsed": 0.0}
+
+def _fetch_settings(conn, columns=None):
+    def fetch(select):
+        data = conn.table("settings").select(select).eq("id", "main").limit(1).execute().data
+        return data[0] if data else None
+    select = _select_list("settings", columns)
+    if select == "*":
+        return fetch(select)
+    try:
+        return fetch(select)
+    except Exception as e:
+        if not _is_undefined_column(e):
+            raise
+        _STAR_ONLY.add("settings")
+        return fetch("*")
+
+def _apply_settings(db, result, report):
+    """Mezcla la fila de settings sobre los valores por defecto"""
+    settings_row, error, seconds = result
+    report["timings"]["settings"] = seconds
+    if error is not None:
+        report["errors"].append(("warning", f"⚠️ Tabla 'settings' no encontrada. Error: {error}"))
+    elif settings_row:
+        db["settings"].update(settings_row)
+
+def _collect_tables(db, marks, report, results, tables):
+    """
+    Pasa los resultados de _run_parallel a db/marks; devuelve True si alguna falló.
+
+    Las tablas que fallan quedan fuera de db (sin marca): no se publican como
+    vacías y el siguiente acceso vuelve a intentar descargarlas.
+    """
+    failed = False
+    for table in tables:
+        rows, error, seconds = results[table]
+        report["timings"][table] = seconds
+        if error is not None:
+            failed = True
+            report["errors"].append(("error", f"❌ No se pudo cargar '{table}': {error}"))
+            db.pop(table, None)
+        else:
+            db[table] = rows
+            marks[table] = _high_water(rows)
+    if failed:
+        report["errors"].append(("info", "Verifica que todas las tablas estén creadas con el esquema SQL proporcionado."))
+    return failed
+
+def full_load(conn, tables=None, columns=None):
+    """
+    Carga completa de settings y de las tablas pedidas, con sus marcas de agua.
+
+    Todas las consultas se lanzan a la vez, así que la latencia es la de la
+    tabla más lenta y no la suma de todas. Si una tabla falla queda fuera de
+    db, se informa y las demás se cargan igual.
+
+    Args:
+        tables: tablas a cargar (None = todas); las demás quedan fuera de db
+        columns: dict tabla -> columnas (ver profile_columns); sin entrada = todas
+
+    Returns:
+        tuple: (db, marks, report). marks es None si el esquema no admite
+        sincronización incremental; report trae errores y tiempos por tabla.
+    """
+    t0 = time.perf_counter()
+    tables = list(TABLES) if tables is None else [t for t in tables if t in TABLES]
+    db = _empty_db(tables)
+    marks = {}
+    columns = columns or {}
+    report = _new_report("full")
+
+    tasks = {"settings": lambda: _fetch_settings(conn, columns.get("settings"))}
+    for table in tables:
+        tasks[table] = lambda table=table: _fetch_table(conn, table, columns=columns.get(table))
+    # Las lápidas solo existen si se aplicó sql/delta_sync.sql
+    tasks[TOMBSTONE_TABLE] = lambda: _fetch_deletions(conn, None, full=True)
+    results = _run_parallel(tasks)
+
+    _apply_settings(db, results["settings"], report)
+    _collect_tables(db, marks, report, results, tables)
+
+    deletions, error, seconds = results[TOMBSTONE_TABLE]
+    report["timings"][TOMBSTONE_TABLE] = seconds
+    if error is not None:
+        marks = None
+    else:
+        marks[TOMBSTONE_TABLE] = deletions[1]
+
+    report["elapsed"] = time.perf_counter() - t0
+    return db, marks, report
+
+def load_tables(conn, load, widen=None):
+    """
+    Descarga tablas sueltas o columnas faltantes para un snapshot ya cargado.
+
+    Las lápidas no hacen falta: la tabla llega completa y la marca de lápidas
+    del snapshot es anterior, así que los borrados posteriores se aplicarán
+    en la siguiente sincronización incremental.
+
+    Args:
+        load: dict tabla -> columnas, tablas a descargar completas
+        widen: dict tabla -> columnas, columnas a agregar a tablas ya cargadas
+            (incluye "settings")
+
+    Returns:
+        tuple: (tablas, columnas extra por tabla, marks, report). Las
+        columnas extra que fallan quedan fuera y se informan en report.
+    """
+    t0 = time.perf_counter()
+    widen = widen or {}
+    rows, marks = {}, {}
+    report = _new_report("lazy")
+
+    tasks = {t: (lambda t=t: _fetch_table(conn, t, columns=load[t])) for t in load}
+    for t, cols in widen.items():
+        if t == "settings":
+            tasks[t] = lambda cols=cols: _fetch_settings(conn, cols)
+        else:
+            tasks[t] = lambda t=t, cols=cols: _fetch_table(conn, t, columns=cols)
+    results = _run_parallel(tasks)
+
+    _collect_tables(rows, marks, report, results, list(load))
+    extra = {}
+    for t in widen:
+        data, error, seconds = results[t]
+        report["timings"][t] = seconds
+        if error is not None:
+            report["errors"].append(("warning", f"⚠️ No se pudieron cargar columnas de '{t}': {error}"))
+        else:
+            extra[t] = data
+    report["elapsed"] = time.perf_counter() - t0
+    return rows, extra, marks, report
+
+def _fetch_changes(conn, table, mark, columns=None):
+    """Filas de la tabla cambiadas desde la marca (o la tabla completa si no hay marca)"""
+    if mark:
+        return _fetch_table(conn, table, since=_since(mark), columns=columns)
+    # Tabla vacía o sin updated_at en la última carga: se lee completa
+    return _fetch_table(conn, table, columns=columns)
+
+def delta_load(conn, db, marks, columns=None):
+    """
+    Trae solo filas insertadas, modificadas o borradas desde las marcas de agua.
+
+    No modifica `db` ni `marks`: devuelve copias nuevas (las tablas sin cambios
+    se comparten por referencia). Lanza excepción si alguna consulta falla.
+    Cada tabla se consulta con las columnas que ya tenía (`columns`).
+    """
+    t0 = time.perf_counter()
+    columns = columns or {}
+    db = dict(db)
+    db["settings"] = dict(db["settings"])
+    marks = dict(marks)
+    report = _new_report("delta")
+
+    # Solo se sincronizan las tablas que ya estaban cargadas
+    tables = [t for t in TABLES if t in db]
+    tasks = {
+        "settings": lambda: _fetch_settings(conn, columns.get("settings")),
+        TOMBSTONE_TABLE: lambda: _fetch_deletions(conn, marks.get(TOMBSTONE_TABLE)),
+    }
+    for table in tables:
+        tasks[table] = lambda table=table: _fetch_changes(conn, table, marks.get(table), columns.get(table))
+    results = _run_parallel(tasks)
+
+    for name, (_, error, _) in results.items():
+        if error is not None and name != "settings":
+            raise error
+
+    _apply_settings(db, results["settings"], report)
+    (deleted, marks[TOMBSTONE_TABLE]), _, seconds = results[TOMBSTONE_TABLE]
+    report["timings"][TOMBSTONE_TABLE] = seconds
+
+    for table in tables:
+        changed, _, seconds = results[table]
+        report["timings"][table] = seconds
+        mark = marks.get(table)
+        if mark:
+            db[table] = _merge_rows(table, db[table], changed, deleted.get(table, ()))
+        else:
+            db[table] = changed
+        marks[table] = _high_water(changed, mark)
+
+    report["elapsed"] = time.perf_counter() - t0
+    return db, marks, report
@@ -0,0 +1,80 @@
+import base64
+import hashlib
+import streamlit as st
+from .connection import init_connection, reset_connection, is_missing_table
+from .records import update_settings
+
+# Tabla de imágenes por hash de contenido (sql/logos.sql); settings guarda solo el hash
+LOGO_TABLE = "logos"
+
+def logo_hash(raw):
+    """Hash de contenido (sha256 en hex) con el que se guarda la imagen"""
+    return hashlib.sha256(raw).hexdigest()
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _logo_by_hash(digest):
+    """
+    Bytes del logo, descargados una vez por proceso.
+
+    Como la clave es el hash del contenido, el valor nunca cambia y no hace
+    falta invalidarlo: un logo nuevo tiene otro hash.
+    """
+    rows = init_connection().table(LOGO_TABLE).select("data").eq("hash", digest).limit(1).execute().data
+    if not rows:
+        # Sin cachear: puede aparecer después (ej. escritura aún en cola)
+        raise LookupError(digest)
+    return base64.b64decode(rows[0]["data"])
+
+def logo_bytes(db):
+    """
+    Imagen del logo para recibos y vista previa, o None si no hay.
+
+    Solo se descarga cuando se pide; las cargas de settings traen el hash.
+    Si settings aún tiene el logo en base64 (antes de sql/logos.sql) se usa ese.
+    """
+    digest = db["settings"].get("logo_hash")
+    if digest:
+        try:
+            return _logo_by_hash(digest)
+        except Exception:
+            return None
+    # Esquema anterior: el logo dentro de settings (columna ancha)
+    settings = db.view("full")["settings"] if hasattr(db, "view") else db["settings"]
+    legacy = settings.get("logo_b64")
+    try:
+        return base64.b64decode(legacy) if legacy else None
+    except Exception:
+        return None
+
+def save_logo(raw, extra=None):
+    """
+    Guarda la imagen en `logos` (idempotente por hash) y apunta settings a ella.
+
+    Args:
+        raw: bytes de la imagen
+        extra: otros campos de settings a guardar en la misma actualización
+
+    Returns:
+        bool: True si se guardó (o quedó en cola)
+    """
+    digest = logo_hash(raw)
+    data = base64.b64encode(raw).decode("utf-8")
+    try:
+        init_connection().table(LOGO_TABLE).upsert(
+            {"hash": digest, "data": data}, on_conflict="hash", ignore_duplicates=True
+        ).execute()
+    except Exception as e:
+        if not is_missing_table(e):
+            st.error(f"Error al guardar el logo: {e}")
+            reset_connection(e)
+            return False
+        # Sin sql/logos.sql: se guarda como antes, en base64 dentro de settings
+        return update_settings({**(extra or {}), "logo_b64": data})
+    return update_settings({**(extra or {}), "logo_hash": digest, "logo_b64": None})
+
+def remove_logo(db):
+    """Quita el logo de los recibos (la imagen queda en `logos` por si se vuelve a usar)"""
+    fields = {"logo_b64": None}
+    if db["settings"].get("logo_hash"):
+        fields["logo_hash"] = None
+    return update_settings(fields)
@@ -0,0 +1,128 @@
+import threading
+from .connection import init_connection, reset_connection, is_missing_table
+from .rpc import call_rpc, RpcUnavailable
+from .write_queue import get_write_queue
+from .models import table_records
+
+# Totales del encabezado que devuelve la función SQL header_metrics
+METRIC_KEYS = ("inventory_value", "cash", "bank", "receivable", "open_credits")
+
+# Tabla de saldos mantenida por triggers (sql/cash_balances.sql)
+BALANCES_TABLE = "cash_balances"
+
+# Último resultado de cada consulta y la versión del snapshot con la que se pidió
+_cache = {}
+_lock = threading.Lock()
+
+def _normalize(data):
+    """PostgREST puede devolver el objeto solo, en una lista o envuelto por el nombre"""
+    if isinstance(data, list):
+        data = data[0] if data else {}
+    if isinstance(data, dict) and set(data) == {"header_metrics"}:
+        data = data["header_metrics"]
+    data = data or {}
+    metrics = {k: float(data.get(k) or 0) for k in METRIC_KEYS}
+    metrics["open_credits"] = int(metrics["open_credits"])
+    return metrics
+
+def _from_server(name, db, remote, local):
+    """
+    Resultado de `remote(conn)`, reutilizado mientras no cambie la versión del
+    snapshot (escrituras propias o cambios traídos por la revalidación).
+
+    Se usa `local(db)` si la consulta no existe en el servidor o falla, y
+    también con escrituras aún en la cola (que el servidor no ve).
+    """
+    version = getattr(db, "version", None)
+    with _lock:
+        cached = _cache.get(name)
+    if version is not None and cached and cached[0] == version:
+        return cached[1]
+
+    queue = get_write_queue()
+    if queue is not None and queue.has_pending():
+        return local(db)
+    try:
+        result = remote(init_connection())
+    except RpcUnavailable:
+        result = local(db)
+    except Exception as e:
+        reset_connection(e)
+        return local(db)
+    with _lock:
+        _cache[name] = (version, result)
+    return result
+
+def local_balances(db):
+    """Caja y Banco recorriendo el libro completo (utils.finance.cash_bank_balances)"""
+    from utils import cash_bank_balances
+
+    return cash_bank_balances(
+        db.view("ledger").preload("sales", "purchases", "credit_payments", "supplier_payments")
+    )
+
+def local_metrics(db):
+    """Mismo cálculo que header_metrics en Python, sobre las tablas del snapshot"""
+    inventory = db.view("inventory_list").preload("inventory")
+    caja, banco = local_balances(db)
+    saldos = [c.saldo for c in table_records(db, "credits")]
+    return {
+        "inventory_value": sum(p.cost * p.stock for p in table_records(inventory, "inventory")),
+        "cash": caja,
+        "bank": banco,
+        "receivable": sum(saldos),
+        "open_credits": len([s for s in saldos if s > 0]),
+    }
+
+def header_metrics(db):
+    """
+    Inventario, Caja, Banco y Por Cobrar para el encabezado.
+
+    Con sql/header_metrics.sql el servidor devuelve solo los totales y no
+    hace falta descargar ventas, compras, pagos ni créditos. Sin la función
+    se calculan en Python.
+    """
+    return _from_server(
+        "header_metrics", db,
+        lambda conn: _normalize(call_rpc(conn, "header_metrics", {})),
+        local_metrics
+    )
+
+def _read_balances(conn):
+    try:
+        rows = conn.table(BALANCES_TABLE).select("medio,amount").execute().data or []
+    except Exception as e:
+        if is_missing_table(e):
+            # Sin sql/cash_balances.sql
+            raise RpcUnavailable(BALANCES_TABLE) from e
+        raise
+    balances = {r.get("medio"): float(r.get("amount") or 0) for r in rows}
+    return balances.get("Caja", 0.0), balances.get("Banco", 0.0)
+
+def cash_balances(db):
+    """
+    Saldos actuales (caja, banco) leídos de cash_balances: dos filas, sin
+    importar el tamaño del libro. Sin la tabla se recorre el libro.
+    """
+    return _from_server("cash_balances", db, _read_balances, local_balances)
+
+def check_cash_balances():
+    """
+    Recalcula cash_balances desde las tablas (rebuild_cash_balances) como
+    verificación de consistencia.
+
+    Returns:
+        dict: {"before": {medio: saldo}, "after": {medio: saldo}}, o None si
+        no se aplicó sql/cash_balances.sql
+    """
+    try:
+        result = call_rpc(init_connection(), "rebuild_cash_balances", {})
+    except RpcUnavailable:
+        return None
+    if isinstance(result, list):
+        result = result[0] if result else {}
+    if isinstance(result, dict) and set(result) == {"rebuild_cash_balances"}:
+        result = result["rebuild_cash_balances"]
+    with _lock:
+        _cache.clear()
+    return result or {"before": {}, "after": {}}
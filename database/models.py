@@ -0,0 +1,154 @@
+# Registros compactos (con __slots__) para los recorridos de solo lectura.
+#
+# Las filas del snapshot siguen siendo dicts: son las que se escriben, se
+# encolan y se sincronizan. Estos registros se arman a partir de ellas una vez
+# por versión (Snapshot.records) con los números ya convertidos, para que los
+# resúmenes lean atributos (c.total - c.paid) sin `float(x.get(k, 0) or 0)`.
+#
+# Tipos de campo:
+#   float   nulo, vacío o ilegible -> 0.0
+#   int     nulo, vacío o ilegible -> 0
+#   text    nulo -> ""
+#   bool    se deja como viene (None se distingue de False)
+# Los campos sin tipo (id, item_id, ...) se dejan tal cual.
+
+def _float(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _int(value):
+    try:
+        return int(float(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+def _text(value):
+    return "" if value is None else str(value)
+
+_CONVERT = {"float": _float, "int": _int, "text": _text}
+
+class Record:
+    """
+    Base de los registros. Cada subclase declara sus campos en __slots__ y
+    en KINDS el tipo de los que se normalizan.
+
+    get() y [] se mantienen para que las funciones que reciben dicts (ej.
+    utils.credit_saldo) acepten también un registro.
+    """
+    __slots__ = ()
+    TABLE = None
+    KINDS = {}
+
+    def __init__(self, row):
+        kinds = self.KINDS
+        for name in self.__slots__:
+            value = row.get(name)
+            convert = _CONVERT.get(kinds.get(name))
+            setattr(self, name, convert(value) if convert else value)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.as_dict()!r})"
+
+class InventoryItem(Record):
+    __slots__ = ("id", "name", "brand", "size_ml", "cost", "price", "stock", "inv", "created_at")
+    TABLE = "inventory"
+    KINDS = {
+        "name": "text", "brand": "text", "size_ml": "int", "cost": "float",
+        "price": "float", "stock": "int",
+    }
+
+class Purchase(Record):
+    __slots__ = ("id", "date", "item_id", "quantity", "unit_cost", "supplier", "invoice", "cash_method")
+    TABLE = "purchases"
+    KINDS = {
+        "date": "text", "quantity": "float", "unit_cost": "float",
+        "supplier": "text", "invoice": "text", "cash_method": "text",
+    }
+
+    @property
+    def total(self):
+        return self.quantity * self.unit_cost
+
+class Sale(Record):
+    __slots__ = ("id", "date", "item_id", "quantity", "unit_price", "cost_at_sale", "customer", "payment", "inv")
+    TABLE = "sales"
+    KINDS = {
+        "date": "text", "quantity": "float", "unit_price": "float", "cost_at_sale": "float",
+        "customer": "text", "payment": "text",
+    }
+
+    @property
+    def total(self):
+        return self.quantity * self.unit_price
+
+class Credit(Record):
+    __slots__ = ("id", "date", "customer", "sale_id", "total", "paid", "due_date", "phone")
+    TABLE = "credits"
+    KINDS = {
+        "date": "text", "customer": "text", "total": "float", "paid": "float",
+        "due_date": "text", "phone": "text",
+    }
+
+    @property
+    def saldo(self):
+        return self.total - self.paid
+
+class InvestorMovement(Record):
+    __slots__ = ("id", "date", "type", "amount")
+    TABLE = "investor"
+    KINDS = {"date": "text", "type": "text", "amount": "float"}
+
+class CreditPayment(Record):
+    __slots__ = ("id", "date", "customer", "amount", "method")
+    TABLE = "credit_payments"
+    KINDS = {"date": "text", "customer": "text", "amount": "float", "method": "text"}
+
+class SupplierCredit(Record):
+    __slots__ = ("id", "date", "supplier", "purchase_id", "invoice", "total", "paid", "due_date")
+    TABLE = "supplier_credits"
+    KINDS = {
+        "date": "text", "supplier": "text", "invoice": "text", "total": "float",
+        "paid": "float", "due_date": "text",
+    }
+
+    @property
+    def saldo(self):
+        return self.total - self.paid
+
+class SupplierPayment(Record):
+    __slots__ = ("id", "date", "supplier", "amount", "method")
+    TABLE = "supplier_payments"
+    KINDS = {"date": "text", "supplier": "text", "amount": "float", "method": "text"}
+
+# Clase de registro de cada tabla
+RECORD_CLASSES = {
+    cls.TABLE: cls for cls in (
+        InventoryItem, Purchase, Sale, Credit, InvestorMovement,
+        CreditPayment, SupplierCredit, SupplierPayment,
+    )
+}
+
+def to_records(table, rows):
+    """Registros de una tabla (lista de dicts del snapshot), en el mismo orden"""
+    cls = RECORD_CLASSES[table]
+    return [cls(r) for r in rows]
+
+def table_records(db, table):
+    """Registros de la tabla: cacheados por versión si `db` es un LazyDB, si no se arman al vuelo"""
+    if hasattr(db, "records"):
+        return db.records(table)
+    return to_records(table, db.get(table, []))
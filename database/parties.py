@@ -0,0 +1,44 @@
+import sys
+
+# Índice por cliente / proveedor: filas de créditos y pagos agrupadas por el
+# nombre normalizado, en orden de fecha (FIFO). Se arma una vez por versión
+# del snapshot (Snapshot.party_index) y contiene las mismas filas del
+# snapshot, que nadie modifica: un abono llega como fila nueva con la versión
+# siguiente (snapshot._apply_patch). "Pendiente" se evalúa al consultar.
+
+# Columna con el nombre de la contraparte en cada tabla
+PARTY_COLUMNS = {
+    "credits": "customer",
+    "credit_payments": "customer",
+    "supplier_credits": "supplier",
+    "supplier_payments": "supplier",
+}
+
+def party_key(name):
+    """Nombre normalizado (sin espacios en los extremos, en minúsculas) e internado"""
+    return sys.intern(str(name or "").strip().lower())
+
+def build_party_index(table, rows):
+    """clave de contraparte -> filas ordenadas por fecha (ascendente)"""
+    column = PARTY_COLUMNS[table]
+    groups = {}
+    for r in sorted(rows, key=lambda r: str(r.get("date") or "")):
+        groups.setdefault(party_key(r.get(column)), []).append(r)
+    return groups
+
+def party_index(db, table):
+    """Índice de la tabla: cacheado por versión si `db` es un LazyDB, si no se arma al vuelo"""
+    if hasattr(db, "party_index"):
+        return db.party_index(table)
+    return build_party_index(table, db.get(table, []))
+
+def party_rows(db, table, name):
+    """Créditos o pagos de un cliente/proveedor, del más antiguo al más reciente"""
+    return party_index(db, table).get(party_key(name), [])
+
+def open_party_credits(db, table, name):
+    """Créditos con saldo pendiente de un cliente/proveedor, en orden FIFO"""
+    return [
+        c for c in party_rows(db, table, name)
+        if float(c.get("total") or 0) - float(c.get("paid") or 0) > 0
+    ]
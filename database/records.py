@@ -0,0 +1,35 @@
+from .unit_of_work import UnitOfWork
+
+# Cada función es un UnitOfWork de una sola operación: comparte el envío por
+# RPC, la cola de escrituras sin conexión y la actualización del snapshot.
+
+def insert_record(table, data):
+    """Inserta un nuevo registro en la tabla especificada (True si se guardó o quedó en cola)."""
+    uow = UnitOfWork()
+    uow.insert(table, data)
+    return uow.flush(f"Error al insertar en {table}")
+
+def update_record(table, data, record_id):
+    """Actualiza un registro existente buscando por su ID."""
+    uow = UnitOfWork()
+    uow.update(table, data, record_id)
+    return uow.flush(f"Error al actualizar {table}")
+
+def delete_record(table, record_id):
+    """Elimina un registro por su ID."""
+    uow = UnitOfWork()
+    uow.delete(table, record_id)
+    return uow.flush(f"Error al eliminar de {table}")
+
+def update_settings(data):
+    """Actualiza la configuración (settings)"""
+    uow = UnitOfWork()
+    uow.update("settings", data, "main")
+    return uow.flush("Error al actualizar settings")
+
+def save_db_sync(db):
+    """
+    Esta función NO hace nada porque Supabase guarda automáticamente.
+    La incluyo para mantener compatibilidad con tu código original.
+    """
+    pass
@@ -0,0 +1,234 @@
+import json
+import sqlite3
+import threading
+import time
+import streamlit as st
+from .loader import (
+    TABLES, TOMBSTONE_TABLE, _fetch_settings, _fetch_changes, _fetch_deletions,
+    _high_water, _run_parallel, _new_report, _empty_db, _sort_rows
+)
+
+# Salvo open_replica, nada aquí llama a `st`: también corre en el hilo de
+# revalidación del snapshot.
+
+_SCHEMA = """
+create table if not exists {table} (
+    id text primary key,
+    sort_key text,
+    updated_at text,
+    data text not null
+);
+create index if not exists {table}_sort_key on {table} (sort_key);
+"""
+
+class LocalReplica:
+    """
+    Copia local (SQLite) de las tablas de Supabase, al día por sincronización
+    incremental (updated_at + lápidas, ver sql/delta_sync.sql).
+
+    Cada fila se guarda completa como JSON, con su columna de orden indexada
+    para poder filtrar por fecha con SQL. Las escrituras siguen yendo primero
+    a Supabase; una vez confirmadas se reflejan aquí con apply().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("pragma journal_mode=wal")
+        with self._db:
+            for table in ["settings", *TABLES]:
+                self._db.executescript(_SCHEMA.format(table=table))
+            self._db.execute("create table if not exists sync_marks (name text primary key, mark text)")
+
+    # ---------- lectura ----------
+
+    def marks(self):
+        with self._lock:
+            return dict(self._db.execute("select name, mark from sync_marks").fetchall())
+
+    def is_empty(self):
+        """True si nunca se ha sincronizado"""
+        return not self.marks()
+
+    def rows(self, table, date_from=None, date_to=None):
+        """
+        Filas de una tabla en su orden por defecto.
+
+        date_from/date_to filtran por la columna de orden (índice sort_key),
+        ej. ventas de un período sin recorrer la tabla completa.
+        """
+        sql, params = f"select data from {table}", []
+        if date_from is not None or date_to is not None:
+            sql += " where sort_key between ? and ?"
+            params = [date_from or "", (date_to or "\uffff") + "\uffff"]
+        with self._lock:
+            data = self._db.execute(sql, params).fetchall()
+        rows = [json.loads(d) for (d,) in data]
+        _sort_rows(table, rows)
+        return rows
+
+    def settings(self):
+        with self._lock:
+            data = self._db.execute("select data from settings where id = 'main'").fetchone()
+        return json.loads(data[0]) if data else None
+
+    def query(self, sql, params=()):
+        """SQL de solo lectura sobre la copia local (json_extract(data, '$.campo'))"""
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # ---------- escritura ----------
+
+    def _upsert(self, table, rows):
+        column = TABLES[table][0] if table in TABLES else None
+        self._db.executemany(
+            f"insert or replace into {table} (id, sort_key, updated_at, data) values (?, ?, ?, ?)",
+            [(str(r.get("id")), r.get(column) if column else None, r.get("updated_at"),
+              json.dumps(r, default=str)) for r in rows]
+        )
+
+    def apply(self, op):
+        """Refleja una escritura confirmada (mismo formato que SnapshotStore.patch)"""
+        kind, table = op[0], op[1]
+        with self._lock, self._db:
+            if kind == "settings":
+                current = self._db.execute("select data from settings where id = 'main'").fetchone()
+                data = {**(json.loads(current[0]) if current else {"id": "main"}), **op[2]}
+                self._upsert("settings", [data])
+            elif table not in TABLES:
+                return
+            elif kind == "insert":
+                self._upsert(table, op[2] if isinstance(op[2], list) else [op[2]])
+            elif kind == "update":
+                current = self._db.execute(f"select data from {table} where id = ?", (str(op[2]),)).fetchone()
+                if current:
+                    self._upsert(table, [{**json.loads(current[0]), **op[3]}])
+            elif kind == "delete":
+                self._db.execute(f"delete from {table} where id = ?", (str(op[2]),))
+
+    def pull(self, conn):
+        """
+        Trae de Supabase lo que cambió desde la última sincronización.
+
+        Sin lápidas (esquema sin sql/delta_sync.sql) no hay marcas por tabla
+        y cada tabla llega completa y se reemplaza. Si las lápidas fallan con
+        marcas guardadas, las filas son solo cambios: el pull falla entero y
+        la copia queda como estaba.
+
+        Returns:
+            tuple: (tablas que cambiaron, report)
+        """
+        t0 = time.perf_counter()
+        report = _new_report("replica")
+        marks = self.marks()
+        # Sin marcas por tabla todas llegan completas: de las lápidas basta la marca
+        full = not any(marks.get(t) for t in TABLES)
+        tasks = {
+            "settings": lambda: _fetch_settings(conn),
+            TOMBSTONE_TABLE: lambda: _fetch_deletions(conn, marks.get(TOMBSTONE_TABLE), full),
+        }
+        for table in TABLES:
+            tasks[table] = lambda table=table: _fetch_changes(conn, table, marks.get(table))
+        results = _run_parallel(tasks)
+
+        for name, (_, error, seconds) in results.items():
+            report["timings"][name] = seconds
+            if error is not None and name not in ("settings", TOMBSTONE_TABLE):
+                raise error
+
+        deletions, error, _ = results[TOMBSTONE_TABLE]
+        tombstones = error is None
+        if not tombstones and not full:
+            raise error
+        deleted, tomb_mark = deletions if tombstones else ({}, None)
+
+        changed = set()
+        with self._lock, self._db:
+            settings_row = results["settings"][0]
+            if settings_row:
+                self._upsert("settings", [settings_row])
+                changed.add("settings")
+            for table in TABLES:
+                rows = results[table][0]
+                mark = marks.get(table) if tombstones else None
+                if not mark:
+                    # Primera vez, tabla sin updated_at o sin lápidas: se reemplaza completa
+                    self._db.execute(f"delete from {table}")
+                    changed.add(table)
+                gone = deleted.get(table, ())
+                if rows or gone:
+                    changed.add(table)
+                self._upsert(table, rows)
+                self._db.executemany(f"delete from {table} where id = ?", [(str(i),) for i in gone])
+                if tombstones:
+                    self._set_mark(table, _high_water(rows, mark))
+            if tombstones:
+                self._set_mark(TOMBSTONE_TABLE, tomb_mark)
+            self._set_mark("_pulled_at", time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+        report["elapsed"] = time.perf_counter() - t0
+        return changed, report
+
+    def _set_mark(self, name, mark):
+        self._db.execute("insert or replace into sync_marks (name, mark) values (?, ?)", (name, mark))
+
+# ---------- carga del snapshot desde la copia local ----------
+
+def _safe_pull(conn, replica):
+    """Sincroniza; si Supabase no responde se sigue con lo que haya en disco"""
+    try:
+        return replica.pull(conn)
+    except Exception as e:
+        report = _new_report("replica")
+        if replica.is_empty():
+            raise
+        report["errors"].append(("warning", f"⚠️ Sin conexión con Supabase, mostrando la copia local: {e}"))
+        return set(), report
+
+def replica_full_load(conn, replica, tables=None):
+    """Igual que loader.full_load pero leyendo de la copia local (filas completas)"""
+    changed, report = _safe_pull(conn, replica)
+    tables = list(TABLES) if tables is None else [t for t in tables if t in TABLES]
+    db = _empty_db(())
+    db["settings"].update(replica.settings() or {})
+    for table in tables:
+        db[table] = replica.rows(table)
+    report["mode"] = "replica"
+    return db, {}, report
+
+def replica_load_tables(replica, load, widen=None):
+    """Igual que loader.load_tables, sin red"""
+    rows = {t: replica.rows(t) for t in load}
+    extra = {}
+    for t in (widen or {}):
+        extra[t] = replica.settings() if t == "settings" else replica.rows(t)
+    return rows, extra, {}, _new_report("replica")
+
+def replica_delta_load(conn, replica, db):
+    """Sincroniza la copia local y relee solo las tablas cargadas que cambiaron"""
+    changed, report = _safe_pull(conn, replica)
+    db = dict(db)
+    if "settings" in changed:
+        db["settings"] = {**db["settings"], **(replica.settings() or {})}
+    for table in TABLES:
+        if table in db and table in changed:
+            db[table] = replica.rows(table)
+    return db, {}, report
+
+def open_replica():
+    """
+    Copia local configurada con el secreto LOCAL_REPLICA_PATH (ruta del
+    archivo SQLite), o None si no se usa.
+    """
+    try:
+        path = st.secrets.get("LOCAL_REPLICA_PATH")
+    except Exception:
+        path = None
+    if not path:
+        return None
+    try:
+        return LocalReplica(path)
+    except Exception as e:
+        st.warning(f"⚠️ No se pudo abrir la copia local '{path}': {e}")
+        return None
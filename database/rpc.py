@@ -0,0 +1,35 @@
+import threading
+
+# Funciones SQL que el servidor no tiene instaladas (se recuerda por proceso)
+_missing = set()
+_lock = threading.Lock()
+
+class RpcUnavailable(Exception):
+    """La función SQL no existe en Supabase (no se aplicó el script de sql/)"""
+
+def _is_missing_function(error):
+    text = str(error)
+    return "PGRST202" in text or "Could not find the function" in text
+
+def call_rpc(conn, name, params):
+    """
+    Llama una función SQL por RPC.
+
+    Lanza RpcUnavailable si la función no está desplegada para que el llamador
+    use su camino alternativo; los demás errores se propagan tal cual.
+    """
+    if name in _missing:
+        raise RpcUnavailable(name)
+    try:
+        return conn.rpc(name, params).execute().data
+    except Exception as e:
+        if _is_missing_function(e):
+            with _lock:
+                _missing.add(name)
+            raise RpcUnavailable(name) from e
+        raise
+
+def forget_missing_rpcs():
+    """Vuelve a intentar las RPC marcadas como ausentes (tras aplicar un script SQL)"""
+    with _lock:
+        _missing.clear()
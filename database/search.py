@@ -0,0 +1,179 @@
+import heapq
+import unicodedata
+from bisect import bisect_left, insort
+
+from .indexes import id_index
+
+# Búsqueda de productos por nombre, marca, tamaño y notas, sobre texto sin
+# tildes: índice de trigramas (para subcadenas de 3+ letras) y de palabras
+# ordenadas (para ordenar por prefijo). Los términos de 1-2 letras se buscan
+# como subcadena igual que antes: se verifican sobre los candidatos de los
+# demás términos, o recorriendo los textos si la búsqueda es solo de ellos.
+#
+# El índice se arma una vez por versión del snapshot (Snapshot.search_index),
+# como los de database.indexes: las sesiones que leen versiones distintas
+# tienen cada una el suyo y las tablas sin cambios lo heredan.
+
+# Campos indexados de cada producto (notes solo si la vista ya las cargó)
+SEARCH_FIELDS = ("name", "brand", "size_ml", "notes")
+
+def fold(text):
+    """Texto en minúsculas y sin tildes ni diéresis ("Café Ñandú" -> "cafe nandu")"""
+    decomposed = unicodedata.normalize("NFKD", str(text or ""))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+def _trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+def _document(row):
+    parts = []
+    for field in SEARCH_FIELDS:
+        value = row.get(field)
+        if value in (None, ""):
+            continue
+        parts.append(f"{value}ml" if field == "size_ml" else str(value))
+    return fold(" ".join(parts))
+
+class SearchIndex:
+    """Índice de búsqueda de una tabla de productos (id -> texto plegado)"""
+
+    def __init__(self):
+        self._rows = {}
+        self._docs = {}
+        self._words_of = {}
+        self._names = {}
+        self._grams = {}
+        self._words = {}
+        self._sorted_words = []
+
+    def _add(self, record_id, row):
+        doc = _document(row)
+        words = tuple(dict.fromkeys(doc.split()))
+        self._rows[record_id] = row
+        self._docs[record_id] = doc
+        self._words_of[record_id] = words
+        self._names[record_id] = fold(row.get("name"))
+        for word in words:
+            if word not in self._words:
+                self._words[word] = set()
+                insort(self._sorted_words, word)
+            self._words[word].add(record_id)
+            for gram in _trigrams(word):
+                self._grams.setdefault(gram, set()).add(record_id)
+
+    def _remove(self, record_id):
+        self._docs.pop(record_id, None)
+        self._rows.pop(record_id, None)
+        self._names.pop(record_id, None)
+        for word in self._words_of.pop(record_id, ()):
+            ids = self._words.get(word)
+            if ids is not None:
+                ids.discard(record_id)
+                if not ids:
+                    del self._words[word]
+                    del self._sorted_words[bisect_left(self._sorted_words, word)]
+            for gram in _trigrams(word):
+                ids = self._grams.get(gram)
+                if ids is not None:
+                    ids.discard(record_id)
+                    if not ids:
+                        del self._grams[gram]
+
+    def refresh(self, rows):
+        """
+        Pone el índice al día con `rows`, re-indexando solo las filas que no
+        son las mismas (por identidad) que la última vez.
+
+        Returns:
+            int: productos re-indexados o quitados
+        """
+        changed = 0
+        seen = set()
+        for row in rows:
+            record_id = row.get("id")
+            seen.add(record_id)
+            if self._rows.get(record_id) is row:
+                continue
+            if record_id in self._rows:
+                self._remove(record_id)
+            self._add(record_id, row)
+            changed += 1
+        for record_id in [i for i in self._rows if i not in seen]:
+            self._remove(record_id)
+            changed += 1
+        return changed
+
+    def _prefix_ids(self, term):
+        ids = set()
+        i = bisect_left(self._sorted_words, term)
+        while i < len(self._sorted_words) and self._sorted_words[i].startswith(term):
+            ids |= self._words[self._sorted_words[i]]
+            i += 1
+        return ids
+
+    def _postings(self, term):
+        """Conjuntos de ids cuya intersección contiene los que tienen `term` (ninguno si es corto)"""
+        return [self._grams.get(g) or set() for g in _trigrams(term)]
+
+    def _ranker(self, terms):
+        """Clave de orden: (puntaje, largo del nombre, nombre); menor es mejor"""
+        names = self._names
+        # Ids con alguna palabra que empieza por cada término
+        prefixed = [(t, self._prefix_ids(t)) for t in terms]
+
+        def rank(record_id):
+            name = names[record_id]
+            score = 0
+            for term, ids in prefixed:
+                if name.startswith(term):
+                    continue
+                score += 1 if record_id in ids else 2
+            return score, len(name), name
+        return rank
+
+    def search(self, query, limit=None):
+        """
+        Ids que contienen todas las palabras de `query` (como subcadena, sin
+        tildes), los mejores primero: nombre que empieza por el término, luego
+        palabra que empieza por él, luego cualquier coincidencia.
+        """
+        terms = fold(query).split()
+        if not terms:
+            return list(self._rows)[:limit]
+        # Se cruzan los conjuntos de todos los términos, del más chico al más
+        # grande, y solo al final se verifica el texto de los que quedan (los
+        # trigramas pueden coincidir sin que el término esté completo)
+        postings = sorted((p for t in terms for p in self._postings(t)), key=len)
+        ids = set(postings[0]).intersection(*postings[1:]) if postings else self._docs
+        # Un trigrama exacto (término de 3 letras) no necesita verificarse
+        check = [t for t in terms if len(t) != 3]
+        if check:
+            docs = self._docs
+            ids = {i for i in ids if all(t in docs[i] for t in check)}
+        if not ids:
+            return []
+        rank = self._ranker(terms)
+        if limit:
+            return heapq.nsmallest(limit, ids, key=rank)
+        return sorted(ids, key=rank)
+
+def build_search_index(table, rows):
+    """Índice de búsqueda de las filas de una tabla"""
+    index = SearchIndex()
+    index.refresh(rows)
+    return index
+
+def search_index(db, table="inventory"):
+    """Índice de la tabla: cacheado por versión si `db` es un LazyDB, si no se arma al vuelo"""
+    if hasattr(db, "search_index"):
+        return db.search_index(table)
+    return build_search_index(table, db.get(table, []))
+
+def search_ids(db, query, limit=None, table="inventory"):
+    """Ids de los productos que coinciden con `query`, los mejores primero"""
+    return search_index(db, table).search(query, limit)
+
+def search_products(db, query, limit=None):
+    """Productos (filas del snapshot) que coinciden con `query`, los mejores primero"""
+    rows = id_index(db, "inventory")
+    return [rows[i] for i in search_ids(db, query, limit) if i in rows]
@@ -0,0 +1,411 @@
+import threading
+import time
+import streamlit as st
+from .connection import init_connection
+from .loader import (
+    TABLES, FULL_PROFILE, full_load, delta_load, load_tables, profile_columns,
+    widen_rows, _sort_rows, _migrate_rows
+)
+from .replica import open_replica, replica_full_load, replica_load_tables, replica_delta_load
+from .frames import to_frame
+from .models import to_records
+from .dates import DateIndex
+from .indexes import build_id_index
+from .parties import build_party_index
+from .search import build_search_index
+
+# Segundos tras los cuales el snapshot se revalida en segundo plano
+SNAPSHOT_MAX_AGE_SECONDS = 15
+
+class Snapshot:
+    """
+    Copia compartida y de solo lectura de la base de datos en una versión dada.
+
+    Las sesiones reciben `db` por referencia: nunca se modifica en sitio. Cada
+    escritura o refresco publica un Snapshot nuevo con `version` mayor que
+    comparte por referencia las tablas que no cambiaron.
+
+    `columns` dice qué columnas se descargaron de cada tabla (frozenset, o
+    None si se trajeron todas con select *).
+
+    frame() entrega cada tabla en columnas tipadas (database.frames) y
+    records() como registros compactos (database.models), date_index() el
+    índice por fecha (database.dates), id_index() el índice hash por id
+    (database.indexes), party_index() el de clientes y proveedores
+    (database.parties) y search_index() el de búsqueda (database.search),
+    armados una vez por versión; las tablas que no cambiaron los heredan de
+    la versión anterior.
+    """
+
+    def __init__(self, db, marks, version, report=None, columns=None, previous=None):
+        self.db = db
+        self.marks = marks
+        self.version = version
+        self.report = report or {}
+        self.columns = columns or {}
+        self.loaded_at = time.monotonic()
+        # (forma, tabla) -> (lista de filas con la que se armó, resultado)
+        self._derived = {}
+        if previous is not None:
+            self._derived = {k: d for k, d in previous._derived.items() if db.get(k[1]) is d[0]}
+
+    def age(self):
+        return time.monotonic() - self.loaded_at
+
+    def missing_columns(self, table, wanted):
+        """
+        Columnas de `wanted` que aún no están cargadas para la tabla.
+
+        Returns:
+            None si no falta nada, () si hay que traer todas (select *),
+            o la tupla de columnas faltantes
+        """
+        have = self.columns.get(table)
+        if have is None:
+            return None
+        if wanted is None:
+            return ()
+        missing = tuple(c for c in wanted if c not in have)
+        return missing or None
+
+    def covers(self, table, wanted):
+        """True si la tabla está cargada con al menos las columnas pedidas"""
+        return table in self.db and self.missing_columns(table, wanted) is None
+
+    def _derive(self, kind, table, build):
+        rows = self.db.get(table)
+        if rows is None:
+            # Tabla que no se pudo cargar: vacía en esta lectura, sin guardarla
+            return build(table, [])
+        cached = self._derived.get((kind, table))
+        if cached is None or cached[0] is not rows:
+            cached = (rows, build(table, rows))
+            self._derived[(kind, table)] = cached
+        return cached[1]
+
+    def frame(self, table):
+        """DataFrame tipado de una tabla cargada (de solo lectura: no modificar)"""
+        return self._derive("frame", table, to_frame)
+
+    def records(self, table):
+        """Registros (database.models) de una tabla cargada (de solo lectura)"""
+        return self._derive("records", table, to_records)
+
+    def date_index(self, table):
+        """Índice por fecha (database.dates.DateIndex) de una tabla cargada"""
+        return self._derive("dates", table, DateIndex)
+
+    def id_index(self, table):
+        """id -> fila de una tabla cargada"""
+        return self._derive("ids", table, build_id_index)
+
+    def party_index(self, table):
+        """cliente/proveedor normalizado -> filas por fecha, de una tabla cargada"""
+        return self._derive("party", table, build_party_index)
+
+    def search_index(self, table):
+        """Índice de búsqueda (database.search.SearchIndex) de una tabla cargada"""
+        return self._derive("search", table, build_search_index)
+
+def _column_set(columns):
+    return None if columns is None else frozenset(columns)
+
+def _profile_map(profile, tables):
+    """dict tabla -> columnas del perfil, para full_load/load_tables"""
+    return {t: profile_columns(profile, t) for t in ["settings", *tables]}
+
+def _apply_patch(db, op):
+    """Aplica un cambio local a una copia de `db` (copy-on-write por tabla)"""
+    kind, table = op[0], op[1]
+    db = dict(db)
+
+    if kind == "settings":
+        db["settings"] = {**db["settings"], **op[2]}
+        return db
+    if table not in TABLES or table not in db:
+        # Tabla aún no cargada: llegará completa cuando alguien la lea
+        return db
+
+    rows = db[table]
+    if kind == "insert":
+        new_rows = op[2] if isinstance(op[2], list) else [op[2]]
+        new_ids = {r.get("id") for r in new_rows}
+        rows = [r for r in rows if r.get("id") not in new_ids]
+        rows.extend(_migrate_rows(table, [dict(r) for r in new_rows]))
+        _sort_rows(table, rows)
+    elif kind == "update":
+        record_id, data = op[2], op[3]
+        rows = [{**r, **data} if r.get("id") == record_id else r for r in rows]
+    elif kind == "delete":
+        record_id = op[2]
+        rows = [r for r in rows if r.get("id") != record_id]
+    db[table] = rows
+    return db
+
+class SnapshotStore:
+    """
+    Snapshot único por proceso, con stale-while-revalidate.
+
+    Con `replica` (database.replica.LocalReplica) las cargas se leen de la
+    copia SQLite local, que se sincroniza con Supabase antes de cada lectura.
+
+    `overlay` (lo instala database.write_queue) devuelve los cambios de
+    escrituras aún no enviadas; se reaplican sobre cada carga o refresco.
+    """
+
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.overlay = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.RLock()
+        self._snapshot = None
+        self._version = 0
+        self._refreshing = False
+        self._journal = []
+
+    def _publish(self, db, marks, report=None, columns=None):
+        self._version += 1
+        self._snapshot = Snapshot(db, marks, self._version, report, columns, self._snapshot)
+        return self._snapshot
+
+    def current(self):
+        return self._snapshot
+
+    def _with_overlay(self, db):
+        if self.overlay is not None:
+            for op in self.overlay():
+                db = _apply_patch(db, op)
+        return db
+
+    def load(self, conn, tables=None, profile=FULL_PROFILE):
+        """Carga síncrona (primer acceso o tras invalidar); tables=None carga todas"""
+        with self._load_lock:
+            snap = self._snapshot
+            if snap is not None:
+                return snap
+            tables = list(TABLES) if tables is None else [t for t in tables if t in TABLES]
+            if self.replica is not None:
+                # La copia local guarda filas completas
+                db, marks, report = replica_full_load(conn, self.replica, tables)
+                columns = {t: None for t in ["settings", *tables]}
+            else:
+                wanted = _profile_map(profile, tables)
+                db, marks, report = full_load(conn, tables, wanted)
+                columns = {t: _column_set(c) for t, c in wanted.items() if t in db}
+            db = self._with_overlay(db)
+            with self._lock:
+                if self._snapshot is None:
+                    self._journal = []
+                    return self._publish(db, marks, report, columns)
+                return self._snapshot
+
+    def extend(self, conn, tables, profile=FULL_PROFILE):
+        """
+        Agrega al snapshot vigente las tablas que aún no se habían cargado y
+        las columnas del perfil que les falten a las ya cargadas.
+
+        Returns:
+            tuple: (snapshot, report de la carga o None si no faltaba nada)
+        """
+        with self._load_lock:
+            snap = self._snapshot
+            if snap is None:
+                return self.load(conn, tables, profile), None
+            load, widen = {}, {}
+            for t in tables:
+                wanted = profile_columns(profile, t)
+                if t in TABLES and t not in snap.db:
+                    load[t] = wanted
+                    continue
+                missing = snap.missing_columns(t, wanted)
+                if missing is None:
+                    continue
+                if missing == () and t != "settings":
+                    # Hace falta select *: se vuelve a descargar la tabla completa
+                    load[t] = None
+                else:
+                    widen[t] = missing or None
+            if not load and not widen:
+                return snap, None
+            if self.replica is not None:
+                rows, extra, new_marks, report = replica_load_tables(self.replica, load, widen)
+                load = {t: None for t in load}
+                widen = {t: None for t in widen}
+            else:
+                rows, extra, new_marks, report = load_tables(conn, load, widen)
+            with self._lock:
+                snap = self._snapshot
+                if snap is not None:
+                    db, columns = dict(snap.db), dict(snap.columns)
+                    for t, cols in load.items():
+                        if t not in rows:
+                            # Falló la descarga: sigue sin cargar y se reintenta al próximo acceso
+                            continue
+                        db[t] = rows[t]
+                        columns[t] = _column_set(cols)
+                    for t, data in extra.items():
+                        if t == "settings":
+                            db[t] = {**db[t], **(data or {})}
+                        else:
+                            db[t] = widen_rows(db[t], data)
+                        cols, have = widen[t], columns.get(t)
+                        columns[t] = None if cols is None or have is None else have | set(cols)
+                    marks = None if snap.marks is None else {**snap.marks, **new_marks}
+                    self._publish(self._with_overlay(db), marks, snap.report, columns)
+                    self._snapshot.loaded_at = snap.loaded_at
+                    return self._snapshot, report
+            # Se invalidó mientras se descargaba
+            return self.load(conn, tables, profile), report
+
+    def get(self, conn_factory, tables=None, profile=FULL_PROFILE):
+        """Devuelve el snapshot vigente; si está viejo lo revalida en segundo plano"""
+        snap = self._snapshot
+        if snap is None:
+            return self.load(conn_factory(), tables, profile)
+        if snap.age() > SNAPSHOT_MAX_AGE_SECONDS:
+            self.revalidate(conn_factory())
+        return snap
+
+    def revalidate(self, conn):
+        """Lanza un refresco incremental en un hilo si no hay otro en curso"""
+        with self._lock:
+            snap = self._snapshot
+            if self._refreshing or snap is None:
+                return
+            self._refreshing = True
+            self._journal = []
+        threading.Thread(target=self._refresh, args=(conn, snap), daemon=True).start()
+
+    def _refresh(self, conn, base):
+        try:
+            loaded = [t for t in TABLES if t in base.db]
+            if self.replica is not None:
+                db, marks, report = replica_delta_load(conn, self.replica, base.db)
+            elif base.marks:
+                try:
+                    db, marks, report = delta_load(conn, base.db, base.marks, base.columns)
+                except Exception:
+                    db, marks, report = full_load(conn, loaded, base.columns)
+            else:
+                db, marks, report = full_load(conn, loaded, base.columns)
+            with self._lock:
+                if self._snapshot is None:
+                    return
+                # Conservar tablas (o columnas) cargadas bajo demanda durante el
+                # refresco; su marca queda igual y se ponen al día en el siguiente
+                current = self._snapshot
+                columns = dict(base.columns)
+                for table in TABLES:
+                    if table in current.db and (
+                        table not in db or current.columns.get(table) != base.columns.get(table)
+                    ):
+                        db[table] = current.db[table]
+                        columns[table] = current.columns.get(table)
+                        if marks is not None and current.marks is not None:
+                            marks[table] = current.marks.get(table)
+                if current.columns.get("settings") != base.columns.get("settings"):
+                    db["settings"] = {**current.db["settings"], **db["settings"]}
+                    columns["settings"] = current.columns.get("settings")
+                # Reaplicar escrituras sin enviar y las hechas durante el refresco
+                db = self._with_overlay(db)
+                for op in self._journal:
+                    db = _apply_patch(db, op)
+                self._publish(db, marks, report, columns)
+        except Exception:
+            # Se sigue sirviendo el snapshot anterior; se reintenta en la próxima lectura
+            with self._lock:
+                if self._snapshot is not None:
+                    self._snapshot.loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._journal = []
+
+    def patch(self, op, confirmed=True):
+        """
+        Refleja una escritura sin volver a descargar nada.
+
+        Con confirmed=False (lote encolado, aún sin respuesta del servidor) el
+        cambio solo se publica en el snapshot; la copia local lo recibe con
+        confirm() cuando el lote llega.
+        """
+        with self._lock:
+            if confirmed and self.replica is not None:
+                self.replica.apply(op)
+            snap = self._snapshot
+            if snap is None:
+                return
+            if self._refreshing:
+                self._journal.append(op)
+            self._publish(_apply_patch(snap.db, op), snap.marks, snap.report, snap.columns)
+            self._snapshot.loaded_at = snap.loaded_at
+
+    def confirm(self, op):
+        """Pasa a la copia local un cambio ya publicado que el servidor confirmó"""
+        if self.replica is not None:
+            with self._lock:
+                self.replica.apply(op)
+
+    def invalidate(self):
+        """Descarta el snapshot; la próxima lectura hace carga completa"""
+        with self._lock:
+            self._snapshot = None
+            self._journal = []
+
+@st.cache_resource
+def get_snapshot_store():
+    """Almacén de snapshots compartido por todas las sesiones del proceso"""
+    return SnapshotStore(open_replica())
+
+def current_snapshot():
+    """Snapshot vigente (puede ser None si aún no se ha cargado)"""
+    return get_snapshot_store().current()
+
+def local_replica():
+    """Copia SQLite local (LOCAL_REPLICA_PATH) o None si no está configurada"""
+    return get_snapshot_store().replica
+
+def invalidate_snapshot():
+    """Fuerza una carga completa en la próxima lectura"""
+    get_snapshot_store().invalidate()
+
+def load_full_db(incremental=True, profile=FULL_PROFILE, columnar=False):
+    """
+    Carga la base de datos.
+
+    Todas las sesiones del proceso comparten un mismo snapshot de solo lectura.
+    La primera lectura lo descarga completo; después se sirve de memoria y, si
+    tiene más de SNAPSHOT_MAX_AGE_SECONDS, se revalida en segundo plano con
+    sincronización incremental (updated_at + lápidas). Las escrituras de
+    database.records lo actualizan al instante.
+
+    Con incremental=False se descarta el snapshot y se recarga todo.
+    `profile` elige las columnas (ver database.loader.PROFILES); por defecto
+    se traen todas. Con columnar=True cada tabla se entrega como DataFrame
+    tipado (database.frames) en vez de lista de dicts; settings sigue siendo dict.
+    """
+    store = get_snapshot_store()
+    if not incremental:
+        store.invalidate()
+    snap = store.get(init_connection, profile=profile)
+    errors = list(snap.report.get("errors", []))
+    tables = ["settings", *TABLES]
+    if not all(snap.covers(t, profile_columns(profile, t)) for t in tables):
+        # El snapshot venía de una carga perezosa o con otro perfil (ver
+        # database.lazy), o le faltan tablas que no se pudieron cargar
+        snap, report = store.extend(init_connection(), tables, profile)
+        errors += [e for e in (report or {}).get("errors", []) if e not in errors]
+
+    for level, message in errors:
+        getattr(st, level)(message)
+    if columnar:
+        return {"settings": snap.db["settings"], **{t: snap.frame(t) for t in TABLES}}
+    if any(t not in snap.db for t in TABLES):
+        # Las que no se pudieron cargar se entregan vacías sin publicarlas
+        return {**{t: [] for t in TABLES}, **snap.db}
+    return snap.db
+
+def last_load_report():
+    """Modo, tiempos por tabla y duración total de la última carga del snapshot"""
+    snap = current_snapshot()
+    return snap.report if snap is not None else None
@@ -0,0 +1,75 @@
+import streamlit as st
+from .connection import init_connection, reset_connection
+from .rpc import call_rpc, RpcUnavailable
+from .snapshot import get_snapshot_store
+
+# Reintentos del camino alternativo (compare-and-set) ante escrituras concurrentes
+CAS_MAX_RETRIES = 5
+
+class StockConflict(Exception):
+    """Otro vendedor cambió el stock en cada reintento"""
+
+def stock_after(stock, delta, floor=None):
+    """Mismo cálculo que la función SQL adjust_stock (sql/adjust_stock.sql)"""
+    new_stock = int(stock or 0) + int(delta)
+    if floor is not None:
+        new_stock = max(int(floor), new_stock)
+    return new_stock
+
+def _scalar(data):
+    """PostgREST devuelve el escalar solo o dentro de una lista según la versión"""
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if isinstance(data, dict):
+        data = next(iter(data.values()), None)
+    return int(data) if data is not None else None
+
+def _adjust_stock_cas(conn, item_id, delta, floor=None):
+    """
+    Sustituto local de la RPC: lee el stock actual y lo escribe solo si nadie
+    lo cambió entretanto (update ... where stock = valor_leído); si cambió, reintenta.
+    """
+    for _ in range(CAS_MAX_RETRIES):
+        rows = conn.table("inventory").select("stock").eq("id", item_id).limit(1).execute().data
+        if not rows:
+            return None
+        old_stock = rows[0].get("stock")
+        new_stock = stock_after(old_stock, delta, floor)
+        query = conn.table("inventory").update({"stock": new_stock}).eq("id", item_id)
+        query = query.is_("stock", "null") if old_stock is None else query.eq("stock", old_stock)
+        if query.execute().data:
+            return new_stock
+    raise StockConflict(item_id)
+
+def adjust_stock_raw(conn, item_id, delta, floor=None):
+    """Ajuste atómico sin manejo de errores ni caché (usado también por UnitOfWork)"""
+    try:
+        return _scalar(call_rpc(conn, "adjust_stock", {
+            "p_item_id": item_id, "p_delta": int(delta), "p_floor": floor
+        }))
+    except RpcUnavailable:
+        return _adjust_stock_cas(conn, item_id, delta, floor)
+
+def adjust_stock(item_id, delta, floor=None):
+    """
+    Suma `delta` al stock de un producto de forma atómica en el servidor.
+
+    Args:
+        item_id: id del producto
+        delta: unidades a sumar (negativo para descontar)
+        floor: valor mínimo del resultado (ej. 0 para no quedar en negativo)
+
+    Returns:
+        int: stock nuevo (el caché se actualiza con él), o None si falló
+    """
+    try:
+        conn = init_connection()
+        new_stock = adjust_stock_raw(conn, item_id, delta, floor)
+        if new_stock is not None:
+            get_snapshot_store().patch(("update", "inventory", item_id, {"stock": new_stock}))
+        return new_stock
+    except Exception as e:
+        st.error(f"Error al ajustar el stock: {e}")
+        get_snapshot_store().invalidate()
+        reset_connection(e)
+        return None
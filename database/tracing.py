@@ -0,0 +1,213 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from logging.handlers import RotatingFileHandler
+
+# Medición de cada consulta (tiempo, filas, bytes y quién la pidió). Nada aquí
+# llama a `st`: también corre en los hilos de carga y de fondo.
+#
+# Los bytes son los que llegaron por la red (hook de httpx en la sesión de
+# postgrest), sin volver a serializar la respuesta; con un backend local son 0.
+
+# Log rotativo en JSON lines: tamaño máximo por archivo y copias que se guardan
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+# Acciones del constructor de consultas que definen la operación registrada
+_ACTIONS = {"select", "insert", "upsert", "update", "delete"}
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_ROOT_DIR = os.path.dirname(_PACKAGE_DIR)
+
+_log = logging.getLogger("magnus.perf")
+_log.propagate = False
+
+# Traza de la ejecución actual del script y origen heredado por los hilos de carga
+_trace = contextvars.ContextVar("perf_trace", default=None)
+_origin = contextvars.ContextVar("perf_origin", default=None)
+
+class RequestTrace:
+    """Consultas hechas durante una ejecución (rerun) del script"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:8]
+        self.started = time.perf_counter()
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.calls.append(record)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        """Totales por (quién llamó, tabla), de más a menos lento"""
+        groups = {}
+        with self._lock:
+            calls = list(self.calls)
+        for c in calls:
+            g = groups.setdefault((c["caller"], c["table"]), {
+                "caller": c["caller"], "table": c["table"], "calls": 0,
+                "ms": 0.0, "rows": 0, "bytes": 0, "errors": 0
+            })
+            g["calls"] += 1
+            g["ms"] += c["ms"]
+            g["rows"] += c["rows"]
+            g["bytes"] += c["bytes"]
+            g["errors"] += c["error"] is not None
+        return sorted(groups.values(), key=lambda g: g["ms"], reverse=True)
+
+def begin_trace():
+    """Empieza la traza de una ejecución del script (al inicio de app.py)"""
+    trace = RequestTrace()
+    _trace.set(trace)
+    return trace
+
+def current_trace():
+    return _trace.get()
+
+def configure_log(path):
+    """Activa el log rotativo de consultas en `path` (vacío lo desactiva)"""
+    for handler in list(_log.handlers):
+        _log.removeHandler(handler)
+        handler.close()
+    if not path:
+        _log.setLevel(logging.CRITICAL)
+        return
+    handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _log.addHandler(handler)
+    _log.setLevel(logging.INFO)
+
+def _caller():
+    """
+    Quién hizo la consulta: el primer marco de la app fuera de database/
+    (ej. tabs/sales.py:render_sales) y la función de database/ que la emitió.
+    """
+    via = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(_PACKAGE_DIR):
+            if via is None and os.path.basename(path) != "tracing.py":
+                via = f"{os.path.splitext(os.path.basename(path))[0]}.{frame.f_code.co_name}"
+        elif path.startswith(_ROOT_DIR) and "site-packages" not in path:
+            return f"{os.path.relpath(path, _ROOT_DIR)}:{frame.f_code.co_name}", via
+        frame = frame.f_back
+    return _origin.get() or f"[{threading.current_thread().name}]", via
+
+def _run_as(origin, fn):
+    _origin.set(origin)
+    return fn()
+
+def propagate(fn):
+    """
+    Envuelve una tarea para otro hilo (ej. el pool de loader._run_parallel)
+    conservando la traza y el llamador de quien la encargó.
+    """
+    origin = _origin.get() or _caller()[0]
+    context = contextvars.copy_context()
+    return lambda: context.run(_run_as, origin, fn)
+
+# Bytes recibidos por la última respuesta HTTP de cada hilo (ver _on_response)
+_wire = threading.local()
+
+def _on_response(response):
+    """
+    Hook de httpx: anota los bytes que llegaron por la red. Se lee el cuerpo
+    aquí (postgrest lo leería igual enseguida) para contar también las
+    respuestas sin Content-Length.
+    """
+    response.read()
+    # Comprimidos si llegaron así; si no pasó por la red, el largo del cuerpo
+    _wire.bytes = response.num_bytes_downloaded or len(response.content)
+
+def _watch(client):
+    """Instala _on_response en la sesión HTTP de postgrest (se recrea al cambiar la sesión de auth)"""
+    try:
+        hooks = client.postgrest.session.event_hooks["response"]
+    except Exception:
+        # Backend local: no hay red ni bytes que medir
+        return
+    if _on_response not in hooks:
+        hooks.append(_on_response)
+
+def _record(table, op, seconds, data, error, size=None):
+    caller, via = _caller()
+    trace = _trace.get()
+    record = {
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "trace": trace.id if trace else None,
+        "caller": caller,
+        "via": via,
+        "table": table,
+        "op": op,
+        "ms": round(seconds * 1000, 2),
+        "rows": len(data) if isinstance(data, list) else int(data is not None),
+        "bytes": size or 0,
+        "error": None if error is None else str(error)[:200],
+    }
+    if trace is not None:
+        trace.add(record)
+    if _log.handlers:
+        try:
+            _log.info(json.dumps(record, default=str))
+        except Exception:
+            pass
+
+class TracedQuery:
+    """Envuelve un constructor de consultas y mide su execute()"""
+
+    def __init__(self, target, table, op):
+        self._target = target
+        self._table = table
+        self._op = op
+
+    def execute(self, *args, **kwargs):
+        _wire.bytes = None
+        t0 = time.perf_counter()
+        try:
+            response = self._target.execute(*args, **kwargs)
+        except Exception as e:
+            _record(self._table, self._op, time.perf_counter() - t0, None, e, _wire.bytes)
+            raise
+        _record(self._table, self._op, time.perf_counter() - t0, getattr(response, "data", None), None, _wire.bytes)
+        return response
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        op = name if name in _ACTIONS else self._op
+
+        def chain(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return TracedQuery(result, self._table, op) if hasattr(result, "execute") else result
+        return chain
+
+class TracedClient:
+    """Cliente (Supabase o backend local) cuyas consultas quedan medidas"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        _watch(self._client)
+        return TracedQuery(self._client.table(name), name, "select")
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, name, params=None):
+        _watch(self._client)
+        return TracedQuery(self._client.rpc(name, params), name, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
@@ -0,0 +1,291 @@
+import uuid
+import streamlit as st
+from .connection import init_connection, reset_connection, is_transient_error
+from .rpc import call_rpc, RpcUnavailable
+from .snapshot import get_snapshot_store
+from .stock import adjust_stock_raw, stock_after
+from .write_queue import get_write_queue
+
+# Código de Postgres para clave duplicada
+_UNIQUE_VIOLATION = "23505"
+
+def _claim(conn, key):
+    """
+    Registra la clave del lote en applied_batches antes del camino sin RPC.
+
+    Returns:
+        bool: False si el lote ya se había aplicado (reintento de la cola)
+    """
+    try:
+        conn.table("applied_batches").insert({"key": key}).execute()
+        return True
+    except Exception as e:
+        if getattr(e, "code", None) == _UNIQUE_VIOLATION:
+            return False
+        if is_transient_error(e):
+            raise
+        # Sin la tabla (no se aplicó sql/unit_of_work.sql) no hay protección
+        return True
+
+def _release(conn, key):
+    try:
+        conn.table("applied_batches").delete().eq("key", key).execute()
+    except Exception:
+        pass
+
+class PartialWriteError(Exception):
+    """
+    El camino sin RPC falló y no se pudo deshacer todo lo ya escrito.
+    `error` es el fallo original y `failures` las compensaciones que fallaron.
+    """
+
+    def __init__(self, error, failures):
+        super().__init__(
+            f"{error} (no se pudo revertir: {'; '.join(failures)}; revisa los datos)"
+        )
+        self.error = error
+        self.failures = failures
+
+def _select_prior(conn, table, record_id, columns="*"):
+    data = conn.table(table).select(columns).eq("id", record_id).execute().data or []
+    return data[0] if data else None
+
+def _compensate(conn, done):
+    """
+    Deshace, del último al primero, las operaciones ya escritas.
+
+    Returns:
+        list: descripción de las que no se pudieron deshacer
+    """
+    failures = []
+    for op, prior in reversed(done):
+        try:
+            if op["op"] == "insert":
+                ids = [r["id"] for r in op["rows"]]
+                conn.table(op["table"]).delete().in_("id", ids).execute()
+            elif op["op"] == "update" and prior is not None:
+                conn.table(op["table"]).update(prior).eq("id", op["id"]).execute()
+            elif op["op"] == "adjust_stock" and prior:
+                # `prior` es el delta que de verdad se aplicó (el piso puede recortarlo)
+                adjust_stock_raw(conn, op["id"], -prior)
+            elif op["op"] == "delete" and prior is not None:
+                conn.table(op["table"]).upsert(prior, on_conflict="id").execute()
+        except Exception as e:
+            failures.append(f"{op['op']} {op['table']}: {e}")
+    return failures
+
+def _flush_batched(conn, ops, key=None):
+    """
+    Camino sin RPC: las operaciones en orden, una llamada por cada una (los
+    inserts ya vienen agrupados); compensa si algo falla.
+
+    Antes de cada update y delete se leen los valores que tenía el registro,
+    y de los ajustes con piso el stock previo, para poder restaurarlos. Si
+    alguna compensación falla se lanza PartialWriteError.
+
+    Los inserts son upserts por id, así que reenviar el lote no duplica filas.
+
+    Returns:
+        dict: stock nuevo por id de producto ajustado
+    """
+    if key is not None and not _claim(conn, key):
+        return {}
+    done = []
+    stock = {}
+    try:
+        for op in ops:
+            if op["op"] == "insert":
+                conn.table(op["table"]).upsert(op["rows"], on_conflict="id").execute()
+                done.append((op, None))
+            elif op["op"] == "update":
+                prior = _select_prior(conn, op["table"], op["id"], ",".join(op["data"]))
+                conn.table(op["table"]).update(op["data"]).eq("id", op["id"]).execute()
+                done.append((op, prior))
+            elif op["op"] == "adjust_stock":
+                before = None
+                if op["floor"] is not None:
+                    before = (_select_prior(conn, "inventory", op["id"], "stock") or {}).get("stock")
+                new_stock = stock[op["id"]] = adjust_stock_raw(conn, op["id"], op["delta"], op["floor"])
+                applied = op["delta"]
+                if before is not None and new_stock is not None and new_stock == op["floor"]:
+                    applied = int(new_stock) - int(before)
+                done.append((op, applied))
+            elif op["op"] == "delete":
+                prior = _select_prior(conn, op["table"], op["id"])
+                conn.table(op["table"]).delete().eq("id", op["id"]).execute()
+                done.append((op, prior))
+    except Exception as e:
+        failures = _compensate(conn, done)
+        if key is not None:
+            _release(conn, key)
+        if failures:
+            raise PartialWriteError(e, failures) from e
+        raise
+    return stock
+
+def send_ops(conn, ops, key=None):
+    """
+    Envía un lote ya agrupado: por RPC si existe, si no por el camino sin RPC.
+    Con `key` el envío es idempotente (ver sql/unit_of_work.sql).
+
+    Returns:
+        dict: stock nuevo por id de producto ajustado
+    """
+    try:
+        params = {"ops": ops} if key is None else {"ops": ops, "idem_key": key}
+        result = call_rpc(conn, "apply_unit_of_work", params) or {}
+        return result.get("stock", {}) if isinstance(result, dict) else {}
+    except RpcUnavailable:
+        return _flush_batched(conn, ops, key)
+
+class UnitOfWork:
+    """
+    Acumula las escrituras de un envío de formulario y las manda juntas.
+
+    Con la función apply_unit_of_work (sql/unit_of_work.sql) todo viaja en una
+    sola llamada y en una sola transacción. Sin ella se envían en orden, con los
+    inserts seguidos de una misma tabla en un insert masivo y las
+    actualizaciones del mismo registro combinadas; si algo falla se deshace lo
+    ya escrito para no dejar ventas sin su movimiento de stock.
+
+    Si Supabase no responde (o hay lotes anteriores sin enviar), el lote va a
+    la cola de escrituras en disco (database.write_queue) y se reenvía solo;
+    cada UnitOfWork lleva una clave para que el reenvío no duplique nada.
+
+    Ejemplo:
+        uow = UnitOfWork()
+        uow.insert("sales", sale)
+        uow.adjust_stock(prod["id"], -cantidad)
+        if uow.flush():
+            st.rerun()
+    """
+
+    def __init__(self):
+        self.ops = []
+        self.key = uuid.uuid4().hex
+
+    def insert(self, table, data):
+        """Agrega un insert (data debe traer su id)"""
+        self.ops.append({"op": "insert", "table": table, "rows": [dict(data)]})
+
+    def update(self, table, data, record_id):
+        """Agrega una actualización; se combina con escrituras previas del mismo registro"""
+        for op in reversed(self.ops):
+            if op["table"] != table:
+                continue
+            if op["op"] == "insert":
+                row = next((r for r in op["rows"] if r.get("id") == record_id), None)
+                if row is not None:
+                    row.update(data)
+                    return
+            elif op["op"] == "update" and op["id"] == record_id:
+                op["data"].update(data)
+                return
+        self.ops.append({"op": "update", "table": table, "id": record_id, "data": dict(data)})
+
+    def adjust_stock(self, item_id, delta, floor=None):
+        """Agrega un ajuste atómico de stock (ver database.adjust_stock)"""
+        for op in reversed(self.ops):
+            if op["table"] != "inventory":
+                continue
+            if op["op"] == "insert":
+                row = next((r for r in op["rows"] if r.get("id") == item_id), None)
+                if row is not None:
+                    row["stock"] = stock_after(row.get("stock"), delta, floor)
+                    return
+            elif op["op"] == "adjust_stock" and op["id"] == item_id:
+                if op["floor"] is None and floor is None:
+                    op["delta"] += int(delta)
+                    return
+                break
+            elif op.get("id") == item_id:
+                break
+        self.ops.append({"op": "adjust_stock", "table": "inventory", "id": item_id,
+                         "delta": int(delta), "floor": floor})
+
+    def delete(self, table, record_id):
+        """Agrega un borrado por id"""
+        self.ops.append({"op": "delete", "table": table, "id": record_id})
+
+    def _grouped(self):
+        """Las operaciones en el orden en que se pidieron, con los inserts seguidos de una misma tabla en uno solo"""
+        grouped = []
+        for op in self.ops:
+            last = grouped[-1] if grouped else None
+            if op["op"] == "insert" and last and last["op"] == "insert" and last["table"] == op["table"]:
+                last["rows"].extend(op["rows"])
+            elif op["op"] == "insert":
+                grouped.append({"op": "insert", "table": op["table"], "rows": list(op["rows"])})
+            else:
+                grouped.append(op)
+        return grouped
+
+    def _patches(self, ops, store, stock=None):
+        """
+        Cambios para el snapshot. Sin `stock` (lote encolado) el stock nuevo
+        se calcula sobre el snapshot actual.
+        """
+        snap = store.current()
+        inventory = {r.get("id"): r for r in snap.db.get("inventory", [])} if snap else {}
+        local = {}
+        patches = []
+        for op in ops:
+            if op["op"] == "insert":
+                patches.append(("insert", op["table"], op["rows"]))
+            elif op["op"] == "update" and op["table"] == "settings":
+                patches.append(("settings", "settings", op["data"]))
+            elif op["op"] == "update":
+                patches.append(("update", op["table"], op["id"], op["data"]))
+            elif op["op"] == "adjust_stock":
+                if stock is not None:
+                    new_stock = stock.get(str(op["id"]), stock.get(op["id"]))
+                elif op["id"] in inventory or op["id"] in local:
+                    current = local.get(op["id"], inventory.get(op["id"], {}).get("stock"))
+                    new_stock = local[op["id"]] = stock_after(current, op["delta"], op["floor"])
+                else:
+                    new_stock = None
+                if new_stock is not None:
+                    patches.append(("update", "inventory", op["id"], {"stock": int(new_stock)}))
+            elif op["op"] == "delete":
+                patches.append(("delete", op["table"], op["id"]))
+        return patches
+
+    def _enqueue(self, queue, store, ops):
+        patches = self._patches(ops, store)
+        queue.enqueue(self.key, ops, patches)
+        for patch in patches:
+            store.patch(patch, confirmed=False)
+        st.warning("⚠️ Sin conexión con Supabase: el cambio quedó guardado en este equipo y se enviará automáticamente.")
+        self.ops = []
+        return True
+
+    def flush(self, error_message="Error al guardar los cambios"):
+        """
+        Envía todas las escrituras pendientes.
+
+        Returns:
+            bool: True si se guardó todo (o quedó en la cola para reenviarse)
+        """
+        if not self.ops:
+            return True
+        ops = self._grouped()
+        store = get_snapshot_store()
+        queue = get_write_queue()
+        if queue is not None and queue.has_pending():
+            # Hay lotes anteriores sin enviar: este va detrás para respetar el orden
+            return self._enqueue(queue, store, ops)
+        try:
+            conn = init_connection()
+            stock = send_ops(conn, ops, self.key)
+        except Exception as e:
+            reset_connection(e)
+            if queue is not None and is_transient_error(e):
+                return self._enqueue(queue, store, ops)
+            st.error(f"{error_message}: {e}")
+            store.invalidate()
+            return False
+
+        for patch in self._patches(ops, store, stock):
+            store.patch(patch)
+        self.ops = []
+        return True
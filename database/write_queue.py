@@ -0,0 +1,223 @@
+import json
+import sqlite3
+import threading
+import time
+import streamlit as st
+from .connection import background_connection, is_transient_error, reset_connection
+from .snapshot import get_snapshot_store
+
+# Archivo de la cola si no se configura WRITE_QUEUE_PATH (vacío la desactiva)
+DEFAULT_QUEUE_PATH = "write_queue.sqlite3"
+
+# Espera entre reintentos: RETRY_BASE_SECONDS * 2^intentos, hasta RETRY_MAX_SECONDS
+RETRY_BASE_SECONDS = 2
+RETRY_MAX_SECONDS = 300
+
+# Un lote que falla por un error que no es de red se detiene tras estos intentos,
+# y con él los posteriores, hasta que se reintente o se descarte a mano
+MAX_ATTEMPTS = 8
+
+# Cada cuánto revisa la cola el hilo de envío y cuántos lotes manda por ronda
+FLUSH_INTERVAL_SECONDS = 2
+FLUSH_BATCH = 20
+
+class WriteQueue:
+    """
+    Cola durable (SQLite) de escrituras que no se pudieron enviar a Supabase.
+
+    Cada entrada es un lote de UnitOfWork con su clave de idempotencia: al
+    reenviarlo, apply_unit_of_work no repite un lote ya aplicado y los
+    inserts no duplican ids (uid()). Un hilo de fondo envía los lotes en
+    orden, con espera exponencial entre reintentos. Un lote que no se puede
+    enviar ('failed') detiene la cola: los siguientes no lo adelantan.
+
+    `patches` guarda los cambios optimistas que ya se mostraron en el
+    snapshot, para reaplicarlos si se recarga antes de que el lote llegue;
+    a la copia local (database.replica) solo pasan cuando el lote se envía.
+    """
+
+    def __init__(self, path, sender):
+        self.path = path
+        self._send = sender
+        self._lock = threading.Lock()
+        self._thread = None
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("""
+                create table if not exists pending (
+                    seq integer primary key autoincrement,
+                    key text unique not null,
+                    ops text not null,
+                    patches text not null,
+                    status text not null default 'pending',
+                    attempts integer not null default 0,
+                    next_at real not null default 0,
+                    last_error text,
+                    created_at real not null
+                )
+            """)
+
+    def enqueue(self, key, ops, patches):
+        with self._lock, self._db:
+            self._db.execute(
+                "insert or ignore into pending (key, ops, patches, created_at) values (?, ?, ?, ?)",
+                (key, json.dumps(ops, default=str), json.dumps(patches, default=str), time.time())
+            )
+        self.start()
+
+    def has_pending(self):
+        """True si hay lotes sin enviar (pendientes o detenidos por error)"""
+        with self._lock:
+            return self._db.execute("select 1 from pending limit 1").fetchone() is not None
+
+    def blocked(self):
+        """
+        Error del lote que detiene la cola, o None si no hay ninguno.
+
+        Returns:
+            tuple | None: (mensaje de error, lotes esperando detrás de él)
+        """
+        with self._lock:
+            head = self._db.execute(
+                "select seq, last_error from pending where status = 'failed' order by seq limit 1"
+            ).fetchone()
+            if head is None:
+                return None
+            behind = self._db.execute("select count(*) from pending where seq > ?", (head[0],)).fetchone()[0]
+        return head[1], behind
+
+    def stats(self):
+        """Lotes pendientes y detenidos (para el panel de configuración)"""
+        with self._lock:
+            rows = self._db.execute("select status, count(*) from pending group by status").fetchall()
+            last = self._db.execute(
+                "select last_error from pending where last_error is not null order by seq desc limit 1"
+            ).fetchone()
+        counts = dict(rows)
+        return {"pending": counts.get("pending", 0), "failed": counts.get("failed", 0),
+                "last_error": last[0] if last else None}
+
+    def pending_patches(self):
+        """Cambios optimistas de los lotes aún no enviados (también los detenidos), en orden"""
+        with self._lock:
+            rows = self._db.execute("select patches from pending order by seq").fetchall()
+        return [tuple(p) for (data,) in rows for p in json.loads(data)]
+
+    def retry_now(self):
+        """Quita la espera de los lotes pendientes y reactiva los detenidos"""
+        with self._lock, self._db:
+            self._db.execute("update pending set next_at = 0, attempts = 0, status = 'pending'")
+
+    def discard_failed(self):
+        """
+        Descarta los lotes detenidos por error para que la cola siga.
+
+        Returns:
+            int: lotes descartados
+        """
+        with self._lock, self._db:
+            return self._db.execute("delete from pending where status = 'failed'").rowcount
+
+    def _due(self):
+        with self._lock:
+            return self._db.execute(
+                "select seq, key, ops, patches, attempts, next_at, status from pending order by seq limit ?",
+                (FLUSH_BATCH,)
+            ).fetchall()
+
+    def _done(self, seq):
+        with self._lock, self._db:
+            self._db.execute("delete from pending where seq = ?", (seq,))
+
+    def _failed(self, seq, attempts, error):
+        from .unit_of_work import PartialWriteError
+
+        attempts += 1
+        if isinstance(error, PartialWriteError):
+            # Quedó a medias en el servidor: reenviarlo solo no lo arregla
+            status = "failed"
+        else:
+            status = "pending" if is_transient_error(error) or attempts < MAX_ATTEMPTS else "failed"
+        wait = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempts)
+        with self._lock, self._db:
+            self._db.execute(
+                "update pending set attempts = ?, next_at = ?, status = ?, last_error = ? where seq = ?",
+                (attempts, time.time() + wait, status, str(error), seq)
+            )
+
+    def flush_once(self, conn=None):
+        """
+        Envía en orden los lotes pendientes cuyo reintento ya venció, por
+        `conn` o por la conexión del proceso.
+
+        Se detiene en el primer lote que falla, o que ya está detenido, para
+        no adelantar escrituras posteriores (ej. el abono de una venta que aún
+        no llegó).
+
+        Returns:
+            int: lotes enviados
+        """
+        due = self._due()
+        if not due or due[0][6] == "failed" or due[0][5] > time.time():
+            return 0
+        conn = conn or background_connection()
+        if conn is None:
+            return 0
+        sent = 0
+        store = get_snapshot_store()
+        for seq, key, ops, patches, attempts, next_at, status in due:
+            if status == "failed" or next_at > time.time():
+                break
+            try:
+                stock = self._send(conn, json.loads(ops), key)
+            except Exception as e:
+                reset_connection(e)
+                self._failed(seq, attempts, e)
+                break
+            self._done(seq)
+            sent += 1
+            # Confirmado: los cambios que ya se veían pasan a la copia local
+            for patch in json.loads(patches):
+                store.confirm(tuple(patch))
+            for item_id, value in (stock or {}).items():
+                store.patch(("update", "inventory", item_id, {"stock": int(value)}))
+        return sent
+
+    def _run(self):
+        while True:
+            try:
+                self.flush_once()
+            except Exception:
+                pass
+            time.sleep(FLUSH_INTERVAL_SECONDS)
+
+    def start(self):
+        """Arranca el hilo de envío (una vez por proceso)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+@st.cache_resource
+def get_write_queue():
+    """
+    Cola de escrituras del proceso (secreto WRITE_QUEUE_PATH), o None si está
+    desactivada. Engancha sus cambios pendientes al snapshot compartido.
+    """
+    from .unit_of_work import send_ops
+
+    try:
+        path = st.secrets.get("WRITE_QUEUE_PATH", DEFAULT_QUEUE_PATH)
+    except Exception:
+        path = DEFAULT_QUEUE_PATH
+    if not path:
+        return None
+    try:
+        queue = WriteQueue(path, send_ops)
+    except Exception as e:
+        st.warning(f"⚠️ No se pudo abrir la cola de escrituras '{path}': {e}")
+        return None
+    get_snapshot_store().overlay = queue.pending_patches
+    if queue.has_pending():
+        queue.start()
+    return queue
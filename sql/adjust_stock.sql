@@ -0,0 +1,15 @@
+-- Ajuste atómico de stock (database.adjust_stock)
+-- Suma p_delta al stock en una sola sentencia y devuelve el valor nuevo,
+-- así dos vendedores a la vez no pierden actualizaciones.
+-- p_floor (opcional) es el mínimo permitido, ej. 0.
+
+create or replace function adjust_stock(p_item_id text, p_delta integer, p_floor integer default null)
+returns integer as $$
+    update inventory
+       set stock = case
+                       when p_floor is null then coalesce(stock, 0) + p_delta
+                       else greatest(p_floor, coalesce(stock, 0) + p_delta)
+                   end
+     where id::text = p_item_id
+ returning stock;
+$$ language sql;
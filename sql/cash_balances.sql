@@ -0,0 +1,139 @@
+-- Saldos de Caja y Banco mantenidos por triggers (database.cash_balances)
+-- cash_balances tiene una fila por medio y cash_balances_daily el total por
+-- medio y día. Cada insert/update/delete en ventas, abonos, compras al
+-- contado y pagos a proveedores aplica su delta una sola vez (un update
+-- resta la fila vieja y suma la nueva), así leer el saldo es una fila.
+-- Las reglas son las de utils.finance.cash_delta.
+--
+-- rebuild_cash_balances() recalcula todo desde las tablas y devuelve los
+-- saldos antes y después (verificación de consistencia).
+-- Aplicar después de sql/header_metrics.sql: redefine header_metrics().
+
+create table if not exists cash_balances (
+    medio text primary key,
+    amount numeric not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+create table if not exists cash_balances_daily (
+    medio text not null,
+    day text not null,
+    amount numeric not null default 0,
+    primary key (medio, day)
+);
+
+create or replace function cash_movement(tbl text, r jsonb, out medio text, out day text, out amount numeric) as $$
+declare
+    meth text;
+begin
+    day := left(coalesce(r->>'date', ''), 10);
+    if tbl = 'sales' then
+        meth := initcap(trim(coalesce(r->>'payment', '')));
+        if meth not in ('Efectivo', 'Transferencia', 'Tarjeta') then
+            return;
+        end if;
+        amount := coalesce((r->>'quantity')::numeric, 0) * coalesce((r->>'unit_price')::numeric, 0);
+    elsif tbl = 'credit_payments' then
+        meth := initcap(trim(coalesce(r->>'method', '')));
+        amount := coalesce((r->>'amount')::numeric, 0);
+    elsif tbl = 'purchases' then
+        meth := initcap(trim(coalesce(r->>'cash_method', '')));
+        if meth = '' then
+            return;
+        end if;
+        amount := -(coalesce(nullif(trunc((r->>'quantity')::numeric), 0), 1) * coalesce((r->>'unit_cost')::numeric, 0));
+    elsif tbl = 'supplier_payments' then
+        meth := initcap(trim(coalesce(r->>'method', '')));
+        amount := -coalesce((r->>'amount')::numeric, 0);
+    else
+        return;
+    end if;
+    medio := case when meth = 'Efectivo' then 'Caja' else 'Banco' end;
+end;
+$$ language plpgsql immutable;
+
+create or replace function apply_cash_movement(tbl text, r jsonb, sign integer) returns void as $$
+declare
+    m record;
+begin
+    select * into m from cash_movement(tbl, r);
+    if m.medio is null or m.amount = 0 then
+        return;
+    end if;
+    insert into cash_balances (medio, amount) values (m.medio, sign * m.amount)
+    on conflict (medio) do update
+        set amount = cash_balances.amount + excluded.amount, updated_at = now();
+    insert into cash_balances_daily (medio, day, amount) values (m.medio, m.day, sign * m.amount)
+    on conflict (medio, day) do update
+        set amount = cash_balances_daily.amount + excluded.amount;
+end;
+$$ language plpgsql;
+
+create or replace function cash_balances_trigger() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform apply_cash_movement(tg_table_name, to_jsonb(old), -1);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform apply_cash_movement(tg_table_name, to_jsonb(new), 1);
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['sales', 'credit_payments', 'purchases', 'supplier_payments'] loop
+        execute format('drop trigger if exists %I on %I', t || '_cash_balances', t);
+        execute format('create trigger %I after insert or update or delete on %I '
+                       'for each row execute function cash_balances_trigger()', t || '_cash_balances', t);
+    end loop;
+end;
+$$;
+
+create or replace function rebuild_cash_balances() returns jsonb as $$
+declare
+    before jsonb;
+    after jsonb;
+begin
+    lock table cash_balances, cash_balances_daily in exclusive mode;
+    select coalesce(jsonb_object_agg(medio, amount), '{}'::jsonb) into before from cash_balances;
+
+    delete from cash_balances_daily where true;
+    delete from cash_balances where true;
+    insert into cash_balances_daily (medio, day, amount)
+    select m.medio, m.day, sum(m.amount)
+      from (
+            select (cash_movement('sales', to_jsonb(s))).* from sales s
+            union all
+            select (cash_movement('credit_payments', to_jsonb(p))).* from credit_payments p
+            union all
+            select (cash_movement('purchases', to_jsonb(p))).* from purchases p
+            union all
+            select (cash_movement('supplier_payments', to_jsonb(p))).* from supplier_payments p
+           ) m
+     where m.medio is not null
+     group by m.medio, m.day;
+    insert into cash_balances (medio, amount)
+    select medio, sum(amount) from cash_balances_daily group by medio;
+
+    select coalesce(jsonb_object_agg(medio, amount), '{}'::jsonb) into after from cash_balances;
+    return jsonb_build_object('before', before, 'after', after);
+end;
+$$ language plpgsql;
+
+-- Llenado inicial
+select rebuild_cash_balances();
+
+-- El encabezado lee los saldos materializados en vez de recorrer el libro
+create or replace function header_metrics() returns jsonb as $$
+    select jsonb_build_object(
+        'inventory_value', (select coalesce(sum(coalesce(cost, 0)::numeric * coalesce(stock, 0)), 0) from inventory),
+        'cash', coalesce((select amount from cash_balances where medio = 'Caja'), 0),
+        'bank', coalesce((select amount from cash_balances where medio = 'Banco'), 0),
+        'receivable', (select coalesce(sum(coalesce(total, 0)::numeric - coalesce(paid, 0)::numeric), 0) from credits),
+        'open_credits', (select count(*) from credits where coalesce(total, 0)::numeric - coalesce(paid, 0)::numeric > 0)
+    );
+$$ language sql stable;
@@ -0,0 +1,43 @@
+-- Sincronización incremental para database.load_full_db
+-- Agrega la columna updated_at a cada tabla de datos, la mantiene con un trigger
+-- y registra los borrados en la tabla deleted_records (lápidas).
+
+create table if not exists deleted_records (
+    id bigserial primary key,
+    table_name text not null,
+    record_id text not null,
+    deleted_at timestamptz not null default now()
+);
+create index if not exists deleted_records_deleted_at_idx on deleted_records (deleted_at);
+
+create or replace function touch_updated_at() returns trigger as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$ language plpgsql;
+
+create or replace function record_deletion() returns trigger as $$
+begin
+    insert into deleted_records (table_name, record_id) values (tg_table_name, old.id::text);
+    return old;
+end;
+$$ language plpgsql;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array[
+        'inventory', 'purchases', 'sales', 'credits', 'investor',
+        'credit_payments', 'supplier_credits', 'supplier_payments'
+    ] loop
+        execute format('alter table %I add column if not exists updated_at timestamptz not null default now()', t);
+        execute format('create index if not exists %I on %I (updated_at)', t || '_updated_at_idx', t);
+        execute format('drop trigger if exists %I on %I', t || '_touch_updated_at', t);
+        execute format('create trigger %I before insert or update on %I for each row execute function touch_updated_at()', t || '_touch_updated_at', t);
+        execute format('drop trigger if exists %I on %I', t || '_record_deletion', t);
+        execute format('create trigger %I after delete on %I for each row execute function record_deletion()', t || '_record_deletion', t);
+    end loop;
+end;
+$$;
@@ -0,0 +1,38 @@
+-- Totales del encabezado calculados en el servidor (database.header_metrics)
+-- Mismas reglas que utils.finance.cash_bank_balances y utils.credit_saldo:
+--   ventas en Efectivo/Transferencia/Tarjeta entran (Efectivo a Caja, el resto a Banco),
+--   abonos de clientes entran, compras con cash_method y pagos a proveedores salen.
+-- La app recibe un solo objeto JSON en vez de todas las filas.
+
+create or replace view cash_bank_movements as
+    select date::text as date,
+           case when initcap(trim(payment)) = 'Efectivo' then 'Caja' else 'Banco' end as medio,
+           coalesce(quantity, 0)::numeric * coalesce(unit_price, 0)::numeric as amount
+      from sales
+     where initcap(trim(coalesce(payment, ''))) in ('Efectivo', 'Transferencia', 'Tarjeta')
+    union all
+    select date::text,
+           case when initcap(trim(coalesce(method, ''))) = 'Efectivo' then 'Caja' else 'Banco' end,
+           coalesce(amount, 0)::numeric
+      from credit_payments
+    union all
+    select date::text,
+           case when initcap(trim(cash_method)) = 'Efectivo' then 'Caja' else 'Banco' end,
+           -(coalesce(nullif(trunc(quantity::numeric), 0), 1) * coalesce(unit_cost, 0)::numeric)
+      from purchases
+     where trim(coalesce(cash_method, '')) <> ''
+    union all
+    select date::text,
+           case when initcap(trim(coalesce(method, ''))) = 'Efectivo' then 'Caja' else 'Banco' end,
+           -coalesce(amount, 0)::numeric
+      from supplier_payments;
+
+create or replace function header_metrics() returns jsonb as $$
+    select jsonb_build_object(
+        'inventory_value', (select coalesce(sum(coalesce(cost, 0)::numeric * coalesce(stock, 0)), 0) from inventory),
+        'cash', (select coalesce(sum(amount), 0) from cash_bank_movements where medio = 'Caja'),
+        'bank', (select coalesce(sum(amount), 0) from cash_bank_movements where medio = 'Banco'),
+        'receivable', (select coalesce(sum(coalesce(total, 0)::numeric - coalesce(paid, 0)::numeric), 0) from credits),
+        'open_credits', (select count(*) from credits where coalesce(total, 0)::numeric - coalesce(paid, 0)::numeric > 0)
+    );
+$$ language sql stable;
@@ -0,0 +1,24 @@
+-- Logo fuera de settings (database.logo)
+-- La imagen se guarda una vez en logos, identificada por el sha256 de su
+-- contenido; settings.logo_hash apunta a ella. Así leer settings no baja la
+-- imagen y la app la cachea por hash sin tener que invalidarla nunca.
+
+create table if not exists logos (
+    hash text primary key,
+    data text not null,
+    created_at timestamptz not null default now()
+);
+
+alter table settings add column if not exists logo_hash text;
+
+-- Migra el logo existente (base64 en settings.logo_b64)
+insert into logos (hash, data)
+select encode(sha256(decode(logo_b64, 'base64')), 'hex'), logo_b64
+  from settings
+ where logo_b64 is not null and logo_b64 <> ''
+on conflict (hash) do nothing;
+
+update settings
+   set logo_hash = encode(sha256(decode(logo_b64, 'base64')), 'hex'),
+       logo_b64 = null
+ where logo_b64 is not null and logo_b64 <> '';
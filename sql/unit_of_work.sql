@@ -0,0 +1,75 @@
+-- Escrituras agrupadas en una sola transacción (database.UnitOfWork)
+-- ops: [{"op": "insert", "table": t, "rows": [...]},
+--       {"op": "update", "table": t, "id": id, "data": {...}},
+--       {"op": "adjust_stock", "table": "inventory", "id": id, "delta": n, "floor": m|null},
+--       {"op": "delete", "table": t, "id": id}]
+-- Si cualquier operación falla se revierte todo el lote.
+-- Devuelve {"stock": {id: stock_nuevo}} para los ajustes de stock.
+-- Requiere sql/adjust_stock.sql.
+--
+-- idem_key hace el lote idempotente: si ya se aplicó se devuelve el mismo
+-- resultado sin repetir nada (reintentos de la cola de escrituras). Los
+-- inserts tampoco duplican: el id (uid()) existente se ignora.
+
+create table if not exists applied_batches (
+    key text primary key,
+    result jsonb,
+    applied_at timestamptz not null default now()
+);
+
+drop function if exists apply_unit_of_work(jsonb);
+
+create or replace function apply_unit_of_work(ops jsonb, idem_key text default null) returns jsonb as $$
+declare
+    op jsonb;
+    tbl text;
+    rec jsonb;
+    cols text;
+    stock jsonb := '{}'::jsonb;
+    previous jsonb;
+begin
+    if idem_key is not null then
+        select result into previous from applied_batches where key = idem_key;
+        if found then
+            return previous;
+        end if;
+    end if;
+
+    for op in select * from jsonb_array_elements(ops) loop
+        tbl := op->>'table';
+        if tbl not in (
+            'settings', 'inventory', 'purchases', 'sales', 'credits', 'investor',
+            'credit_payments', 'supplier_credits', 'supplier_payments'
+        ) then
+            raise exception 'Tabla no permitida: %', tbl;
+        end if;
+
+        if op->>'op' = 'insert' then
+            for rec in select * from jsonb_array_elements(op->'rows') loop
+                select string_agg(quote_ident(k), ', ') into cols from jsonb_object_keys(rec) as k;
+                execute format('insert into %I (%s) select %s from jsonb_populate_record(null::%I, $1) '
+                               'on conflict (id) do nothing',
+                               tbl, cols, cols, tbl) using rec;
+            end loop;
+        elsif op->>'op' = 'update' then
+            select string_agg(quote_ident(k), ', ') into cols from jsonb_object_keys(op->'data') as k;
+            execute format('update %I set (%s) = (select %s from jsonb_populate_record(null::%I, $1)) where id::text = $2',
+                           tbl, cols, cols, tbl) using op->'data', op->>'id';
+        elsif op->>'op' = 'adjust_stock' then
+            stock := stock || jsonb_build_object(
+                op->>'id',
+                adjust_stock(op->>'id', (op->>'delta')::integer, (op->>'floor')::integer)
+            );
+        elsif op->>'op' = 'delete' then
+            execute format('delete from %I where id::text = $1', tbl) using op->>'id';
+        else
+            raise exception 'Operación no soportada: %', op->>'op';
+        end if;
+    end loop;
+
+    if idem_key is not null then
+        insert into applied_batches (key, result) values (idem_key, jsonb_build_object('stock', stock));
+    end if;
+    return jsonb_build_object('stock', stock);
+end;
+$$ language plpgsql;
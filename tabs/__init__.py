@@ -8,6 +8,7 @@ from .reports import render_reports
 from .suppliers import render_suppliers
 from .cash_bank import render_cash_bank
 from .settings import render_settings
+from .performance import render_performance
 
 __all__ = [
     'render_inventory',
@@ -18,5 +19,6 @@ __all__ = [
     'render_reports',
     'render_suppliers',
     'render_cash_bank',
-    'render_settings'
+    'render_settings',
+    'render_performance'
 ]
\ No newline at end of file
@@ -1,11 +1,13 @@
 import streamlit as st
 import pandas as pd
-from utils import cash_bank_balances, _movements_ledger, cop
+from database import cash_balances
+from utils import _movements_ledger, cop
 
 def render_cash_bank(db):
     st.subheader("Caja y Bancos")
     
-    caja, banco = cash_bank_balances(db)
+    # Saldos mantenidos en el servidor (sql/cash_balances.sql); sin la tabla, suma del libro
+    caja, banco = cash_balances(db)
 
     c1, c2 = st.columns(2)
     c1.metric("Caja (efectivo) — actual", cop(caja))
@@ -2,7 +2,8 @@ import streamlit as st
 import pandas as pd
 from datetime import date
 from collections import defaultdict
-from utils import credit_saldo, apply_customer_payment, uid, build_receipt_pdf, cop
+from database import lazy_db, table_records, row_by_id, party_rows, open_party_credits
+from utils import credit_saldo, apply_customer_payment, uid, receipt_number, build_receipt_pdf, cop
 
 def render_fiados(db):
     # Agregar estilos CSS inline
@@ -45,10 +46,10 @@ def render_fiados(db):
 
     # Calcular resumen por cliente
     per_customer = defaultdict(lambda: {"total": 0.0, "paid": 0.0})
-    for c in db["credits"]:
-        cust = (c.get("customer") or "Cliente").strip()
-        per_customer[cust]["total"] += float(c.get("total", 0))
-        per_customer[cust]["paid"] += float(c.get("paid", 0))
+    for c in table_records(db, "credits"):
+        cust = (c.customer or "Cliente").strip()
+        per_customer[cust]["total"] += c.total
+        per_customer[cust]["paid"] += c.paid
 
     resumen = []
     for cust, vals in per_customer.items():
@@ -165,20 +166,21 @@ def render_fiados(db):
             
             if st.button("Generar Recibo", use_container_width=True, key="btn_reimprimir"):
                 abono_seleccionado = abonos_cliente[abono_seleccionado_idx]
+                # Las notas no vienen en la carga normal: se piden solo para el recibo
+                abono_completo = row_by_id(db.view("full"), "credit_payments",
+                                           abono_seleccionado["id"], abono_seleccionado)
 
                 monto_abono = float(abono_seleccionado.get("amount", 0))
                 fecha_objetivo = abono_seleccionado.get("date", "")
 
                 saldo_actual = sum(
-                    credit_saldo(c) for c in db["credits"]
-                    if c.get("customer","").strip().lower() == cliente_reimprimir.strip().lower()
+                    credit_saldo(c) for c in party_rows(db, "credits", cliente_reimprimir)
                 )
 
                 abonos_posteriores = sum(
                     float(p.get("amount", 0))
-                    for p in db["credit_payments"]
-                    if (p.get("customer","").strip().lower() == cliente_reimprimir.strip().lower())
-                    and p.get("date","") > fecha_objetivo
+                    for p in party_rows(db, "credit_payments", cliente_reimprimir)
+                    if p.get("date","") > fecha_objetivo
                 )
 
                 saldo_despues = saldo_actual + abonos_posteriores
@@ -188,12 +190,10 @@ def render_fiados(db):
                     {"id": c["id"], "date": c.get("date",""), 
                      "applied": min(credit_saldo(c), monto_abono),
                      "remaining": credit_saldo(c)}
-                    for c in db["credits"]
-                    if (c.get("customer","").strip().lower() == cliente_reimprimir.strip().lower())
-                    and credit_saldo(c) > 0
+                    for c in open_party_credits(db, "credits", cliente_reimprimir)
                 ]
 
-                rid = "RC-" + abono_seleccionado.get("id", uid())[-8:]
+                rid = receipt_number("RC-", abono_seleccionado["id"])
                 pdf_bytes = build_receipt_pdf(
                     db, 
                     who_type="CLIENTE", 
@@ -203,7 +203,7 @@ def render_fiados(db):
                     amount=monto_abono,
                     balance_before=saldo_antes,
                     balance_after=saldo_despues,
-                    notes=abono_seleccionado.get("notes", ""),
+                    notes=abono_completo.get("notes", ""),
                     breakdown=snapshot
                 )
                 
@@ -239,26 +239,29 @@ def render_fiados(db):
             ok = st.form_submit_button("Registrar Abono")
 
         if ok and abono > 0:
-            before = sum(credit_saldo(c) for c in db["credits"]
-                         if c.get("customer","").strip().lower() == sel_customer.strip().lower())
+            before = sum(credit_saldo(c) for c in party_rows(db, "credits", sel_customer))
 
             snapshot = [
                 {"id": c["id"], "date": c.get("date",""), "saldo": credit_saldo(c)}
-                for c in db["credits"]
-                if (c.get("customer","").strip().lower() == sel_customer.strip().lower()) 
-                and credit_saldo(c) > 0
+                for c in open_party_credits(db, "credits", sel_customer)
             ]
 
+            payment_id = uid()
             applied = apply_customer_payment(
-                db, sel_customer, abono, fecha_abono.isoformat(), notas_abono, medio_abono
+                db, sel_customer, abono, fecha_abono.isoformat(), notas_abono, medio_abono,
+                payment_id=payment_id
             )
+            if applied is None:
+                st.error("No se pudo registrar el abono.")
+                st.stop()
 
-            after = sum(credit_saldo(c) for c in db["credits"]
-                        if c.get("customer","").strip().lower() == sel_customer.strip().lower())
+            # Saldos después del abono, leídos del snapshot ya actualizado
+            now = lazy_db()
+            after = sum(credit_saldo(c) for c in party_rows(now, "credits", sel_customer))
 
             breakdown = []
             for s in snapshot:
-                cnow = next((c for c in db["credits"] if c["id"] == s["id"]), None)
+                cnow = row_by_id(now, "credits", s["id"])
                 if cnow:
                     before_s = float(s["saldo"])
                     after_s = credit_saldo(cnow)
@@ -269,7 +272,7 @@ def render_fiados(db):
                             "applied": applied_s, "remaining": after_s
                         })
 
-            rid = "RC-" + uid()[-8:]
+            rid = receipt_number("RC-", payment_id)
             pdf_bytes = build_receipt_pdf(
                 db, who_type="CLIENTE", who_name=sel_customer, receipt_id=rid,
                 date_str=fecha_abono.isoformat(), amount=applied,
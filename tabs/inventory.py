@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from database import insert_record, update_record, delete_record
+from database import insert_record, update_record, delete_record, adjust_stock, table_records, search_products
 from utils import uid, cop
 
 def render_inventory(db):
@@ -68,18 +68,17 @@ def render_inventory(db):
     # Búsqueda mejorada
     col_search, col_total = st.columns([3,1])
     with col_search:
-        q = st.text_input("Buscar productos", "", placeholder="Buscar por nombre o marca...")
+        q = st.text_input("Buscar productos", "", placeholder="Buscar por nombre, marca o tamaño...")
     with col_total:
         total_products = len(db["inventory"])
-        total_stock = sum(p.get("stock", 0) for p in db["inventory"])
+        total_stock = sum(p.stock for p in table_records(db, "inventory"))
         st.metric("Total productos", f"{total_products} ({total_stock} und.)")
     
-    # Tabla de inventario
+    # Tabla de inventario (la búsqueda usa el índice de database.search, sin tildes)
     df_inv = pd.DataFrame(db["inventory"])
     if not df_inv.empty:
         if q:
-            mask = df_inv.apply(lambda r: q.lower() in f"{r.get('name','')} {r.get('brand','')}".lower(), axis=1)
-            df_inv = df_inv[mask]
+            df_inv = pd.DataFrame(search_products(db, q), columns=df_inv.columns)
         
         # Calcular valor total del inventario
         if not df_inv.empty:
@@ -91,8 +90,12 @@ def render_inventory(db):
             # Reordenar columnas para mejor visualización
             display_cols = ['name', 'brand', 'size_ml', 'stock', 'cost', 'price', 'valor_stock', 'inv']
             available_cols = [col for col in display_cols if col in df_inv.columns]
+            df_show = df_inv[available_cols]
+            if not q:
+                # Con búsqueda se conserva el orden por relevancia
+                df_show = df_show.sort_values('stock', ascending=False)
             st.dataframe(
-                df_inv[available_cols].sort_values('stock', ascending=False), 
+                df_show, 
                 use_container_width=True,
                 hide_index=True
             )
@@ -106,7 +109,7 @@ def render_inventory(db):
         st.caption("Incrementa o reduce el stock de tus productos rápidamente")
         
         # Filtrar productos con stock bajo
-        low_stock = [p for p in db["inventory"] if p.get("stock", 0) < 5]
+        low_stock = [p for p in table_records(db, "inventory") if p.stock < 5]
         if low_stock:
             st.warning(f"⚠️ {len(low_stock)} producto(s) con stock bajo (menos de 5 unidades)")
         
@@ -124,11 +127,11 @@ def render_inventory(db):
                 c2.metric("Stock", stock_val, delta=None, delta_color="off")
                 
                 if c3.button("➕", key=f"plus_{p['id']}", help="Incrementar stock"):
-                    update_record("inventory", {"stock": int(p.get("stock", 0)) + 1}, p["id"])
+                    adjust_stock(p["id"], 1)
                     st.rerun()
                     
                 if c4.button("➖", key=f"minus_{p['id']}", help="Reducir stock"):
-                    update_record("inventory", {"stock": max(0, int(p.get("stock", 0)) - 1)}, p["id"])
+                    adjust_stock(p["id"], -1, floor=0)
                     st.rerun()
                 
                 if c5.button("✏️", key=f"edit_{p['id']}", help="Editar producto"):
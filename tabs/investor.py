@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 from datetime import date
-from database import insert_record
+from database import insert_record, table_records
 from utils import uid, cop
 
 def render_investor(db):
@@ -44,9 +44,10 @@ def render_investor(db):
     """, unsafe_allow_html=True)
     
     # Calcular métricas del inversionista
-    aportes = sum(float(x.get("amount",0)) for x in db["investor"] if x.get("type") == "Aporte")
-    retiros = sum(float(x.get("amount",0)) for x in db["investor"] if x.get("type") == "Retiro")
-    utilidades_reg = sum(float(x.get("amount",0)) for x in db["investor"] if x.get("type") == "Utilidad")
+    movimientos = table_records(db, "investor")
+    aportes = sum(x.amount for x in movimientos if x.type == "Aporte")
+    retiros = sum(x.amount for x in movimientos if x.type == "Retiro")
+    utilidades_reg = sum(x.amount for x in movimientos if x.type == "Utilidad")
     capital_neto = aportes - retiros
     
     # Mostrar métricas
@@ -194,6 +195,8 @@ def render_investor(db):
     # Historial de movimientos
     st.markdown("### Historial de Movimientos")
     
+    # El historial muestra las notas
+    db.preload("investor", profile="full")
     if db["investor"]:
         df_investor = pd.DataFrame(db["investor"])
         
@@ -223,9 +226,9 @@ def render_investor(db):
         
         col1, col2, col3 = st.columns(3)
         
-        num_aportes = len([x for x in db["investor"] if x.get("type") == "Aporte"])
-        num_retiros = len([x for x in db["investor"] if x.get("type") == "Retiro"])
-        num_utilidades = len([x for x in db["investor"] if x.get("type") == "Utilidad"])
+        num_aportes = sum(1 for x in movimientos if x.type == "Aporte")
+        num_retiros = sum(1 for x in movimientos if x.type == "Retiro")
+        num_utilidades = sum(1 for x in movimientos if x.type == "Utilidad")
         
         with col1:
             st.metric("Total de Aportes", num_aportes)
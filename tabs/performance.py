@@ -0,0 +1,35 @@
+import streamlit as st
+import pandas as pd
+
+def render_performance(trace):
+    """Panel lateral opcional con las consultas de esta ejecución (database.tracing)"""
+    if trace is None or not st.sidebar.toggle("Performance", key="perf_panel"):
+        return
+
+    with st.sidebar:
+        calls = list(trace.calls)
+        total_ms = sum(c["ms"] for c in calls)
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Consultas", len(calls))
+        c2.metric("En consultas", f"{total_ms:,.0f} ms")
+        c3.metric("Ejecución", f"{trace.elapsed() * 1000:,.0f} ms")
+        st.caption(f"Ejecución {trace.id} · tiempos del lado de la app, incluida la red.")
+
+        if not calls:
+            st.info("Esta ejecución no hizo consultas (todo salió del snapshot).")
+            return
+
+        st.markdown("**Por origen y tabla**")
+        df_sum = pd.DataFrame(trace.summary())
+        df_sum["KB"] = (df_sum.pop("bytes") / 1024).round(1)
+        df_sum["ms"] = df_sum["ms"].round(1)
+        st.dataframe(df_sum, use_container_width=True, hide_index=True)
+
+        st.markdown("**Consultas más lentas**")
+        df_calls = pd.DataFrame(calls).sort_values("ms", ascending=False).head(20)
+        df_calls["KB"] = (df_calls.pop("bytes") / 1024).round(1)
+        st.dataframe(
+            df_calls[["ms", "table", "op", "rows", "KB", "caller", "via", "error"]],
+            use_container_width=True,
+            hide_index=True
+        )
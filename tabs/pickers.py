@@ -0,0 +1,81 @@
+import threading
+import streamlit as st
+from database import search_ids, row_by_id
+
+# Productos que se muestran en el selector (los mejores según la búsqueda)
+PICKER_LIMIT = 50
+
+# Búsquedas recordadas por formato de etiqueta dentro de una versión del snapshot
+PICKER_CACHE_QUERIES = 64
+
+# Formato de la etiqueta de cada producto en el selector
+LABELS = {
+    "stock": lambda p: f"{p['name']} — Stock {p.get('stock', 0)}",
+    "brand": lambda p: f"{p['name']} — {p.get('brand', '')}",
+}
+
+# formato -> (versión del snapshot, {búsqueda: (ids, etiquetas)})
+_cache = {}
+_lock = threading.Lock()
+
+def _options(db, query, label):
+    """Ids y etiquetas de los productos a mostrar, una vez por versión y búsqueda"""
+    # La versión se lee con el inventario ya cargado (cargarlo publica otra)
+    db["inventory"]
+    version = getattr(db, "version", None)
+    with _lock:
+        cached = _cache.get(label)
+        if cached and cached[0] == version and query in cached[1]:
+            return cached[1][query]
+
+    fmt = LABELS[label]
+    labels = {}
+    for i in search_ids(db, query, PICKER_LIMIT):
+        prod = row_by_id(db, "inventory", i)
+        if prod is not None:
+            labels[i] = fmt(prod)
+    options = (list(labels), labels)
+
+    if version is not None:
+        with _lock:
+            cached = _cache.get(label)
+            if not cached or cached[0] != version or len(cached[1]) >= PICKER_CACHE_QUERIES:
+                cached = _cache[label] = (version, {})
+            cached[1][query] = options
+    return options
+
+def product_picker(db, key, title="Producto", label="stock", empty=None, help=None):
+    """
+    Buscador + selector de producto que devuelve el id elegido.
+
+    Solo se listan los PICKER_LIMIT mejores resultados de la búsqueda
+    (database.search); sin texto, los primeros del inventario. La elección
+    es por id: dos productos con la misma etiqueta no se confunden.
+
+    Args:
+        key: prefijo de las claves de los widgets
+        label: formato de la etiqueta (ver LABELS)
+        empty: texto de la opción "sin producto" (None = sin esa opción)
+
+    Returns:
+        str | None: id del producto, o None si se eligió `empty`
+    """
+    query = st.text_input(
+        "Buscar producto", "", key=f"{key}_q",
+        placeholder="Nombre, marca o tamaño..."
+    ).strip()
+    ids, labels = _options(db, query, label)
+
+    if query and not ids:
+        st.caption("Sin coincidencias.")
+    elif len(ids) == PICKER_LIMIT:
+        st.caption(f"Mostrando los primeros {PICKER_LIMIT} productos. Escribe para afinar la búsqueda.")
+
+    options = ([None] if empty is not None else []) + ids
+    return st.selectbox(
+        title,
+        options=options,
+        format_func=lambda i: empty if i is None else labels[i],
+        key=key,
+        help=help
+    )
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 from datetime import date
-from database import insert_record, update_record
+from database import UnitOfWork, table_records, row_by_id
+from .pickers import product_picker
 from utils import uid, cop
 
 def render_purchases(db):
@@ -26,14 +27,16 @@ def render_purchases(db):
     if compra_tipo == "Añadir al inventario (perfumes para vender)":
         st.markdown("### Compra de Inventario")
         
-        inv_options = [f"{p['name']} — {p.get('brand','')}" for p in db["inventory"]]
-        opcion = st.selectbox(
-            "Producto del inventario", 
-            options=["(Crear nuevo producto)"] + inv_options,
+        item_id = product_picker(
+            db, "sel_compra",
+            title="Producto del inventario",
+            label="brand",
+            empty="(Crear nuevo producto)",
             help="Selecciona un producto existente o crea uno nuevo"
         )
+        prod_sel = row_by_id(db, "inventory", item_id) if item_id else None
         
-        creando_nuevo = (opcion == "(Crear nuevo producto)")
+        creando_nuevo = prod_sel is None
         
         if creando_nuevo:
             st.markdown("#### Datos del Nuevo Producto")
@@ -43,8 +46,6 @@ def render_purchases(db):
             new_size = c2.number_input("Tamaño (ml)", min_value=0, step=1, value=0, key="new_size_comp")
             new_price = c3.number_input("Precio venta sugerido", min_value=0.0, step=1000.0, value=0.0, format="%.0f", key="new_price_comp")
         else:
-            selected_index = inv_options.index(opcion)
-            prod_sel = db["inventory"][selected_index]
             st.markdown(f"""
                 <div style='background: linear-gradient(135deg, #d9e8ff, #b3d4ff); 
                             padding: 1rem; border-radius: 10px; margin-bottom: 1rem;'>
@@ -103,6 +104,12 @@ def render_purchases(db):
             ok = st.form_submit_button("Registrar Compra", use_container_width=True, type="primary")
         
         if ok:
+            if pago == "Crédito proveedor" and not supplier.strip():
+                st.error("Para crédito proveedor debes indicar el nombre del proveedor.")
+                st.stop()
+            
+            # Todas las escrituras de la compra se envían juntas al final
+            uow = UnitOfWork()
             if creando_nuevo:
                 if not new_name.strip():
                     st.error("El nombre del producto es obligatorio.")
@@ -112,11 +119,10 @@ def render_purchases(db):
                     "size_ml": int(new_size or 0), "cost": float(unit_cost or 0),
                     "price": float(new_price or 0), "stock": 0, "notes": "", "inv": True
                 }
-                insert_record("inventory", new_prod)
+                uow.insert("inventory", new_prod)
                 prod = new_prod
-                db["inventory"].insert(0, new_prod)
             else:
-                prod = db["inventory"][selected_index]
+                prod = prod_sel
             
             purchase_id = uid()
             purchase = {
@@ -127,30 +133,26 @@ def render_purchases(db):
             if pago == "Contado":
                 purchase["cash_method"] = medio_contado
             
-            insert_record("purchases", purchase)
+            uow.insert("purchases", purchase)
             
             # Actualizar stock y costo
-            new_stock = int(prod.get("stock", 0)) + int(quantity)
-            update_data = {"stock": new_stock}
+            uow.adjust_stock(prod["id"], int(quantity))
             if float(unit_cost or 0) > 0:
-                update_data["cost"] = float(unit_cost)
-            update_record("inventory", update_data, prod["id"])
+                uow.update("inventory", {"cost": float(unit_cost)}, prod["id"])
             
             # Crear crédito si es necesario
             if pago == "Crédito proveedor":
-                if not supplier.strip():
-                    st.error("Para crédito proveedor debes indicar el nombre del proveedor.")
-                    st.stop()
                 total = int(quantity) * float(unit_cost or 0)
-                insert_record("supplier_credits", {
+                uow.insert("supplier_credits", {
                     "id": uid(), "supplier": supplier.strip(), "date": pdate.isoformat(),
                     "purchase_id": purchase_id, "invoice": invoice.strip(),
                     "total": float(total), "paid": 0.0,
                     "due_date": due.isoformat() if due else None, "notes": notes.strip()
                 })
             
-            st.success("Compra registrada exitosamente. Inventario actualizado.")
-            st.rerun()
+            if uow.flush():
+                st.success("Compra registrada exitosamente. Inventario actualizado.")
+                st.rerun()
     
     # --- GASTOS OPERATIVOS ---
     else:
@@ -201,6 +203,11 @@ def render_purchases(db):
             ok2 = st.form_submit_button("Registrar Gasto", use_container_width=True, type="primary")
         
         if ok2:
+            if pago == "Crédito proveedor" and not supplier.strip():
+                st.error("Para crédito proveedor debes indicar el nombre del proveedor.")
+                st.stop()
+            
+            uow = UnitOfWork()
             purchase_id = uid()
             purchase = {
                 "id": purchase_id, "date": pdate.isoformat(), "item_id": "",
@@ -212,13 +219,10 @@ def render_purchases(db):
             if pago == "Contado":
                 purchase["cash_method"] = medio_gasto
             
-            insert_record("purchases", purchase)
+            uow.insert("purchases", purchase)
             
             if pago == "Crédito proveedor":
-                if not supplier.strip():
-                    st.error("Para crédito proveedor debes indicar el nombre del proveedor.")
-                    st.stop()
-                insert_record("supplier_credits", {
+                uow.insert("supplier_credits", {
                     "id": uid(), "supplier": supplier.strip(), "date": pdate.isoformat(),
                     "purchase_id": purchase_id, "invoice": invoice.strip(),
                     "total": float(total_gasto or 0), "paid": 0.0,
@@ -226,14 +230,17 @@ def render_purchases(db):
                     "notes": (categoria.strip() + " — " if categoria else "") + notes.strip()
                 })
             
-            st.success("Gasto operativo registrado correctamente.")
-            st.rerun()
+            if uow.flush():
+                st.success("Gasto operativo registrado correctamente.")
+                st.rerun()
     
     st.markdown("<hr style='margin: 2rem 0;'>", unsafe_allow_html=True)
     
     # Historial
     st.markdown("### Historial de Compras y Gastos")
     
+    # El historial muestra las notas (descripción de los gastos)
+    db.preload("purchases", profile="full")
     if db["purchases"]:
         df_purchases = pd.DataFrame(db["purchases"])
         
@@ -244,7 +251,7 @@ def render_purchases(db):
             
             if item_id:
                 # Es una compra de inventario
-                prod = next((p for p in db["inventory"] if p["id"] == item_id), None)
+                prod = row_by_id(db, "inventory", item_id)
                 tipo = "Inventario"
                 descripcion = prod.get("name", "Producto eliminado") if prod else "Producto eliminado"
             else:
@@ -278,10 +285,11 @@ def render_purchases(db):
         st.markdown("<br>", unsafe_allow_html=True)
         col1, col2, col3, col4 = st.columns(4)
         
-        total_compras = sum(p["quantity"] * p["unit_cost"] for p in db["purchases"])
-        compras_inv = sum(p["quantity"] * p["unit_cost"] for p in db["purchases"] if p.get("item_id"))
-        gastos_op = sum(p["quantity"] * p["unit_cost"] for p in db["purchases"] if not p.get("item_id"))
-        total_transacciones = len(db["purchases"])
+        purchases = table_records(db, "purchases")
+        compras_inv = sum(p.total for p in purchases if p.item_id)
+        gastos_op = sum(p.total for p in purchases if not p.item_id)
+        total_compras = compras_inv + gastos_op
+        total_transacciones = len(purchases)
         
         with col1:
             st.metric("Total Compras", cop(total_compras))
@@ -1,6 +1,8 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 from datetime import date
+from database import local_replica, table_frame, to_frame, date_index
 from utils import cop
 
 def render_reports(db):
@@ -13,46 +15,47 @@ def render_reports(db):
         </div>
     """, unsafe_allow_html=True)
     
+    # Solo las columnas que usan los reportes
+    db = db.view("reports")
+    
     # Filtros de Fecha
     st.markdown("### Período de Análisis")
     c1, c2 = st.columns(2)
     ffrom = c1.date_input("Desde", value=date.today().replace(day=1), key="ffrom")
     fto = c2.date_input("Hasta", value=date.today(), key="fto")
 
-    # Filtrado de ventas por rango
-    fsales = [s for s in db["sales"] if ffrom.isoformat() <= s["date"] <= fto.isoformat()]
+    # Filtrado de ventas por rango (en columnas tipadas, ver database.frames)
+    replica = local_replica()
+    if replica is not None:
+        # Con copia local el rango se filtra con SQL sobre el índice de fecha
+        fsales = to_frame("sales", replica.rows("sales", ffrom.isoformat(), fto.isoformat()))
+    else:
+        # Sin copia local, el índice por fecha del snapshot da las filas del período
+        fsales = table_frame(db, "sales").take(date_index(db, "sales").between(ffrom, fto))
     
-    # Lógica interna para determinar si una venta es de "Inversionista"
-    def get_sale_data(sale):
-        prod = next((p for p in db["inventory"] if p["id"] == sale.get("item_id")), None)
-        cost_unit = float(sale.get("cost_at_sale") or (prod["cost"] if prod else 0))
-        
-        is_inv = sale.get("inv")
-        if is_inv is None:
-            is_inv = bool(prod.get("inv")) if prod else False
-            
-        total_venta = float(sale["quantity"] * sale["unit_price"])
-        total_costo = float(sale["quantity"] * cost_unit)
-        return total_venta, total_costo, is_inv
+    # Costo y marca "Inversionista" de cada venta: los de la venta, o si no
+    # los tiene, los del producto
+    inventory = table_frame(db, "inventory").drop_duplicates("id").set_index("id")
+    prod_cost = fsales["item_id"].map(inventory["cost"]).fillna(0.0)
+    prod_inv = fsales["item_id"].map(inventory["inv"]).fillna(False).astype(bool)
+    prod_name = fsales["item_id"].map(inventory["name"]).fillna("N/A")
+    cost_unit = fsales["cost_at_sale"].where(fsales["cost_at_sale"] != 0, prod_cost)
+    is_inv = np.where(fsales["inv"].isna(), prod_inv, fsales["inv"].fillna(False).astype(bool))
 
-    # Cálculos Globales
-    sales_total = 0.0
-    profit_total = 0.0
-    sales_inv = 0.0
-    profit_inv = 0.0
+    total_venta = fsales["quantity"] * fsales["unit_price"]
+    total_costo = fsales["quantity"] * cost_unit
+    utilidad = total_venta - total_costo
 
-    for s in fsales:
-        v_total, c_total, is_inv = get_sale_data(s)
-        sales_total += v_total
-        profit_total += (v_total - c_total)
-        
-        if is_inv:
-            sales_inv += v_total
-            profit_inv += (v_total - c_total)
+    # Cálculos Globales
+    sales_total = float(total_venta.sum())
+    profit_total = float(utilidad.sum())
+    sales_inv = float(total_venta[is_inv].sum())
+    profit_inv = float(utilidad[is_inv].sum())
 
     # Datos del Inversionista
-    aportes = sum(float(x.get("amount",0)) for x in db["investor"] if x.get("type") == "Aporte")
-    retiros = sum(float(x.get("amount",0)) for x in db["investor"] if x.get("type") == "Retiro")
+    investor = table_frame(db, "investor")
+    aportes = float(investor.loc[investor["type"] == "Aporte", "amount"].sum())
+    retiros = float(investor.loc[investor["type"] == "Retiro", "amount"].sum())
     capital_neto = aportes - retiros
     
     investor_pct = db["settings"].get("investor_share", 50) / 100.0
@@ -178,7 +181,7 @@ def render_reports(db):
     
     with col1:
         st.markdown("#### Ventas por Tipo")
-        ventas_inv_count = sum(1 for s in fsales if get_sale_data(s)[2])
+        ventas_inv_count = int(is_inv.sum())
         ventas_no_inv_count = len(fsales) - ventas_inv_count
         sales_no_inv = sales_total - sales_inv
         
@@ -218,31 +221,23 @@ def render_reports(db):
     st.markdown("### Detalle de Ventas del Período")
     
     with st.expander("Ver todas las ventas en detalle", expanded=False):
-        if fsales:
-            df_display = []
-            for sale in fsales:
-                prod = next((p for p in db["inventory"] if p["id"] == sale.get("item_id")), None)
-                v_total, c_total, is_inv = get_sale_data(sale)
-                utilidad = v_total - c_total
-                
-                df_display.append({
-                    "Fecha": sale.get("date", ""),
-                    "Cliente": sale.get("customer", "N/A"),
-                    "Producto": prod.get("name", "N/A") if prod else "N/A",
-                    "Cantidad": sale.get("quantity", 0),
-                    "Precio Unit.": cop(sale.get("unit_price", 0)),
-                    "Total Venta": cop(v_total),
-                    "Costo": cop(c_total),
-                    "Utilidad": cop(utilidad),
-                    "INV": "Sí" if is_inv else "No",
-                    "Pago": sale.get("payment", "N/A")
-                })
-            
-            df_final = pd.DataFrame(df_display)
+        if len(fsales):
+            cantidad = fsales["quantity"]
+            df_final = pd.DataFrame({
+                "Fecha": fsales["date"].dt.strftime("%Y-%m-%d"),
+                "Cliente": fsales["customer"].astype(str),
+                "Producto": prod_name,
+                "Cantidad": cantidad.astype("int64") if (cantidad % 1 == 0).all() else cantidad,
+                "Precio Unit.": fsales["unit_price"].map(cop),
+                "Total Venta": total_venta.map(cop),
+                "Costo": total_costo.map(cop),
+                "Utilidad": utilidad.map(cop),
+                "INV": np.where(is_inv, "Sí", "No"),
+                "Pago": fsales["payment"].astype(str),
+            })
             
             # Ordenar por fecha descendente
-            if not df_final.empty and "Fecha" in df_final.columns:
-                df_final = df_final.sort_values("Fecha", ascending=False)
+            df_final = df_final.sort_values("Fecha", ascending=False)
             
             st.dataframe(df_final, use_container_width=True, hide_index=True)
             
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 from datetime import date
-from database import insert_record, update_record
+from database import UnitOfWork, table_records, row_by_id
+from .pickers import product_picker
 from utils import uid, cop
 
 def render_sales(db):
@@ -14,31 +15,24 @@ def render_sales(db):
         </div>
     """, unsafe_allow_html=True)
     
-    # Preparar opciones de productos
-    options = [f"{p['name']} — Stock {p.get('stock',0)}" for p in db["inventory"]]
-    
-    if not options:
+    if not db["inventory"]:
         st.warning("No hay productos en el inventario. Agrega productos primero en la pestaña de Inventario.")
         return
     
     st.markdown("### Nueva Venta")
     
-    # Selector de producto
-    item_name = st.selectbox(
-        "Selecciona el producto", 
-        options=["Selecciona un producto..."] + options, 
-        key="sel_venta",
+    # Selector de producto (búsqueda en el índice; devuelve el id)
+    item_id = product_picker(
+        db, "sel_venta",
+        title="Selecciona el producto",
+        empty="Selecciona un producto...",
         help="Elige el producto que deseas vender"
     )
 
     with st.form("sale_form", clear_on_submit=True):
-        selected_idx = None
-        prod = None
+        prod = row_by_id(db, "inventory", item_id) if item_id else None
         
-        if item_name != "Selecciona un producto...":
-            selected_idx = options.index(item_name)
-            prod = db["inventory"][selected_idx]
-            
+        if prod:
             # Mostrar información del producto seleccionado
             st.markdown(f"""
                 <div style='background: linear-gradient(135deg, #d9e8ff, #b3d4ff); 
@@ -211,10 +205,9 @@ def render_sales(db):
         ok = st.form_submit_button("Registrar Venta", use_container_width=True, type="primary")
         
         if ok:
-            if selected_idx is None:
+            if prod is None:
                 st.error("Debes seleccionar un producto.")
             else:
-                prod = db["inventory"][selected_idx]
                 qty = int(quantity)
                 stock_disponible = prod.get("stock", 0)
                 
@@ -224,10 +217,12 @@ def render_sales(db):
                 elif auto_purchase and not supplier_name.strip():
                     st.error("⚠️ Debes indicar el nombre del proveedor para la compra automática.")
                 else:
+                    # Todas las escrituras de la venta se envían juntas al final
+                    uow = UnitOfWork()
+                    current_cost = float(prod.get("cost", 0))
+                    
                     # Si hay compra automática, registrarla primero
                     if auto_purchase and stock_disponible < qty:
-                        from database import insert_record as db_insert
-                        
                         faltante = qty - stock_disponible
                         purchase_id = uid()
                         
@@ -242,15 +237,14 @@ def render_sales(db):
                             "notes": f"Compra automática para venta - Cliente: {customer or 'N/A'}",
                             "invoice": ""
                         }
-                        db_insert("purchases", purchase)
+                        uow.insert("purchases", purchase)
                         
                         # Actualizar stock después de la compra
-                        new_stock_after_purchase = stock_disponible + faltante
-                        update_record("inventory", {"stock": new_stock_after_purchase}, prod["id"])
+                        uow.adjust_stock(prod["id"], faltante)
                         
                         # Registrar crédito con proveedor
                         total_deuda_proveedor = faltante * float(purchase_cost)
-                        db_insert("supplier_credits", {
+                        uow.insert("supplier_credits", {
                             "id": uid(),
                             "supplier": supplier_name.strip(),
                             "date": sdate.isoformat(),
@@ -264,14 +258,11 @@ def render_sales(db):
                         
                         # Actualizar costo del producto si es diferente
                         if float(purchase_cost) > 0:
-                            update_record("inventory", {"cost": float(purchase_cost)}, prod["id"])
-                        
-                        # Refrescar datos del producto
-                        prod = next((p for p in db["inventory"] if p["id"] == prod["id"]), prod)
+                            current_cost = float(purchase_cost)
+                            uow.update("inventory", {"cost": current_cost}, prod["id"])
                     
                     # Registrar la venta
                     price = float(unit_price or prod.get("price", 0))
-                    current_cost = float(prod.get("cost", 0))
                     
                     sale = {
                         "id": uid(), 
@@ -286,11 +277,10 @@ def render_sales(db):
                         "inv": bool(inv_flag_sale)
                     }
                     
-                    insert_record("sales", sale)
+                    uow.insert("sales", sale)
 
                     # Actualizar Inventario después de la venta
-                    final_stock = int(prod.get("stock", 0)) - qty
-                    update_record("inventory", {"stock": final_stock}, prod["id"])
+                    uow.adjust_stock(prod["id"], -qty)
 
                     # Registrar Crédito si es Fiado
                     if payment == "Fiado":
@@ -305,16 +295,17 @@ def render_sales(db):
                             "phone": phone or "", 
                             "notes": ""
                         }
-                        insert_record("credits", credit)
+                        uow.insert("credits", credit)
 
-                    profit = (price - current_cost) * qty
-                    
-                    if auto_purchase:
-                        st.success(f"✓ Compra al proveedor y venta registradas exitosamente. Utilidad: {cop(profit)}")
-                    else:
-                        st.success(f"✓ Venta registrada exitosamente. Utilidad: {cop(profit)}")
-                    
-                    st.rerun()
+                    if uow.flush():
+                        profit = (price - current_cost) * qty
+                        
+                        if auto_purchase:
+                            st.success(f"✓ Compra al proveedor y venta registradas exitosamente. Utilidad: {cop(profit)}")
+                        else:
+                            st.success(f"✓ Venta registrada exitosamente. Utilidad: {cop(profit)}")
+                        
+                        st.rerun()
 
     st.markdown("<hr style='margin: 2rem 0;'>", unsafe_allow_html=True)
 
@@ -331,7 +322,7 @@ def render_sales(db):
         # Preparar datos para visualización
         df_display = []
         for _, sale in df_sales.iterrows():
-            prod = next((p for p in db["inventory"] if p["id"] == sale.get("item_id")), None)
+            prod = row_by_id(db, "inventory", sale.get("item_id"))
             prod_name = prod.get("name", "Producto eliminado") if prod else "Producto eliminado"
             
             total = sale.get("quantity", 0) * sale.get("unit_price", 0)
@@ -360,10 +351,10 @@ def render_sales(db):
         
         col1, col2, col3, col4 = st.columns(4)
         
-        total_sales = sum(s["quantity"] * s["unit_price"] for s in db["sales"])
-        total_profit = sum(s["quantity"] * (s["unit_price"] - s.get("cost_at_sale", 0)) 
-                          for s in db["sales"])
-        total_transactions = len(db["sales"])
+        sales = table_records(db, "sales")
+        total_sales = sum(s.total for s in sales)
+        total_profit = sum(s.quantity * (s.unit_price - s.cost_at_sale) for s in sales)
+        total_transactions = len(sales)
         avg_ticket = total_sales / total_transactions if total_transactions > 0 else 0
         
         with col1:
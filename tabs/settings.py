@@ -1,6 +1,9 @@
 import streamlit as st
-import base64
-from database import update_settings
+from database import (
+    update_settings, last_load_report, connection_health, get_write_queue,
+    logo_bytes, save_logo, remove_logo, check_cash_balances, invalidate_snapshot
+)
+from utils import cop
 
 def render_settings(db):
     st.markdown("""
@@ -13,12 +16,11 @@ def render_settings(db):
     """, unsafe_allow_html=True)
     
     # Vista previa del logo actual
-    current_logo = db["settings"].get("logo_b64")
+    current_logo = logo_bytes(db)
     if current_logo:
         st.markdown("### Logo Actual")
         try:
-            logo_data = base64.b64decode(current_logo)
-            st.image(logo_data, width=200, caption="Logo en recibos PDF")
+            st.image(current_logo, width=200, caption="Logo en recibos PDF")
         except Exception:
             st.warning("No se pudo cargar el logo actual.")
         st.markdown("<br>", unsafe_allow_html=True)
@@ -109,9 +111,9 @@ def render_settings(db):
             )
 
         if delete_logo_button:
-            update_settings({"logo_b64": None})
-            st.success("Logo eliminado correctamente.")
-            st.rerun()
+            if remove_logo(db):
+                st.success("Logo eliminado correctamente.")
+                st.rerun()
         
         if save_button:
             update_data = {
@@ -119,20 +121,14 @@ def render_settings(db):
                 "investor_share": investor_share
             }
             
-            # Procesar logo si se subió uno nuevo
+            # Guardar configuración (con el logo nuevo, si se subió uno)
             if logo_file:
-                try:
-                    logo_bytes = logo_file.getvalue()
-                    logo_b64 = base64.b64encode(logo_bytes).decode("utf-8")
-                    update_data["logo_b64"] = logo_b64
-                    st.success("Nuevo logo cargado correctamente.")
-                except Exception as e:
-                    st.error(f"Error al procesar el logo: {e}")
-            
-            # Guardar configuración
-            update_settings(update_data)
-            st.success("Configuración guardada exitosamente.")
-            st.rerun()
+                saved = save_logo(logo_file.getvalue(), update_data)
+            else:
+                saved = update_settings(update_data)
+            if saved:
+                st.success("Configuración guardada exitosamente.")
+                st.rerun()
     
     st.markdown("<hr style='margin: 2rem 0;'>", unsafe_allow_html=True)
     
@@ -179,6 +175,62 @@ def render_settings(db):
             </div>
         """, unsafe_allow_html=True)
     
+    # Estado de la conexión y tiempos de la última carga de datos
+    report = last_load_report()
+    with st.expander("Conexión y tiempos de carga", expanded=False):
+        if st.button("Verificar conexión", key="btn_health"):
+            health = connection_health()
+            if health["ok"]:
+                st.success(f"Conexión con Supabase activa ({health['ms']:.0f} ms).")
+            else:
+                st.error(f"Sin respuesta de Supabase: {health['error']}")
+        queue = get_write_queue()
+        if queue is not None:
+            stats = queue.stats()
+            if stats["pending"] or stats["failed"]:
+                st.warning(f"{stats['pending']} envío(s) pendiente(s) en la cola de escrituras, "
+                           f"{stats['failed']} detenido(s) por error.")
+                if stats["last_error"]:
+                    st.caption(f"Último error: {stats['last_error']}")
+                if st.button("Reintentar ahora", key="btn_retry_queue"):
+                    queue.retry_now()
+                    queue.start()
+                if stats["failed"] and st.button(
+                    "Descartar envíos detenidos", key="btn_discard_queue",
+                    help="Borra los cambios que no se pudieron enviar para que la cola siga"
+                ):
+                    queue.discard_failed()
+                    invalidate_snapshot()
+                    st.rerun()
+            else:
+                st.caption("Cola de escrituras vacía: todo está guardado en Supabase.")
+        if st.button("Verificar saldos de Caja y Banco", key="btn_check_balances",
+                     help="Recalcula los saldos desde las ventas, abonos, compras y pagos"):
+            try:
+                result = check_cash_balances()
+            except Exception as e:
+                st.error(f"Error al verificar los saldos: {e}")
+                result = {}
+            if result is None:
+                st.info("Los saldos se calculan recorriendo el libro (no se aplicó sql/cash_balances.sql).")
+            elif result:
+                before, after = result.get("before", {}), result.get("after", {})
+                diffs = {m: float(after.get(m, 0)) - float(before.get(m, 0)) for m in set(before) | set(after)}
+                if all(abs(d) < 0.005 for d in diffs.values()):
+                    st.success("Los saldos materializados coinciden con el libro.")
+                else:
+                    st.warning("Se corrigieron diferencias: " + ", ".join(
+                        f"{m} {cop(d)}" for m, d in sorted(diffs.items()) if abs(d) >= 0.005
+                    ))
+        if report:
+            modo = "completa" if report.get("mode") == "full" else "incremental"
+            st.caption(f"Última carga {modo}: {report.get('elapsed', 0) * 1000:.0f} ms en total")
+            st.dataframe(
+                [{"Tabla": t, "Tiempo (ms)": round(secs * 1000)} for t, secs in report.get("timings", {}).items()],
+                use_container_width=True,
+                hide_index=True
+            )
+    
     st.markdown("<br>", unsafe_allow_html=True)
     
     # Advertencias y recomendaciones
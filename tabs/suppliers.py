@@ -2,7 +2,8 @@ import streamlit as st
 import pandas as pd
 from datetime import date
 from collections import defaultdict
-from utils import supplier_credit_saldo, apply_supplier_payment, uid, build_receipt_pdf, cop
+from database import lazy_db, table_records, row_by_id, party_rows, open_party_credits, cash_balances
+from utils import supplier_credit_saldo, apply_supplier_payment, uid, receipt_number, build_receipt_pdf, cop
 
 def render_suppliers(db):
     # Agregar estilos CSS inline
@@ -45,10 +46,10 @@ def render_suppliers(db):
     
     # Calcular resumen por proveedor
     per_supplier = defaultdict(lambda: {"total": 0.0, "paid": 0.0})
-    for c in db.get("supplier_credits", []):
-        sup = (c.get("supplier") or "Proveedor").strip()
-        per_supplier[sup]["total"] += float(c.get("total", 0))
-        per_supplier[sup]["paid"] += float(c.get("paid", 0))
+    for c in table_records(db, "supplier_credits"):
+        sup = (c.supplier or "Proveedor").strip()
+        per_supplier[sup]["total"] += c.total
+        per_supplier[sup]["paid"] += c.paid
 
     resumen = []
     for sup, vals in per_supplier.items():
@@ -170,9 +171,12 @@ def render_suppliers(db):
             
             if st.button("Generar Comprobante", use_container_width=True, key="btn_reimprimir_prov"):
                 pago_seleccionado = pagos_proveedor[pago_seleccionado_idx]
+                # Las notas no vienen en la carga normal: se piden solo para el recibo
+                pago_completo = row_by_id(db.view("full"), "supplier_payments",
+                                          pago_seleccionado["id"], pago_seleccionado)
                 
-                saldo_despues = sum(supplier_credit_saldo(c) for c in db["supplier_credits"]
-                                   if c.get("supplier","").strip().lower() == proveedor_reimprimir.strip().lower())
+                saldo_despues = sum(supplier_credit_saldo(c)
+                                    for c in party_rows(db, "supplier_credits", proveedor_reimprimir))
                 
                 monto_pago = float(pago_seleccionado.get("amount", 0))
                 saldo_antes = saldo_despues + monto_pago
@@ -181,12 +185,10 @@ def render_suppliers(db):
                     {"id": c["id"], "date": c.get("date",""), 
                      "applied": min(supplier_credit_saldo(c), monto_pago),
                      "remaining": supplier_credit_saldo(c)}
-                    for c in db["supplier_credits"]
-                    if (c.get("supplier","").strip().lower() == proveedor_reimprimir.strip().lower())
-                    and supplier_credit_saldo(c) > 0
+                    for c in open_party_credits(db, "supplier_credits", proveedor_reimprimir)
                 ]
                 
-                rid = "RP-" + pago_seleccionado.get("id", uid())[-8:]
+                rid = receipt_number("RP-", pago_seleccionado["id"])
                 pdf_bytes = build_receipt_pdf(
                     db, 
                     who_type="PROVEEDOR", 
@@ -196,7 +198,7 @@ def render_suppliers(db):
                     amount=monto_pago,
                     balance_before=saldo_antes,
                     balance_after=saldo_despues,
-                    notes=pago_seleccionado.get("notes", ""),
+                    notes=pago_completo.get("notes", ""),
                     breakdown=snapshot
                 )
                 
@@ -225,6 +227,8 @@ def render_suppliers(db):
 
     if st.session_state.pdf_data_sup:
         st.success("Pago aplicado exitosamente. Descarga el comprobante.")
+        if st.session_state.get("pdf_warning_sup"):
+            st.warning(st.session_state.pdf_warning_sup)
         
         st.download_button(
             "Descargar comprobante (PDF)",
@@ -237,11 +241,12 @@ def render_suppliers(db):
         if st.button("Cerrar y continuar", use_container_width=True):
             st.session_state.pdf_data_sup = None
             st.session_state.pdf_filename_sup = None
+            st.session_state.pdf_warning_sup = None
             st.rerun()
         
         return
 
-    clientes = sorted(list(per_supplier.keys()))
+    suppliers = sorted(list(per_supplier.keys()))
     
     if suppliers:
         sel_supplier = st.selectbox(
@@ -260,9 +265,8 @@ def render_suppliers(db):
             </div>
         """, unsafe_allow_html=True)
         
-        # Importar función de saldos de caja y banco
-        from finance import cash_bank_balances
-        saldo_caja, saldo_banco = cash_bank_balances(db)
+        # Saldos de caja y banco (los mismos del encabezado y de Caja y Banco)
+        saldo_caja, saldo_banco = cash_balances(db)
         
         # Mostrar disponibilidad
         col_disp1, col_disp2 = st.columns(2)
@@ -437,42 +441,57 @@ def render_suppliers(db):
                         st.error(f"No hay suficiente en banco. Disponible: {cop(saldo_banco)}")
                         st.stop()
                 
-                before = sum(supplier_credit_saldo(c) for c in db["supplier_credits"]
-                            if (c.get("supplier","").strip().lower() == sel_supplier.strip().lower()))
+                before = sum(supplier_credit_saldo(c) for c in party_rows(db, "supplier_credits", sel_supplier))
 
                 snapshot = [
                     {"id": c["id"], "date": c.get("date",""), "saldo": supplier_credit_saldo(c)}
-                    for c in db["supplier_credits"]
-                    if (c.get("supplier","").strip().lower() == sel_supplier.strip().lower()) 
-                    and supplier_credit_saldo(c) > 0
+                    for c in open_party_credits(db, "supplier_credits", sel_supplier)
                 ]
                 
-                # Aplicar pago(s)
+                # Aplicar pago(s); el recibo se numera con el id del primero
+                payment_id = uid()
+                aviso = None
                 if dividir_pago:
                     # Pago dividido: registrar dos transacciones
+                    applied = 0.0
                     if monto_efectivo > 0:
-                        apply_supplier_payment(db, sel_supplier, monto_efectivo, 
+                        applied = apply_supplier_payment(db, sel_supplier, monto_efectivo, 
                                              fecha_abono.isoformat(), 
                                              notas_abono or "Pago dividido - Efectivo", 
-                                             "Efectivo")
-                    if monto_banco > 0:
-                        apply_supplier_payment(db, sel_supplier, monto_banco, 
+                                             "Efectivo", payment_id=payment_id)
+                    if monto_banco > 0 and applied is not None:
+                        # Sobre el snapshot con el primer pago ya aplicado
+                        applied_banco = apply_supplier_payment(lazy_db(), sel_supplier, monto_banco, 
                                              fecha_abono.isoformat(), 
                                              notas_abono or "Pago dividido - Transferencia", 
-                                             "Transferencia")
-                    applied = monto
+                                             "Transferencia",
+                                             payment_id=None if monto_efectivo > 0 else payment_id)
+                        if applied_banco is None:
+                            if monto_efectivo <= 0:
+                                applied = None
+                            else:
+                                # El efectivo ya quedó guardado: el recibo es solo por esa parte
+                                aviso = "No se pudo registrar la parte por transferencia; el comprobante cubre solo el efectivo."
+                                monto_banco = 0.0
+                        else:
+                            applied += applied_banco
                 else:
                     # Pago simple
                     applied = apply_supplier_payment(db, sel_supplier, monto, 
                                                     fecha_abono.isoformat(), 
-                                                    notas_abono, medio_pago_sup)
+                                                    notas_abono, medio_pago_sup,
+                                                    payment_id=payment_id)
+                if applied is None:
+                    st.error("No se pudo registrar el pago.")
+                    st.stop()
                 
-                after = sum(supplier_credit_saldo(c) for c in db["supplier_credits"]
-                           if (c.get("supplier","").strip().lower() == sel_supplier.strip().lower()))
+                # Saldos después del pago, leídos del snapshot ya actualizado
+                now = lazy_db()
+                after = sum(supplier_credit_saldo(c) for c in party_rows(now, "supplier_credits", sel_supplier))
 
                 breakdown = []
                 for s in snapshot:
-                    cnow = next((c for c in db["supplier_credits"] if c["id"] == s["id"]), None)
+                    cnow = row_by_id(now, "supplier_credits", s["id"])
                     if cnow:
                         before_s = float(s["saldo"])
                         after_s = supplier_credit_saldo(cnow)
@@ -484,9 +503,9 @@ def render_suppliers(db):
                             })
 
                 # Generar recibo PDF (solo uno, aunque sea pago dividido)
-                rid = "RP-" + uid()[-8:]
+                rid = receipt_number("RP-", payment_id)
                 nota_pdf = notas_abono
-                if dividir_pago:
+                if dividir_pago and monto_banco > 0:
                     nota_pdf = f"Pago dividido: {cop(monto_efectivo)} Efectivo + {cop(monto_banco)} Transferencia"
                 
                 pdf_bytes = build_receipt_pdf(
@@ -497,6 +516,7 @@ def render_suppliers(db):
                 )
                 
                 st.session_state.pdf_data_sup = pdf_bytes
+                st.session_state.pdf_warning_sup = aviso
                 st.session_state.pdf_filename_sup = f"recibo_pago_proveedor_{sel_supplier}_{fecha_abono.isoformat()}.pdf"
                 st.rerun()
             else:
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# Los paquetes de la app (database, utils) se importan desde la raíz del repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.backends import MemoryBackend, SqliteBackend
+
+@pytest.fixture
+def memory():
+    """Backend en memoria vacío"""
+    return MemoryBackend()
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    """Cada backend local vacío (mismo motor de consultas, distinto almacén)"""
+    if request.param == "memory":
+        return MemoryBackend()
+    return SqliteBackend(str(tmp_path / "db.sqlite3"))
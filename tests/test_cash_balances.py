@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+import pytest
+
+import database.metrics as metrics
+import utils.finance as finance
+from database.backends import LOCAL_TABLES
+from database.lazy import LazyDB
+from database.loader import TABLES
+from database.metrics import cash_balances, check_cash_balances
+from database.snapshot import Snapshot, SnapshotStore
+from utils.finance import _build_balances
+
+def _balances(conn):
+    return {r["medio"]: r["amount"] for r in conn.table("cash_balances").select("medio,amount").execute().data}
+
+def _daily(conn):
+    rows = conn.table("cash_balances_daily").select("medio,day,amount").execute().data
+    return {(r["medio"], r["day"]): r["amount"] for r in rows if r["amount"]}
+
+def _movements(conn):
+    conn.table("sales").insert([
+        {"id": "s1", "date": "2024-01-02T10:00:00", "quantity": 2, "unit_price": 30, "payment": "Efectivo"},
+        {"id": "s2", "date": "2024-01-02", "quantity": 1, "unit_price": 25, "payment": "Crédito"},
+    ]).execute()
+    conn.table("purchases").insert(
+        {"id": "b1", "date": "2024-01-03", "quantity": 2, "unit_cost": 8, "cash_method": "Transferencia"}).execute()
+    conn.table("credit_payments").insert(
+        {"id": "a1", "date": "2024-01-04", "amount": 12, "method": "Transferencia"}).execute()
+
+def test_triggers_keep_the_balances(backend):
+    _movements(backend)
+    assert _balances(backend) == {"Caja": 60, "Banco": -4}
+    # Cambiar el medio de una venta la mueve de Caja a Banco
+    backend.table("sales").update({"payment": "Tarjeta"}).eq("id", "s1").execute()
+    backend.table("credit_payments").delete().eq("id", "a1").execute()
+    assert _balances(backend) == {"Caja": 0, "Banco": 44}
+    assert _daily(backend) == {("Banco", "2024-01-02"): 60, ("Banco", "2024-01-03"): -16}
+
+def test_rebuild_matches_the_triggers(backend):
+    _movements(backend)
+    backend.table("sales").update({"quantity": 3}).eq("id", "s1").execute()
+    before, daily = _balances(backend), _daily(backend)
+    result = backend.rpc("rebuild_cash_balances", {}).execute().data
+    assert result["before"] == result["after"] == before
+    assert _daily(backend) == daily
+
+def _lazy(conn):
+    db = {"settings": {}, **{t: conn.table(t).select("*").execute().data for t in TABLES}}
+    return LazyDB(SnapshotStore(), snap=Snapshot(db, {}, 1))
+
+@pytest.fixture
+def server(monkeypatch, memory):
+    _movements(memory)
+    monkeypatch.setattr(metrics, "init_connection", lambda: memory)
+    monkeypatch.setattr(metrics, "get_write_queue", lambda: None)
+    monkeypatch.setattr(metrics, "_cache", {})
+    monkeypatch.setattr(finance, "_memo", OrderedDict())
+    return memory
+
+def test_cash_balances_read_the_table(server):
+    db = _lazy(server)
+    assert cash_balances(db) == (60.0, -4.0) == _build_balances(db)
+    assert check_cash_balances() == {"before": {"Caja": 60, "Banco": -4}, "after": {"Caja": 60, "Banco": -4}}
+
+def test_without_the_table_the_ledger_is_used(server, monkeypatch):
+    db = _lazy(server)
+    monkeypatch.delitem(LOCAL_TABLES, "cash_balances")
+    assert cash_balances(db) == pytest.approx((60.0, -4.0))
@@ -0,0 +1,34 @@
+from datetime import date
+
+from database.dates import DateIndex, rows_between
+
+ROWS = [
+    {"id": "s1", "date": "2024-03-10T18:00:00"},
+    {"id": "s2", "date": "2024-01-05"},
+    {"id": "s3", "date": None},
+    {"id": "s4", "date": "2024-02-29"},
+    {"id": "s5", "date": "no es fecha"},
+    {"id": "s6", "date": "2024-01-05T08:30:00"},
+]
+
+def test_between_is_inclusive_and_keeps_table_order():
+    index = DateIndex("sales", ROWS)
+    assert index.between("2024-01-05", "2024-02-29") == [1, 3, 5]
+    assert index.between(date(2024, 3, 10), date(2024, 3, 10)) == [0]
+
+def test_open_ended_periods():
+    index = DateIndex("sales", ROWS)
+    assert index.between(start="2024-02-01") == [0, 3]
+    assert index.between(end="2024-01-31") == [1, 5]
+    assert index.between() == [0, 1, 3, 5]
+
+def test_rows_without_a_readable_date_are_left_out():
+    assert len(DateIndex("sales", ROWS)) == 4
+
+def test_inventory_uses_created_at():
+    rows = [{"id": "p1", "created_at": "2024-05-01T00:00:00+00:00"}, {"id": "p2", "date": "2024-05-01"}]
+    assert DateIndex("inventory", rows).between("2024-05-01", "2024-05-01") == [0]
+
+def test_rows_between():
+    db = {"sales": ROWS}
+    assert [r["id"] for r in rows_between(db, "sales", "2024-01-01", "2024-01-31")] == ["s2", "s6"]
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+
+import pytest
+
+import utils.finance as finance
+from utils.finance import _build_balances, _build_ledger, _build_medio_totals, _purchase_units, cash_delta
+
+ROWS = {
+    "sales": [
+        {"id": "s1", "date": "2024-01-02", "quantity": 2, "unit_price": 1000, "payment": "efectivo "},
+        {"id": "s2", "date": "2024-01-03", "quantity": 1, "unit_price": 500, "payment": "Tarjeta"},
+        {"id": "s3", "date": "2024-01-03", "quantity": 1, "unit_price": 700, "payment": "Crédito"},
+    ],
+    "credit_payments": [
+        {"id": "a1", "date": "2024-01-04", "amount": 300, "method": "Transferencia"},
+        {"id": "a2", "date": "2024-01-04", "amount": None, "method": None},
+    ],
+    "purchases": [
+        # Cantidades fraccionarias, cero y nula: todas siguen _purchase_units
+        {"id": "p1", "date": "2024-01-01", "quantity": 0.5, "unit_cost": 40, "cash_method": "Efectivo"},
+        {"id": "p2", "date": "2024-01-01", "quantity": 2.7, "unit_cost": 10, "cash_method": "Transferencia"},
+        {"id": "p3", "date": "2024-01-01", "quantity": 0, "unit_cost": 25, "cash_method": "Efectivo"},
+        {"id": "p4", "date": "2024-01-01", "quantity": None, "unit_cost": 7, "cash_method": "Efectivo"},
+        {"id": "p5", "date": "2024-01-01", "quantity": 3, "unit_cost": 5, "cash_method": ""},
+    ],
+    "supplier_payments": [
+        {"id": "g1", "date": "2024-01-05", "amount": 120, "method": "Efectivo"},
+    ],
+}
+
+@pytest.mark.parametrize("quantity, units", [(None, 1), (0, 1), (0.5, 1), (1, 1), (2.7, 2), (3, 3)])
+def test_purchase_units(quantity, units):
+    assert _purchase_units(quantity) == units
+
+def _ledger_balances(db):
+    totals = {"Caja": 0.0, "Banco": 0.0}
+    for m in _build_ledger(db):
+        totals[m["medio"]] += m["monto"] if m["tipo"] == "Entrada" else -m["monto"]
+    return totals["Caja"], totals["Banco"]
+
+def test_row_and_frame_paths_agree():
+    caja, banco = _build_balances(ROWS)
+    assert _ledger_balances(ROWS) == pytest.approx((caja, banco))
+    # Caja: 2000 - 40 - 25 - 7 - 120; Banco: 500 + 300 - 20
+    assert (caja, banco) == pytest.approx((1808, 780))
+
+def test_medio_totals_match_the_ledger():
+    totals, count = _build_medio_totals(ROWS)
+    ledger = _build_ledger(ROWS)
+    assert count == len(ledger)
+    for (medio, tipo), amount in totals.items():
+        assert amount == pytest.approx(sum(m["monto"] for m in ledger if m["medio"] == medio and m["tipo"] == tipo))
+
+def test_cash_delta_matches_the_frame_path():
+    deltas = [cash_delta(t, r) for t, rows in ROWS.items() for r in rows]
+    caja = sum(d[2] for d in deltas if d and d[0] == "Caja")
+    banco = sum(d[2] for d in deltas if d and d[0] == "Banco")
+    assert (caja, banco) == pytest.approx(_build_balances(ROWS))
+
+class VersionedDB(dict):
+    """Vista de una versión del snapshot (solo lo que usa _memoized)"""
+
+    def __init__(self, rows, version):
+        super().__init__(rows)
+        self.version = version
+
+def test_memo_keeps_recent_versions_apart(monkeypatch):
+    monkeypatch.setattr(finance, "_memo", OrderedDict())
+    builds = []
+    def build(db):
+        builds.append(db.version)
+        return db.version
+    old, new = VersionedDB(ROWS, 1), VersionedDB(ROWS, 2)
+    # Dos sesiones en versiones distintas, alternando: cada versión se arma una vez
+    for _ in range(3):
+        assert finance._memoized(old, "x", build) == 1
+        assert finance._memoized(new, "x", build) == 2
+    assert builds == [1, 2]
+
+def test_memo_evicts_the_least_recently_used(monkeypatch):
+    monkeypatch.setattr(finance, "_memo", OrderedDict())
+    builds = []
+    def build(db):
+        builds.append(db.version)
+        return db.version
+    dbs = [VersionedDB(ROWS, v) for v in range(finance.MEMO_VERSIONS + 1)]
+    for db in dbs:
+        finance._memoized(db, "x", build)
+    assert list(finance._memo) == list(range(1, finance.MEMO_VERSIONS + 1))
+    finance._memoized(dbs[0], "x", build)
+    assert builds == [*range(finance.MEMO_VERSIONS + 1), 0]
@@ -0,0 +1,21 @@
+from database.frames import to_frame
+
+def test_columns_are_typed_with_defaults():
+    df = to_frame("sales", [
+        {"id": "s1", "date": "2024-01-02T10:00:00", "quantity": "2", "unit_price": None, "payment": "Efectivo"},
+        {"id": "s2", "date": "no es fecha", "quantity": "x", "payment": None, "inv": None},
+    ])
+    assert df["quantity"].tolist() == [2.0, 0.0]
+    assert df["unit_price"].tolist() == [0.0, 0.0]
+    assert df["payment"].tolist() == ["Efectivo", ""]
+    assert str(df["date"].iloc[0].date()) == "2024-01-02" and df["date"].isna().iloc[1]
+    # inv: None se distingue de False
+    assert df["inv"].isna().all()
+    # Columnas del esquema que ninguna fila trae
+    assert df["cost_at_sale"].tolist() == [0.0, 0.0]
+
+def test_empty_table_keeps_the_schema():
+    df = to_frame("purchases", [])
+    assert len(df) == 0
+    assert {"date", "quantity", "unit_cost", "cash_method", "id"} <= set(df.columns)
+    assert str(df["quantity"].dtype) == "float64"
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import utils.helpers as helpers
+from utils.helpers import receipt_number, uid
+
+def test_uid_format():
+    value = uid()
+    assert value.isdigit() and len(value) == 26
+    # Prefijo: microsegundos desde epoch
+    assert abs(int(value[:16]) - time.time_ns() // 1000) < 10 ** 7
+    assert value[16:] == helpers._UID_NODE
+
+def test_uid_is_unique_and_increasing():
+    ids = [uid() for _ in range(20000)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+
+def test_uid_is_unique_across_threads():
+    ids = []
+    def take():
+        ids.extend(uid() for _ in range(2000))
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(ids)) == len(ids) == 16000
+
+def test_uid_does_not_go_back_with_the_clock(monkeypatch):
+    first = uid()
+    monkeypatch.setattr(helpers.time, "time_ns", lambda: 0)
+    assert uid() > first
+
+def test_uid_node_is_random_per_process():
+    # Mismo pid (ej. 1 en cada contenedor): los nodos igual difieren
+    nodes = {helpers._uid_node() for _ in range(50)}
+    assert len(nodes) == 50
+    assert all(len(n) == 10 and n.isdigit() for n in nodes)
+
+def test_legacy_ids_sort_before_new_ones():
+    legacy = str(time.time_ns() // 1000 - 1)
+    assert len(legacy) == 16 and legacy < uid()
+
+def test_receipt_number_uses_the_time_part():
+    payment_id = uid()
+    assert receipt_number("RC-", payment_id) == "RC-" + payment_id[8:16]
+    # Ids anteriores (solo tiempo) o ajenos: últimos 8 caracteres
+    assert receipt_number("RP-", "1700000000123456") == "RP-00123456"
+    assert receipt_number("RP-", "abc-123456789") == "RP-23456789"
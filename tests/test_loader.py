@@ -0,0 +1,140 @@
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+import database.loader as loader
+from database.backends import BackendError, MemoryBackend
+from database.loader import (
+    SYNC_COLUMN, TOMBSTONE_TABLE, _fetch_deletions, _fetch_settings, _fetch_table, delta_load, full_load, iter_pages
+)
+
+class FailingSelect(MemoryBackend):
+    """Backend cuyos select por columnas fallan con el código indicado"""
+
+    def __init__(self, code):
+        super().__init__()
+        self.code = code
+
+    def execute(self, query):
+        if query.action == "select" and query.columns.strip() != "*" and query.table != TOMBSTONE_TABLE:
+            raise BackendError(self.code, "falla el select por columnas")
+        return super().execute(query)
+
+@pytest.fixture(autouse=True)
+def star_only(monkeypatch):
+    """Tablas leídas con select * (vacío en cada prueba)"""
+    tables = set()
+    monkeypatch.setattr(loader, "_STAR_ONLY", tables)
+    return tables
+
+def _tombstones(conn, count, deleted_at="2024-05-01T10:00:00+00:00"):
+    # Varias lápidas con el mismo deleted_at: el id desempata
+    conn.table(TOMBSTONE_TABLE).insert([
+        {"table_name": "sales", "record_id": f"s{i}", "deleted_at": deleted_at} for i in range(count)
+    ]).execute()
+
+@pytest.mark.parametrize("page_size", [1, 2, 5, 1000])
+def test_fetch_deletions_pages_through_ties(backend, page_size):
+    _tombstones(backend, 5)
+    _tombstones(backend, 2, "2024-05-02T10:00:00+00:00")
+    deleted, mark = _fetch_deletions(backend, None, page_size=page_size)
+    assert deleted == {"sales": {f"s{i}" for i in range(5)}}
+    assert mark == "2024-05-02T10:00:00+00:00"
+
+def test_fetch_deletions_since_mark(memory, monkeypatch):
+    monkeypatch.setattr(loader, "SYNC_OVERLAP_SECONDS", 0)
+    _tombstones(memory, 3)
+    memory.table(TOMBSTONE_TABLE).insert(
+        {"table_name": "credits", "record_id": "c1", "deleted_at": "2024-06-01T00:00:00+00:00"}).execute()
+    deleted, mark = _fetch_deletions(memory, "2024-05-15T00:00:00+00:00", page_size=2)
+    assert deleted == {"credits": {"c1"}}
+    assert mark == "2024-06-01T00:00:00+00:00"
+
+def test_full_load_only_reads_the_newest_tombstone(memory):
+    _tombstones(memory, 4)
+    _, marks, _ = full_load(memory, ["sales"])
+    assert marks[TOMBSTONE_TABLE] == "2024-05-01T10:00:00+00:00"
+    assert _fetch_deletions(memory, None, full=True) == ({}, "2024-05-01T10:00:00+00:00")
+
+def test_delta_load_applies_deletions(memory):
+    memory.table("sales").insert([{"id": f"s{i}", "date": "2024-01-01"} for i in range(4)]).execute()
+    db, marks, _ = full_load(memory, ["sales"])
+    memory.table("sales").delete().in_("id", ["s1", "s2"]).execute()
+    db, marks, _ = delta_load(memory, db, marks)
+    assert sorted(r["id"] for r in db["sales"]) == ["s0", "s3"]
+
+def test_fetch_table_projects_columns(memory):
+    memory.table("sales").insert({"id": "s1", "date": "2024-01-01", "quantity": 2, "notes": "largo"}).execute()
+    rows = _fetch_table(memory, "sales", columns=("quantity",))
+    assert set(rows[0]) == {"id", "date", "quantity", SYNC_COLUMN, "inv"}
+
+@pytest.mark.parametrize("code", ["42703", "PGRST204"])
+def test_missing_column_falls_back_to_select_star(star_only, code):
+    conn = FailingSelect(code)
+    conn.table("sales").insert({"id": "s1", "date": "2024-01-01", "notes": "largo"}).execute()
+    conn.table("settings").insert({"id": "main", "currency": "COP"}).execute()
+    assert _fetch_table(conn, "sales", columns=("quantity",))[0]["notes"] == "largo"
+    assert _fetch_settings(conn, ("currency",))["currency"] == "COP"
+    assert star_only == {"sales", "settings"}
+
+def test_transient_error_keeps_the_projection(star_only):
+    conn = FailingSelect("PGRST000")
+    conn.table("sales").insert({"id": "s1", "date": "2024-01-01"}).execute()
+    conn.table("settings").insert({"id": "main"}).execute()
+    with pytest.raises(BackendError):
+        _fetch_table(conn, "sales", columns=("quantity",))
+    with pytest.raises(BackendError):
+        _fetch_settings(conn, ("currency",))
+    assert star_only == set()
+
+def _expected(rows, column, desc):
+    """Orden de referencia: (columna, id) con los nulos al final, como iter_pages"""
+    values = sorted((r for r in rows if r.get(column) is not None),
+                    key=lambda r: (r[column], r["id"]), reverse=desc)
+    nulls = sorted((r for r in rows if r.get(column) is None), key=lambda r: r["id"], reverse=desc)
+    return [r["id"] for r in values + nulls]
+
+def _rows(count, seed=7):
+    """Ventas con muchas fechas repetidas y varias sin fecha"""
+    rnd = random.Random(seed)
+    dates = [None, "2024-01-01", "2024-01-01", "2024-01-02", "2024-01-02T10:00:00", "2024-03-15"]
+    return [{"id": f"{rnd.randrange(10 ** 6):06d}-{i:03d}", "date": rnd.choice(dates), "quantity": i}
+            for i in range(count)]
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 7, 1000])
+@pytest.mark.parametrize("desc", [True, False])
+def test_iter_pages_with_nulls_and_ties(backend, page_size, desc):
+    rows = _rows(60)
+    backend.table("sales").insert(rows).execute()
+    pages = list(iter_pages(backend, "sales", ("date", desc), page_size=page_size))
+    ids = [r["id"] for page in pages for r in page]
+    assert ids == _expected(rows, "date", desc)
+    assert all(len(page) <= page_size for page in pages)
+
+def test_iter_pages_all_nulls(backend):
+    rows = [{"id": f"{i:02d}", "date": None} for i in range(5)]
+    backend.table("sales").insert(rows).execute()
+    ids = [r["id"] for page in iter_pages(backend, "sales", page_size=2) for r in page]
+    assert ids == ["04", "03", "02", "01", "00"]
+
+def test_iter_pages_exact_multiple_of_page_size(backend):
+    rows = [{"id": f"{i:02d}", "date": "2024-01-01"} for i in range(6)]
+    backend.table("sales").insert(rows).execute()
+    pages = list(iter_pages(backend, "sales", page_size=3))
+    assert [len(p) for p in pages] == [3, 3]
+
+def test_iter_pages_since_only_returns_changes(backend):
+    backend.table("sales").insert(_rows(10)).execute()
+    mark = datetime.now(timezone.utc).isoformat()
+    backend.table("sales").update({"quantity": -1}).eq("id", _rows(10)[3]["id"]).execute()
+    changed = [r for page in iter_pages(backend, "sales", since=mark, page_size=2) for r in page]
+    assert [r["quantity"] for r in changed] == [-1]
+
+def test_full_load_leaves_failed_tables_out(memory):
+    memory.table("sales").insert(_rows(3)).execute()
+    del memory._tables["credits"]
+    db, marks, report = full_load(memory, ["sales", "credits"])
+    assert len(db["sales"]) == 3
+    assert "credits" not in db and "credits" not in marks
+    assert any("credits" in message for _, message in report["errors"])
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+
+import pytest
+
+import database.metrics as metrics
+import utils.finance as finance
+from database.lazy import LazyDB
+from database.loader import TABLES
+from database.metrics import _normalize, header_metrics, local_metrics
+from database.snapshot import Snapshot, SnapshotStore
+
+@pytest.fixture(autouse=True)
+def fresh_ledger(monkeypatch):
+    # Las vistas de prueba repiten números de versión: sin libros de otra prueba
+    monkeypatch.setattr(finance, "_memo", OrderedDict())
+
+def _seed(conn):
+    conn.table("inventory").insert([
+        {"id": "p1", "name": "Perfume", "cost": 10.0, "stock": 3},
+        {"id": "p2", "name": "Crema", "cost": 4.5, "stock": None},
+    ]).execute()
+    conn.table("sales").insert([
+        {"id": "s1", "date": "2024-01-02", "quantity": 2, "unit_price": 30, "payment": "Efectivo"},
+        {"id": "s2", "date": "2024-01-03", "quantity": 1, "unit_price": 25, "payment": "Tarjeta"},
+    ]).execute()
+    conn.table("purchases").insert(
+        {"id": "b1", "date": "2024-01-01", "quantity": 0.5, "unit_cost": 8, "cash_method": "Transferencia"}).execute()
+    conn.table("credit_payments").insert(
+        {"id": "a1", "date": "2024-01-04", "amount": 12, "method": "Efectivo"}).execute()
+    conn.table("supplier_payments").insert(
+        {"id": "g1", "date": "2024-01-05", "amount": 7, "method": "Efectivo"}).execute()
+    conn.table("credits").insert([
+        {"id": "c1", "customer": "Ana", "total": 100, "paid": 40},
+        {"id": "c2", "customer": "Luis", "total": 20, "paid": 20},
+    ]).execute()
+
+def _lazy(conn, version=1):
+    """Vista con todas las tablas del backend ya cargadas"""
+    db = {"settings": {}, **{t: conn.table(t).select("*").execute().data for t in TABLES}}
+    return LazyDB(SnapshotStore(), snap=Snapshot(db, {}, version))
+
+@pytest.mark.parametrize("data", [
+    {"inventory_value": 30, "cash": 1, "bank": 2, "receivable": 3, "open_credits": 1},
+    [{"inventory_value": 30, "cash": 1, "bank": 2, "receivable": 3, "open_credits": 1}],
+    {"header_metrics": {"inventory_value": 30, "cash": 1, "bank": 2, "receivable": 3, "open_credits": 1.0}},
+])
+def test_normalize_accepts_every_response_shape(data):
+    assert _normalize(data) == {"inventory_value": 30.0, "cash": 1.0, "bank": 2.0, "receivable": 3.0, "open_credits": 1}
+
+def test_normalize_empty():
+    assert _normalize([]) == {k: 0 for k in metrics.METRIC_KEYS}
+
+def test_server_and_local_metrics_agree(memory):
+    _seed(memory)
+    server = _normalize(memory.rpc("header_metrics", {}).execute().data)
+    local = local_metrics(_lazy(memory))
+    assert server == pytest.approx(local)
+    # Caja: 60 + 12 - 7; Banco: 25 - 8 (compra de 0.5 unidades cobra 1)
+    assert local == pytest.approx({"inventory_value": 30.0, "cash": 65.0, "bank": 17.0,
+                                   "receivable": 60.0, "open_credits": 1})
+
+class PendingQueue:
+    def has_pending(self):
+        return True
+
+@pytest.fixture
+def server(monkeypatch, memory):
+    """header_metrics contra el backend en memoria, sin cola ni caché previa"""
+    _seed(memory)
+    calls = []
+    def connect():
+        calls.append(1)
+        return memory
+    monkeypatch.setattr(metrics, "init_connection", connect)
+    monkeypatch.setattr(metrics, "get_write_queue", lambda: None)
+    monkeypatch.setattr(metrics, "_cache", {})
+    return calls
+
+def test_header_metrics_is_cached_per_version(server, memory):
+    db = _lazy(memory)
+    first = header_metrics(db)
+    assert header_metrics(db) == first and len(server) == 1
+    header_metrics(_lazy(memory, version=2))
+    assert len(server) == 2
+
+def test_pending_writes_use_the_local_totals(server, memory, monkeypatch):
+    monkeypatch.setattr(metrics, "get_write_queue", PendingQueue)
+    db = _lazy(memory)
+    assert header_metrics(db) == pytest.approx(local_metrics(db))
+    assert server == []
@@ -0,0 +1,38 @@
+import pytest
+
+from database.models import RECORD_CLASSES, Credit, Purchase, to_records, table_records
+from database.snapshot import Snapshot
+
+def test_numbers_are_converted_once():
+    credit = Credit({"id": "c1", "customer": None, "total": "150.5", "paid": None, "phone": 3001234567})
+    assert (credit.total, credit.paid, credit.customer, credit.phone) == (150.5, 0.0, "", "3001234567")
+    assert credit.saldo == 150.5
+
+def test_unreadable_numbers_become_zero():
+    item = RECORD_CLASSES["inventory"]({"id": "p1", "stock": "x", "size_ml": "100.0", "cost": "", "inv": None})
+    assert (item.stock, item.size_ml, item.cost) == (0, 100, 0.0)
+    # bool sin tipo: None se distingue de False
+    assert item.inv is None
+
+def test_records_work_where_dicts_are_expected():
+    purchase = Purchase({"id": "b1", "quantity": 3, "unit_cost": 2.5})
+    assert purchase.get("quantity") == 3.0 and purchase["unit_cost"] == 2.5
+    assert purchase.get("missing", "x") == "x"
+    with pytest.raises(KeyError):
+        purchase["missing"]
+    assert purchase.total == 7.5
+    assert purchase.as_dict()["supplier"] == ""
+
+def test_records_are_compact():
+    purchase = Purchase({"id": "b1"})
+    assert not hasattr(purchase, "__dict__")
+
+def test_every_table_has_a_record_class():
+    rows = [{"id": "1", "date": "2024-01-01"}]
+    for table, cls in RECORD_CLASSES.items():
+        assert to_records(table, rows)[0].id == "1" and cls.TABLE == table
+
+def test_records_are_built_once_per_version():
+    snap = Snapshot({"credits": [{"id": "c1", "total": 10, "paid": 4}]}, {}, 1)
+    assert snap.records("credits") is snap.records("credits")
+    assert [c.saldo for c in table_records(snap, "credits")] == [6.0]
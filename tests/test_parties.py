@@ -0,0 +1,35 @@
+from database.parties import build_party_index, open_party_credits, party_key, party_rows
+from database.snapshot import Snapshot
+
+CREDITS = [
+    {"id": "c3", "customer": "Ana", "date": "2024-03-01", "total": 50, "paid": 0},
+    {"id": "c1", "customer": " ana ", "date": "2024-01-01", "total": 100, "paid": 100},
+    {"id": "c2", "customer": "ANA", "date": "2024-02-01", "total": 80, "paid": 30},
+    {"id": "c4", "customer": "Luis", "date": "2024-01-15", "total": 20, "paid": None},
+    {"id": "c5", "customer": None, "date": None, "total": 10, "paid": 0},
+]
+
+def test_party_key_normalizes_names():
+    assert party_key(" Ana ") == party_key("ANA") == "ana"
+    assert party_key(None) == ""
+
+def test_rows_are_grouped_by_name_in_date_order():
+    assert [r["id"] for r in party_rows({"credits": CREDITS}, "credits", "Ana")] == ["c1", "c2", "c3"]
+    assert party_rows({"credits": CREDITS}, "credits", "Nadie") == []
+
+def test_open_credits_skip_paid_ones():
+    db = {"credits": CREDITS}
+    assert [c["id"] for c in open_party_credits(db, "credits", "ana")] == ["c2", "c3"]
+    assert [c["id"] for c in open_party_credits(db, "credits", "luis")] == ["c4"]
+
+def test_index_holds_the_snapshot_rows():
+    index = build_party_index("credits", CREDITS)
+    assert index["ana"][0] is CREDITS[1]
+    assert set(index) == {"ana", "luis", ""}
+
+def test_index_is_built_once_per_version():
+    snap = Snapshot({"credits": CREDITS}, {}, 1)
+    assert snap.party_index("credits") is snap.party_index("credits")
+    paid = [dict(CREDITS[0], paid=50), *CREDITS[1:]]
+    newer = Snapshot({"credits": paid}, {}, 2, previous=snap)
+    assert [c["id"] for c in open_party_credits(newer, "credits", "Ana")] == ["c2"]
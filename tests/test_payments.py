@@ -0,0 +1,50 @@
+import pytest
+
+import database.unit_of_work as unit_of_work
+from database.backends import BackendError, MemoryBackend
+from database.snapshot import SnapshotStore
+from utils.helpers import apply_customer_payment, apply_supplier_payment
+
+class RejectingBackend(MemoryBackend):
+    """Backend que rechaza todos los lotes (error de datos, no de red)"""
+
+    def call(self, name, params):
+        raise BackendError("23514", "lote rechazado")
+
+@pytest.fixture
+def connect(monkeypatch):
+    """Hace que UnitOfWork.flush escriba en el backend dado, sin cola ni Supabase"""
+    def use(conn):
+        monkeypatch.setattr(unit_of_work, "init_connection", lambda: conn)
+        monkeypatch.setattr(unit_of_work, "get_write_queue", lambda: None)
+        monkeypatch.setattr(unit_of_work, "get_snapshot_store", SnapshotStore)
+        return conn
+    return use
+
+def _db(conn, table):
+    return {table: conn.table(table).select("*").execute().data}
+
+def test_payment_applies_fifo(connect, memory):
+    connect(memory).table("credits").insert([
+        {"id": "c1", "customer": "Ana", "date": "2024-01-01", "total": 100.0, "paid": 0.0},
+        {"id": "c2", "customer": "ana ", "date": "2024-02-01", "total": 50.0, "paid": 0.0},
+    ]).execute()
+    applied = apply_customer_payment(_db(memory, "credits"), "Ana", 120, "2024-03-01", payment_id="pay1")
+    assert applied == 120
+    paid = {r["id"]: r["paid"] for r in memory.table("credits").select("id,paid").execute().data}
+    assert paid == {"c1": 100.0, "c2": 20.0}
+
+def test_payment_without_balance_is_saved_and_applies_zero(connect, memory):
+    # Crédito ya pagado: el abono se guarda igual y no es un error
+    connect(memory).table("credits").insert(
+        {"id": "c1", "customer": "Ana", "date": "2024-01-01", "total": 100.0, "paid": 100.0}).execute()
+    applied = apply_customer_payment(_db(memory, "credits"), "Ana", 5000, "2024-03-01", payment_id="pay1")
+    assert applied == 0.0
+    assert [r["id"] for r in memory.table("credit_payments").select("id").execute().data] == ["pay1"]
+
+def test_failed_payment_returns_none(connect):
+    conn = connect(RejectingBackend())
+    conn.table("supplier_credits").insert(
+        {"id": "d1", "supplier": "Luz", "date": "2024-01-01", "total": 80.0, "paid": 0.0}).execute()
+    assert apply_supplier_payment(_db(conn, "supplier_credits"), "Luz", 30, "2024-03-01") is None
+    assert conn.table("supplier_payments").select("id").execute().data == []
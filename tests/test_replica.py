@@ -0,0 +1,68 @@
+import pytest
+
+import database.loader as loader
+from database.backends import LOCAL_TABLES, BackendError, MemoryBackend
+from database.loader import TOMBSTONE_TABLE
+from database.replica import LocalReplica
+
+class FlakyTombstones(MemoryBackend):
+    """Backend en el que la lectura de lápidas puede fallar (servidor caído)"""
+
+    fail = False
+
+    def execute(self, query):
+        if self.fail and query.table == TOMBSTONE_TABLE:
+            raise BackendError("PGRST000", "sin conexión con la base")
+        return super().execute(query)
+
+@pytest.fixture
+def replica(tmp_path):
+    return LocalReplica(str(tmp_path / "replica.sqlite3"))
+
+@pytest.fixture(autouse=True)
+def no_overlap(monkeypatch):
+    # Sin margen de solapamiento cada pull trae solo lo nuevo
+    monkeypatch.setattr(loader, "SYNC_OVERLAP_SECONDS", 0)
+
+def _seed(conn):
+    conn.table("sales").insert(
+        [{"id": f"s{i}", "date": f"2024-01-0{i + 1}", "quantity": i} for i in range(5)]).execute()
+
+def _quantities(replica):
+    return {r["id"]: r["quantity"] for r in replica.rows("sales")}
+
+def test_delta_pull_applies_changes_and_deletions(replica, memory):
+    _seed(memory)
+    replica.pull(memory)
+    memory.table("sales").update({"quantity": 40}).eq("id", "s4").execute()
+    memory.table("sales").delete().eq("id", "s0").execute()
+    changed, _ = replica.pull(memory)
+    assert "sales" in changed
+    assert _quantities(replica) == {"s1": 1, "s2": 2, "s3": 3, "s4": 40}
+    assert [r["id"] for r in replica.rows("sales")] == ["s4", "s3", "s2", "s1"]
+
+def test_failed_tombstones_keep_the_replica(replica):
+    conn = FlakyTombstones()
+    _seed(conn)
+    replica.pull(conn)
+    marks = replica.marks()
+    conn.table("sales").update({"quantity": 10}).in_("id", ["s1", "s2"]).execute()
+    conn.fail = True
+    with pytest.raises(BackendError):
+        replica.pull(conn)
+    # La copia y sus marcas quedan como estaban, no reducidas a los cambios
+    assert _quantities(replica) == {f"s{i}": i for i in range(5)}
+    assert replica.marks() == marks
+    conn.fail = False
+    replica.pull(conn)
+    assert _quantities(replica) == {"s0": 0, "s1": 10, "s2": 10, "s3": 3, "s4": 4}
+
+def test_without_tombstones_every_pull_is_full(replica, memory, monkeypatch):
+    monkeypatch.delitem(LOCAL_TABLES, TOMBSTONE_TABLE)
+    _seed(memory)
+    replica.pull(memory)
+    # Borrado sin el trigger de lápidas
+    del memory._tables["sales"]["s0"]
+    replica.pull(memory)
+    assert sorted(_quantities(replica)) == ["s1", "s2", "s3", "s4"]
+    assert replica.marks().get("sales") is None
@@ -0,0 +1,53 @@
+from database.search import SearchIndex, build_search_index, fold, search_ids
+from database.snapshot import Snapshot
+
+PRODUCTS = [
+    {"id": "1", "name": "Café Ñandú", "brand": "Aromas", "size_ml": 100},
+    {"id": "2", "name": "Fuego Intenso", "brand": "Élite", "size_ml": 50},
+    {"id": "3", "name": "Agua Fresca", "brand": "Aromas", "size_ml": 100},
+    {"id": "4", "name": "Ambar", "brand": "Casa Fuentes", "size_ml": 30},
+]
+
+def _index(rows=PRODUCTS):
+    return build_search_index("inventory", rows)
+
+def test_fold_removes_accents():
+    assert fold("Café Ñandú") == "cafe nandu"
+
+def test_search_ignores_accents_and_case():
+    assert _index().search("ELITE") == ["2"]
+    assert _index().search("ñandu") == ["1"]
+
+def test_all_terms_must_match():
+    assert _index().search("aromas 100ml fres") == ["3"]
+    assert _index().search("aromas fuego") == []
+
+def test_short_terms_match_inside_words():
+    # Como la búsqueda por subcadena de siempre, no solo al inicio de palabra
+    assert sorted(_index().search("ue")) == ["2", "4"]
+    assert _index().search("ue int") == ["2"]
+
+def test_name_prefix_ranks_first():
+    # "Fuego" empieza por el término; "Casa Fuentes" solo tiene una palabra que empieza
+    assert _index().search("fue") == ["2", "4"]
+
+def test_limit_and_empty_query():
+    assert len(_index().search("a", limit=2)) == 2
+    assert _index().search("") == ["1", "2", "3", "4"]
+
+def test_refresh_reindexes_changed_rows():
+    index = SearchIndex()
+    assert index.refresh(PRODUCTS) == 4
+    rows = [dict(PRODUCTS[0], name="Té Verde"), *PRODUCTS[1:3]]
+    assert index.refresh(rows) == 2
+    assert index.search("verde") == ["1"] and index.search("ambar") == []
+
+def test_one_index_per_snapshot_version():
+    old = Snapshot({"inventory": PRODUCTS}, {}, 1)
+    new_rows = [*PRODUCTS, {"id": "5", "name": "Verano"}]
+    new = Snapshot({"inventory": new_rows}, {}, 2, previous=old)
+    assert search_ids(old, "verano") == [] and search_ids(new, "verano") == ["5"]
+    assert old.search_index("inventory") is old.search_index("inventory")
+    # Tabla sin cambios: la versión siguiente hereda el índice
+    same = Snapshot({"inventory": new_rows}, {}, 3, previous=new)
+    assert same.search_index("inventory") is new.search_index("inventory")
@@ -0,0 +1,40 @@
+import json
+
+import httpx
+from postgrest import SyncPostgrestClient
+
+from database.tracing import TracedClient, begin_trace
+
+ROWS = [{"id": "s1", "quantity": 2}, {"id": "s2", "quantity": 5}]
+
+class FakeSupabase:
+    """Lo que TracedClient usa del cliente de Supabase, sobre un servidor simulado"""
+
+    def __init__(self, body, headers=None):
+        def handler(request):
+            return httpx.Response(200, content=body, headers=headers or {})
+        session = httpx.Client(base_url="http://db.test/rest/v1", transport=httpx.MockTransport(handler))
+        self.postgrest = SyncPostgrestClient("http://db.test/rest/v1", http_client=session)
+
+    def table(self, name):
+        return self.postgrest.from_(name)
+
+    def rpc(self, name, params=None):
+        return self.postgrest.rpc(name, params or {})
+
+def test_bytes_come_from_the_response(memory):
+    body = json.dumps(ROWS).encode()
+    trace = begin_trace()
+    client = TracedClient(FakeSupabase(body, {"content-type": "application/json"}))
+    assert client.table("sales").select("id,quantity").execute().data == ROWS
+    assert client.table("sales").select("id").execute().data == ROWS
+    record = trace.calls[-1]
+    assert (record["table"], record["op"], record["rows"], record["bytes"]) == ("sales", "select", 2, len(body))
+    assert trace.summary()[0]["bytes"] == 2 * len(body)
+
+def test_local_backend_reports_no_bytes(memory):
+    memory.table("sales").insert(ROWS).execute()
+    trace = begin_trace()
+    data = TracedClient(memory).table("sales").select("id").execute().data
+    assert len(data) == 2
+    assert trace.calls[-1]["rows"] == 2 and trace.calls[-1]["bytes"] == 0
@@ -0,0 +1,98 @@
+import pytest
+
+from database.backends import MemoryBackend
+from database.loader import SYNC_COLUMN
+from database.unit_of_work import PartialWriteError, UnitOfWork, _flush_batched
+
+def _state(conn, *tables):
+    """Contenido de las tablas sin updated_at (la compensación lo renueva)"""
+    state = {}
+    for table in tables:
+        rows = conn.table(table).select("*").order("id").execute().data
+        state[table] = [{k: v for k, v in r.items() if k != SYNC_COLUMN} for r in rows]
+    return state
+
+def _seed(conn):
+    conn.table("inventory").insert([
+        {"id": "p1", "name": "Perfume", "stock": 2, "cost": 10.0},
+        {"id": "p2", "name": "Crema", "stock": 7, "cost": 4.0},
+    ]).execute()
+    conn.table("credits").insert({"id": "c1", "customer": "Ana", "total": 100.0, "paid": 20.0}).execute()
+
+# Todas las operaciones y al final una que falla (tabla inexistente)
+OPS = [
+    {"op": "insert", "table": "sales", "rows": [{"id": "s1", "item_id": "p1", "quantity": 5}]},
+    {"op": "update", "table": "inventory", "id": "p1", "data": {"cost": 12.0}},
+    {"op": "adjust_stock", "table": "inventory", "id": "p1", "delta": -5, "floor": 0},
+    {"op": "adjust_stock", "table": "inventory", "id": "p2", "delta": 3, "floor": None},
+    {"op": "update", "table": "credits", "id": "c1", "data": {"paid": 60.0}},
+    {"op": "delete", "table": "credits", "id": "c1"},
+    {"op": "insert", "table": "no_existe", "rows": [{"id": "x"}]},
+]
+
+def test_batched_flush_applies_ops_in_order(memory):
+    _seed(memory)
+    stock = _flush_batched(memory, OPS[:-2], "k1")
+    assert stock == {"p1": 0, "p2": 10}
+    state = _state(memory, "inventory", "credits", "sales")
+    assert state["inventory"][0]["cost"] == 12.0
+    assert state["credits"][0]["paid"] == 60.0
+    assert [s["id"] for s in state["sales"]] == ["s1"]
+
+def test_failed_batch_is_fully_compensated(memory):
+    _seed(memory)
+    before = _state(memory, "inventory", "credits", "sales")
+    with pytest.raises(Exception) as info:
+        _flush_batched(memory, OPS, "k1")
+    assert not isinstance(info.value, PartialWriteError)
+    # Updates, ajustes con y sin piso, borrados e inserts quedan como estaban
+    assert _state(memory, "inventory", "credits", "sales") == before
+
+class UndeletableSales(MemoryBackend):
+    """Backend en el que no se pueden borrar ventas (la compensación del insert falla)"""
+
+    def _remove(self, table, key):
+        if table == "sales":
+            raise RuntimeError("borrado rechazado")
+        super()._remove(table, key)
+
+def test_compensation_failure_is_reported():
+    conn = UndeletableSales()
+    _seed(conn)
+    with pytest.raises(PartialWriteError) as info:
+        _flush_batched(conn, OPS, "k1")
+    error = info.value
+    assert error.failures == ["insert sales: borrado rechazado"]
+    assert "no_existe" in str(error.error)
+    # Lo demás sí se revirtió
+    assert _state(conn, "inventory")["inventory"][0] == {"id": "p1", "name": "Perfume", "stock": 2, "cost": 10.0}
+
+def test_grouped_keeps_the_recorded_order():
+    uow = UnitOfWork()
+    uow.insert("inventory", {"id": "p1", "stock": 0})
+    uow.insert("purchases", {"id": "b1", "item_id": "p1"})
+    uow.adjust_stock("p2", 4)
+    uow.insert("purchases", {"id": "b2", "item_id": "p2"})
+    uow.insert("purchases", {"id": "b3", "item_id": "p2"})
+    uow.update("inventory", {"cost": 9.0}, "p2")
+    uow.insert("supplier_credits", {"id": "d1", "purchase_id": "b3"})
+    grouped = uow._grouped()
+    assert [(op["op"], op["table"]) for op in grouped] == [
+        ("insert", "inventory"),
+        ("insert", "purchases"),
+        ("adjust_stock", "inventory"),
+        ("insert", "purchases"),
+        ("update", "inventory"),
+        ("insert", "supplier_credits"),
+    ]
+    # Solo se juntan los inserts seguidos de la misma tabla
+    assert [r["id"] for r in grouped[3]["rows"]] == ["b2", "b3"]
+
+def test_update_merges_into_a_pending_insert():
+    uow = UnitOfWork()
+    uow.insert("inventory", {"id": "p1", "stock": 0})
+    uow.adjust_stock("p1", 5)
+    uow.update("inventory", {"cost": 3.0}, "p1")
+    assert uow._grouped() == [
+        {"op": "insert", "table": "inventory", "rows": [{"id": "p1", "stock": 5, "cost": 3.0}]}
+    ]
@@ -0,0 +1,141 @@
+import httpx
+import pytest
+
+import database.write_queue as write_queue
+from database.unit_of_work import PartialWriteError, _flush_batched, send_ops
+from database.write_queue import WriteQueue
+
+class Sender:
+    """Envío que anota el orden de las claves y falla con los errores indicados"""
+
+    def __init__(self, errors=None):
+        self.sent = []
+        self.errors = dict(errors or {})
+
+    def __call__(self, conn, ops, key):
+        error = self.errors.get(key)
+        if error is not None:
+            raise error
+        self.sent.append(key)
+        return {}
+
+def _queue(tmp_path, sender):
+    queue = WriteQueue(str(tmp_path / "queue.sqlite3"), sender)
+    # Las pruebas llaman flush_once a mano, sin el hilo de fondo
+    queue.start = lambda: None
+    return queue
+
+def _due_now(queue):
+    with queue._db:
+        queue._db.execute("update pending set next_at = 0")
+
+def test_flush_sends_in_enqueue_order(tmp_path, memory):
+    sender = Sender()
+    queue = _queue(tmp_path, sender)
+    for key in ("a", "b", "c"):
+        queue.enqueue(key, [], [])
+    assert queue.flush_once(memory) == 3
+    assert sender.sent == ["a", "b", "c"]
+    assert not queue.has_pending()
+
+def test_transient_failure_stops_later_batches(tmp_path, memory):
+    sender = Sender({"a": httpx.ConnectError("sin red")})
+    queue = _queue(tmp_path, sender)
+    for key in ("a", "b"):
+        queue.enqueue(key, [], [])
+    assert queue.flush_once(memory) == 0
+    assert sender.sent == []
+    # Vuelve la red: se reenvía todo, en el orden original
+    del sender.errors["a"]
+    _due_now(queue)
+    assert queue.flush_once(memory) == 2
+    assert sender.sent == ["a", "b"]
+
+def test_failed_head_blocks_the_queue(tmp_path, memory, monkeypatch):
+    monkeypatch.setattr(write_queue, "MAX_ATTEMPTS", 1)
+    sender = Sender({"a": ValueError("dato inválido")})
+    queue = _queue(tmp_path, sender)
+    for key in ("a", "b"):
+        queue.enqueue(key, [], [("insert", "sales", [{"id": key}])])
+    queue.flush_once(memory)
+    _due_now(queue)
+    assert queue.flush_once(memory) == 0
+    assert sender.sent == []
+    assert queue.blocked() == ("dato inválido", 1)
+    # Lo encolado después espera detrás del lote detenido
+    assert queue.has_pending()
+    assert [p[2][0]["id"] for p in queue.pending_patches()] == ["a", "b"]
+
+    del sender.errors["a"]
+    queue.retry_now()
+    assert queue.flush_once(memory) == 2
+    assert sender.sent == ["a", "b"]
+    assert queue.blocked() is None
+
+def test_discarding_the_failed_head_releases_the_rest(tmp_path, memory, monkeypatch):
+    monkeypatch.setattr(write_queue, "MAX_ATTEMPTS", 1)
+    sender = Sender({"a": ValueError("dato inválido")})
+    queue = _queue(tmp_path, sender)
+    for key in ("a", "b"):
+        queue.enqueue(key, [], [])
+    queue.flush_once(memory)
+    assert queue.discard_failed() == 1
+    _due_now(queue)
+    assert queue.flush_once(memory) == 1
+    assert sender.sent == ["b"]
+
+def test_partial_write_fails_without_retries(tmp_path, memory):
+    sender = Sender({"a": PartialWriteError(ValueError("x"), ["delete sales: y"])})
+    queue = _queue(tmp_path, sender)
+    queue.enqueue("a", [], [])
+    queue.flush_once(memory)
+    assert queue.stats()["failed"] == 1
+
+def test_replayed_batch_is_applied_once(tmp_path, memory):
+    memory.table("inventory").insert({"id": "p1", "name": "Perfume", "stock": 5}).execute()
+    ops = [
+        {"op": "insert", "table": "sales", "rows": [{"id": "s1", "item_id": "p1", "quantity": 2}]},
+        {"op": "adjust_stock", "table": "inventory", "id": "p1", "delta": -2, "floor": None},
+    ]
+    queue = _queue(tmp_path, send_ops)
+    queue.enqueue("k1", ops, [])
+    # El servidor aplicó el lote pero la respuesta se perdió: se reenvía igual
+    send_ops(memory, ops, "k1")
+    assert queue.flush_once(memory) == 1
+    assert memory.table("inventory").select("stock").eq("id", "p1").execute().data == [{"stock": 3}]
+    assert len(memory.table("sales").select("id").execute().data) == 1
+
+def test_claimed_key_is_not_applied_twice(memory):
+    memory.table("inventory").insert({"id": "p1", "name": "Perfume", "stock": 7}).execute()
+    ops = [{"op": "adjust_stock", "table": "inventory", "id": "p1", "delta": 3, "floor": None}]
+    _flush_batched(memory, ops, "k1")
+    assert _flush_batched(memory, ops, "k1") == {}
+    assert memory.table("inventory").select("stock").eq("id", "p1").execute().data == [{"stock": 10}]
+
+def test_failed_batch_releases_its_key(memory):
+    memory.table("inventory").insert({"id": "p1", "name": "Perfume", "stock": 7}).execute()
+    ops = [
+        {"op": "adjust_stock", "table": "inventory", "id": "p1", "delta": 3, "floor": None},
+        {"op": "insert", "table": "no_existe", "rows": [{"id": "x"}]},
+    ]
+    with pytest.raises(Exception):
+        _flush_batched(memory, ops, "k1")
+    # El reintento (sin la operación que fallaba) se aplica completo
+    assert _flush_batched(memory, ops[:1], "k1") == {"p1": 10}
+    assert memory.table("applied_batches").select("key").execute().data == [{"key": "k1"}]
+
+def test_enqueue_ignores_a_repeated_key(tmp_path, memory):
+    sender = Sender()
+    queue = _queue(tmp_path, sender)
+    queue.enqueue("a", [], [])
+    queue.enqueue("a", [], [])
+    assert queue.flush_once(memory) == 1
+
+@pytest.mark.parametrize("error", [httpx.ConnectError("sin red"), ValueError("dato inválido")])
+def test_failure_schedules_a_retry(tmp_path, memory, error):
+    queue = _queue(tmp_path, Sender({"a": error}))
+    queue.enqueue("a", [], [])
+    queue.flush_once(memory)
+    stats = queue.stats()
+    assert stats["pending"] == 1 and stats["failed"] == 0
+    assert stats["last_error"] == str(error)
@@ -1,6 +1,7 @@
 # utils/__init__.py
 from .helpers import (
     uid, 
+    receipt_number,
     cop, 
     today_iso, 
     credit_saldo, 
@@ -19,7 +20,7 @@ from .pdf import (
 )
 
 __all__ = [
-    'uid', 'cop', 'today_iso', 
+    'uid', 'receipt_number', 'cop', 'today_iso', 
     'credit_saldo', 'supplier_credit_saldo',
     'apply_customer_payment', 'apply_supplier_payment',
     'cash_bank_balances', '_movements_ledger',
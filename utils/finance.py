@@ -1,95 +1,214 @@
+import threading
+from collections import OrderedDict
 import streamlit as st
+import numpy as np
 import pandas as pd
 from datetime import date
+from database import RECORD_CLASSES, table_frame, table_records, date_index
 from utils import cop
 
 # =============== LÓGICA INTERNA ===============
 
-def _movements_ledger(db):
-    """Construye el libro de movimientos de caja/banco"""
-    movs = []
-    
-    # Ventas
-    for s in db.get("sales", []):
-        amt = float(s.get("quantity", 0) or 0) * float(s.get("unit_price", 0) or 0)
-        meth = (s.get("payment") or "").strip().title()
-        if meth in ("Efectivo", "Transferencia", "Tarjeta"):
-            movs.append({
-                "fecha": s.get("date", ""),
-                "tipo": "Entrada",
-                "medio": "Caja" if meth == "Efectivo" else "Banco",
-                "concepto": f"Venta — {meth}",
-                "detalle": s.get("customer", "") or "",
-                "monto": amt
-            })
-    
-    # Abonos clientes
-    for p in db.get("credit_payments", []):
-        amt = float(p.get("amount", 0) or 0)
-        meth = (p.get("method") or "").strip().title()
-        medio = "Caja" if meth == "Efectivo" else "Banco"
-        movs.append({
-            "fecha": p.get("date", ""),
+# Tablas que mueven Caja/Banco, en el orden en que se arma el libro
+MOVEMENT_TABLES = ("sales", "credit_payments", "purchases", "supplier_payments")
+
+# Libro completo y saldos de las últimas versiones del snapshot, compartidos
+# por todas las sesiones y pestañas que las leen (ver _memoized)
+MEMO_VERSIONS = 4
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+def _memoized(db, name, build):
+    """
+    `build(db)` una sola vez por versión del snapshot. Se guardan las
+    MEMO_VERSIONS versiones usadas más recientemente: sesiones que leen
+    versiones distintas no se desalojan entre sí. Con un dict simple (sin
+    versión) se calcula siempre. El resultado es de solo lectura.
+    """
+    for table in MOVEMENT_TABLES:
+        # Cargar antes de leer la versión: cargar una tabla publica otra
+        db[table]
+    version = getattr(db, "version", None)
+    if version is None:
+        return build(db)
+    with _memo_lock:
+        entry = _memo.get(version)
+        if entry is not None and name in entry:
+            _memo.move_to_end(version)
+            return entry[name]
+    result = build(db)
+    with _memo_lock:
+        _memo.setdefault(version, {})[name] = result
+        _memo.move_to_end(version)
+        while len(_memo) > MEMO_VERSIONS:
+            _memo.popitem(last=False)
+    return result
+
+def _purchase_units(quantity):
+    """
+    Unidades que cobra una compra: la cantidad truncada a entero, y 1 si da 0
+    o es nula (un gasto se guarda con cantidad 1). La misma regla siguen
+    _frame_movements y sql/cash_balances.sql / sql/header_metrics.sql.
+    """
+    return int(quantity or 0) or 1
+
+def _row_movement(table, r):
+    """Movimiento de caja/banco de un registro (database.models) o None si no mueve dinero"""
+    if table == "sales":
+        # Ventas
+        meth = r.payment.strip().title()
+        if meth not in ("Efectivo", "Transferencia", "Tarjeta"):
+            return None
+        return {
+            "fecha": r.date,
             "tipo": "Entrada",
-            "medio": medio,
+            "medio": "Caja" if meth == "Efectivo" else "Banco",
+            "concepto": f"Venta — {meth}",
+            "detalle": r.customer,
+            "monto": r.total
+        }
+
+    if table == "credit_payments":
+        # Abonos clientes
+        meth = r.method.strip().title()
+        return {
+            "fecha": r.date,
+            "tipo": "Entrada",
+            "medio": "Caja" if meth == "Efectivo" else "Banco",
             "concepto": f"Abono cliente — {meth}",
-            "detalle": p.get("customer", ""),
-            "monto": amt
-        })
-    
-    # Compras al contado
-    for pu in db.get("purchases", []):
-        meth = (pu.get("cash_method") or "").strip().title()
-        if meth:
-            q = int(pu.get("quantity", 1) or 1)
-            uc = float(pu.get("unit_cost", 0) or 0)
-            amt = q * uc
-            medio = "Caja" if meth == "Efectivo" else "Banco"
-            concepto = "Compra inventario" if pu.get("item_id") else "Gasto operativo"
-            movs.append({
-                "fecha": pu.get("date", ""),
-                "tipo": "Salida",
-                "medio": medio,
-                "concepto": f"{concepto} — {meth}",
-                "detalle": pu.get("supplier", "") or "",
-                "monto": amt
-            })
-    
-    # Pagos a proveedores
-    for sp in db.get("supplier_payments", []):
-        amt = float(sp.get("amount", 0) or 0)
-        meth = (sp.get("method") or "").strip().title()
-        medio = "Caja" if meth == "Efectivo" else "Banco"
-        movs.append({
-            "fecha": sp.get("date", ""),
+            "detalle": r.customer,
+            "monto": r.amount
+        }
+
+    if table == "purchases":
+        # Compras al contado
+        meth = r.cash_method.strip().title()
+        if not meth:
+            return None
+        concepto = "Compra inventario" if r.item_id else "Gasto operativo"
+        return {
+            "fecha": r.date,
             "tipo": "Salida",
-            "medio": medio,
+            "medio": "Caja" if meth == "Efectivo" else "Banco",
+            "concepto": f"{concepto} — {meth}",
+            "detalle": r.supplier,
+            "monto": _purchase_units(r.quantity) * r.unit_cost
+        }
+
+    if table == "supplier_payments":
+        # Pagos a proveedores
+        meth = r.method.strip().title()
+        return {
+            "fecha": r.date,
+            "tipo": "Salida",
+            "medio": "Caja" if meth == "Efectivo" else "Banco",
             "concepto": f"Pago a proveedor — {meth}",
-            "detalle": sp.get("supplier", "") or "",
-            "monto": amt
-        })
-    
-    def _key(m):
-        try:
-            return m["fecha"]
-        except Exception:
-            return ""
+            "detalle": r.supplier,
+            "monto": r.amount
+        }
+    return None
+
+def cash_delta(table, row):
+    """
+    Efecto de una fila (dict) sobre los saldos: (medio, día, monto con signo), o None.
+    Es la regla que mantiene la tabla cash_balances (sql/cash_balances.sql).
+    """
+    m = _row_movement(table, RECORD_CLASSES[table](row))
+    if m is None:
+        return None
+    sign = 1 if m["tipo"] == "Entrada" else -1
+    return m["medio"], m["fecha"][:10], sign * m["monto"]
+
+def _movements_ledger(db, start=None, end=None):
+    """
+    Libro de movimientos de caja/banco, del más reciente al más antiguo.
+
+    El libro completo se arma una vez por versión del snapshot (no
+    modificarlo). Con [start, end] se arman solo los movimientos del período,
+    con el índice por fecha, sin recorrer las tablas.
+    """
+    if start is None and end is None:
+        return _memoized(db, "ledger", _build_ledger)
+    return _build_ledger(db, start, end)
+
+def _build_ledger(db, start=None, end=None):
+    movs = []
+    for table in MOVEMENT_TABLES:
+        records = table_records(db, table)
+        if start is not None or end is not None:
+            records = [records[i] for i in date_index(db, table).between(start, end)]
+        for r in records:
+            m = _row_movement(table, r)
+            if m is not None:
+                movs.append(m)
     
-    movs.sort(key=_key, reverse=True)
+    movs.sort(key=lambda m: m["fecha"], reverse=True)
     return movs
 
+def _method(series):
+    """Medio de pago normalizado como en _row_movement (strip + title)"""
+    return series.astype(str).str.strip().str.title()
+
+def _frame_movements(table, df):
+    """
+    Versión vectorizada de _row_movement sobre el frame tipado de la tabla.
+
+    Returns:
+        tuple: (medio de cada movimiento, monto con signo), como arrays
+    """
+    if table == "sales":
+        meth = _method(df["payment"])
+        keep = meth.isin(["Efectivo", "Transferencia", "Tarjeta"]).to_numpy()
+        amount = (df["quantity"] * df["unit_price"]).to_numpy()
+    elif table == "purchases":
+        meth = _method(df["cash_method"])
+        keep = (meth != "").to_numpy()
+        # _purchase_units: trunca y usa 1 si da 0 (nulo ya es 0 en el frame)
+        quantity = np.trunc(df["quantity"].to_numpy())
+        amount = -np.where(quantity == 0, 1, quantity) * df["unit_cost"].to_numpy()
+    else:
+        meth = _method(df["method"])
+        keep = np.ones(len(df), dtype=bool)
+        sign = 1 if table == "credit_payments" else -1
+        amount = sign * df["amount"].to_numpy()
+    medio = np.where((meth == "Efectivo").to_numpy(), "Caja", "Banco")
+    return medio[keep], amount[keep]
+
 def cash_bank_balances(db):
-    """Calcula saldos netos de Caja y Banco"""
+    """Saldos netos (caja, banco), calculados una vez por versión del snapshot"""
+    return _memoized(db, "balances", _build_balances)
+
+def _build_balances(db):
+    """Saldos netos de Caja y Banco (vectorizado sobre las tablas en columnas)"""
     caja = 0.0
     banco = 0.0
-    for m in _movements_ledger(db):
-        sign = 1 if m["tipo"] == "Entrada" else -1
-        if m["medio"] == "Caja":
-            caja += sign * float(m["monto"] or 0)
-        else:
-            banco += sign * float(m["monto"] or 0)
+    for table in MOVEMENT_TABLES:
+        medio, amount = _frame_movements(table, table_frame(db, table))
+        caja += float(amount[medio == "Caja"].sum())
+        banco += float(amount[medio == "Banco"].sum())
     return caja, banco
 
+def _medio_totals(db):
+    """
+    Entradas y salidas de todo el libro por medio, una vez por versión del snapshot.
+
+    Returns:
+        tuple: ({(medio, tipo): monto}, cantidad de movimientos)
+    """
+    return _memoized(db, "totals", _build_medio_totals)
+
+def _build_medio_totals(db):
+    totals = {(medio, tipo): 0.0 for medio in ("Caja", "Banco") for tipo in ("Entrada", "Salida")}
+    count = 0
+    for table in MOVEMENT_TABLES:
+        medio, amount = _frame_movements(table, table_frame(db, table))
+        tipo = "Entrada" if table in ("sales", "credit_payments") else "Salida"
+        sign = 1 if tipo == "Entrada" else -1
+        for m in ("Caja", "Banco"):
+            totals[(m, tipo)] += sign * float(amount[medio == m].sum())
+        count += len(medio)
+    return totals, count
+
 # =============== VISUALIZACIÓN (STREAMLIT) ===============
 
 def render_cash_and_bank(db):
@@ -162,9 +281,9 @@ def render_cash_and_bank(db):
     # Libro diario de movimientos
     st.markdown("### Libro Diario de Movimientos")
     
-    ledger = _movements_ledger(db)
+    totales, num_movimientos = _medio_totals(db)
     
-    if ledger:
+    if num_movimientos:
         # Filtros de fecha
         col_filter1, col_filter2 = st.columns(2)
         
@@ -182,11 +301,8 @@ def render_cash_and_bank(db):
                 key="fecha_hasta_finance"
             )
         
-        # Filtrar por fechas
-        ledger_filtrado = [
-            m for m in ledger 
-            if fecha_desde.isoformat() <= m["fecha"] <= fecha_hasta.isoformat()
-        ]
+        # Filtrar por fechas (índice por fecha: solo se leen las filas del período)
+        ledger_filtrado = _movements_ledger(db, fecha_desde, fecha_hasta)
         
         if ledger_filtrado:
             # Preparar datos para visualización
@@ -242,12 +358,12 @@ def render_cash_and_bank(db):
     # Desglose por medio de pago
     st.markdown("### Desglose por Medio de Pago")
     
-    if ledger:
-        # Calcular totales por medio
-        caja_entradas = sum(m["monto"] for m in ledger if m["medio"] == "Caja" and m["tipo"] == "Entrada")
-        caja_salidas = sum(m["monto"] for m in ledger if m["medio"] == "Caja" and m["tipo"] == "Salida")
-        banco_entradas = sum(m["monto"] for m in ledger if m["medio"] == "Banco" and m["tipo"] == "Entrada")
-        banco_salidas = sum(m["monto"] for m in ledger if m["medio"] == "Banco" and m["tipo"] == "Salida")
+    if num_movimientos:
+        # Totales por medio
+        caja_entradas = totales[("Caja", "Entrada")]
+        caja_salidas = totales[("Caja", "Salida")]
+        banco_entradas = totales[("Banco", "Entrada")]
+        banco_salidas = totales[("Banco", "Salida")]
         
         col_desg1, col_desg2 = st.columns(2)
         
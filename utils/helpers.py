@@ -1,10 +1,58 @@
-from datetime import date, datetime
+import os
+import secrets
+import threading
+import time
+from datetime import date
 
 # =============== FUNCIONES BÁSICAS ===============
 
+# Ids: microsegundos desde epoch en 16 dígitos (el formato de siempre) más 10
+# dígitos de nodo por proceso: 3 del pid y 7 al azar. El pid solo no basta
+# (en contenedores suele ser 1 en todos los servidores): la parte al azar
+# separa procesos de máquinas distintas. Ordenan como texto igual que en el
+# tiempo, y los anteriores (16 dígitos) quedan antes de los nuevos del mismo
+# microsegundo.
+_UID_DIGITS = 16
+_uid_lock = threading.Lock()
+_uid_last = 0
+
+def _uid_node():
+    return f"{os.getpid() % 1000:03d}{secrets.randbelow(10 ** 7):07d}"
+
+_UID_NODE = _uid_node()
+
+def _reset_uid_node():
+    # Un proceso hijo (fork) no debe heredar el nodo del padre
+    global _UID_NODE
+    _UID_NODE = _uid_node()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_uid_node)
+
 def uid() -> str:
-    """Genera ID único basado en timestamp"""
-    return f"{datetime.utcnow().timestamp():.6f}".replace(".", "")
+    """
+    Genera ID único y creciente, ordenable por fecha de creación.
+
+    Dentro del proceso nunca se repite ni retrocede: si dos llamadas caen en
+    el mismo microsegundo (ej. venta y crédito del mismo envío) o el reloj se
+    atrasa, se toma el microsegundo siguiente al último entregado. El sufijo
+    de nodo separa los ids de procesos distintos, en la misma máquina o en
+    otras.
+    """
+    global _uid_last
+    with _uid_lock:
+        _uid_last = max(time.time_ns() // 1000, _uid_last + 1)
+        return f"{_uid_last:0{_UID_DIGITS}d}{_UID_NODE}"
+
+def receipt_number(prefix: str, payment_id: str) -> str:
+    """
+    Número de recibo de un abono o pago, derivado de su id: 8 dígitos del
+    tiempo (sin el sufijo de nodo). El recibo nuevo y la reimpresión dan el mismo.
+    """
+    payment_id = str(payment_id)
+    if payment_id.isdigit() and len(payment_id) > _UID_DIGITS:
+        return prefix + payment_id[_UID_DIGITS - 8:_UID_DIGITS]
+    return prefix + payment_id[-8:]
 
 def cop(n: float) -> str:
     """Formatea números como moneda COP con separador de miles (punto)"""
@@ -22,16 +70,17 @@ def today_iso() -> str:
 
 def credit_saldo(c):
     """Calcula el saldo pendiente de un crédito de cliente"""
-    return float(c.get("total", 0)) - float(c.get("paid", 0))
+    return float(c.get("total") or 0) - float(c.get("paid") or 0)
 
 def supplier_credit_saldo(c):
     """Calcula el saldo pendiente de una deuda con proveedor"""
-    return float(c.get("total", 0)) - float(c.get("paid", 0))
+    return float(c.get("total") or 0) - float(c.get("paid") or 0)
 
 # =============== GESTIÓN DE PAGOS (CLIENTES) ===============
 
 def apply_customer_payment(db, customer: str, amount: float, when: str, notes: str = "", method: str = "",
-                           balance_before: float = 0.0, balance_after: float = 0.0, breakdown: list = None):
+                           balance_before: float = 0.0, balance_after: float = 0.0, breakdown: list = None,
+                           payment_id: str = None):
     """
     Aplica un pago de cliente a sus créditos pendientes (método FIFO)
     
@@ -45,20 +94,21 @@ def apply_customer_payment(db, customer: str, amount: float, when: str, notes: s
         balance_before: Saldo antes del pago (opcional, para recibo)
         balance_after: Saldo después del pago (opcional, para recibo)
         breakdown: Desglose de aplicación (opcional, para recibo)
+        payment_id: Id del abono (opcional, por defecto uid()), del que sale el número de recibo
     
     Returns:
-        float: Monto aplicado exitosamente
+        float: Monto aplicado a créditos (0.0 si no había saldo pendiente),
+        o None si no se pudo guardar el abono
     """
-    from database import insert_record, update_record
+    from database import UnitOfWork, open_party_credits
     
     if amount <= 0:
         return 0.0
     
-    # Obtener créditos pendientes del cliente
-    open_credits = [c for c in db["credits"]
-                    if (c.get("customer","").strip().lower() == customer.strip().lower()) 
-                    and credit_saldo(c) > 0]
-    open_credits.sort(key=lambda c: c.get("date",""))
+    uow = UnitOfWork()
+    
+    # Créditos pendientes del cliente, del más antiguo al más reciente
+    open_credits = open_party_credits(db, "credits", customer)
     
     # Aplicar pago (FIFO)
     remaining = float(amount)
@@ -69,26 +119,32 @@ def apply_customer_payment(db, customer: str, amount: float, when: str, notes: s
         if s <= 0:
             continue
         pay = min(s, remaining)
-        c["paid"] = float(c.get("paid", 0)) + pay
-        update_record("credits", {"paid": c["paid"]}, c["id"])
+        # Las filas son del snapshot compartido: no se tocan, el nuevo valor
+        # se publica con el parche de la escritura confirmada
+        uow.update("credits", {"paid": float(c.get("paid") or 0) + pay}, c["id"])
         remaining -= pay
     
-    # Registrar el pago en Supabase
+    # Registrar el pago
     payment_data = {
-        "id": uid(), 
+        "id": payment_id or uid(), 
         "customer": customer, 
         "date": when, 
         "amount": float(amount),
         "notes": notes, 
         "method": method
     }
-    insert_record("credit_payments", payment_data)
+    uow.insert("credit_payments", payment_data)
+    
+    # Abono y créditos afectados se guardan juntos
+    if not uow.flush():
+        return None
     
     return float(amount) - remaining
 
 # =============== GESTIÓN DE PAGOS (PROVEEDORES) ===============
 
-def apply_supplier_payment(db, supplier: str, amount: float, when: str, notes: str = "", method: str = ""):
+def apply_supplier_payment(db, supplier: str, amount: float, when: str, notes: str = "", method: str = "",
+                           payment_id: str = None):
     """
     Aplica un pago a proveedor a sus créditos pendientes (método FIFO)
     
@@ -99,20 +155,21 @@ def apply_supplier_payment(db, supplier: str, amount: float, when: str, notes: s
         when: Fecha del pago (ISO format)
         notes: Notas adicionales
         method: Método de pago (Efectivo, Transferencia, Tarjeta)
+        payment_id: Id del pago (opcional, por defecto uid()), del que sale el número de recibo
     
     Returns:
-        float: Monto aplicado exitosamente
+        float: Monto aplicado a créditos (0.0 si no había saldo pendiente),
+        o None si no se pudo guardar el pago
     """
-    from database import insert_record, update_record
+    from database import UnitOfWork, open_party_credits
     
     if amount <= 0:
         return 0.0
     
-    # Obtener créditos pendientes con el proveedor
-    open_credits = [c for c in db.get("supplier_credits", [])
-                    if (c.get("supplier","").strip().lower() == supplier.strip().lower()) 
-                    and supplier_credit_saldo(c) > 0]
-    open_credits.sort(key=lambda c: c.get("date",""))
+    uow = UnitOfWork()
+    
+    # Créditos pendientes con el proveedor, del más antiguo al más reciente
+    open_credits = open_party_credits(db, "supplier_credits", supplier)
     
     # Aplicar pago (FIFO)
     remaining = float(amount)
@@ -123,20 +180,25 @@ def apply_supplier_payment(db, supplier: str, amount: float, when: str, notes: s
         if s <= 0:
             continue
         pay = min(s, remaining)
-        c["paid"] = float(c.get("paid", 0)) + pay
-        update_record("supplier_credits", {"paid": c["paid"]}, c["id"])
+        # Las filas son del snapshot compartido: no se tocan, el nuevo valor
+        # se publica con el parche de la escritura confirmada
+        uow.update("supplier_credits", {"paid": float(c.get("paid") or 0) + pay}, c["id"])
         remaining -= pay
     
-    # Registrar el pago en Supabase
+    # Registrar el pago
     payment_data = {
-        "id": uid(), 
+        "id": payment_id or uid(), 
         "supplier": supplier, 
         "date": when, 
         "amount": float(amount),
         "notes": notes, 
         "method": method
     }
-    insert_record("supplier_payments", payment_data)
+    uow.insert("supplier_payments", payment_data)
+    
+    # Abono y créditos afectados se guardan juntos
+    if not uow.flush():
+        return None
     
     return float(amount) - remaining
 
@@ -170,7 +232,7 @@ def build_receipt_pdf(db, who_type: str, who_name: str, receipt_id: str, date_st
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib.enums import TA_CENTER, TA_RIGHT
     from io import BytesIO
-    import base64
+    from database import logo_bytes
     
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
@@ -188,10 +250,9 @@ def build_receipt_pdf(db, who_type: str, who_name: str, receipt_id: str, date_st
     )
     
     # Logo (si existe)
-    logo_b64 = db["settings"].get("logo_b64")
-    if logo_b64:
+    logo_data = logo_bytes(db)
+    if logo_data:
         try:
-            logo_data = base64.b64decode(logo_b64)
             logo_buffer = BytesIO(logo_data)
             img = Image(logo_buffer, width=1.5*inch, height=1.5*inch)
             img.hAlign = 'CENTER'
@@ -1,18 +1,26 @@
 from fpdf import FPDF
-import base64
 import os
+import tempfile
+from database import logo_bytes, logo_hash, party_rows
 from utils import cop
 
 def _get_logo_temp_path(db):
-    """Obtiene el logo desde settings y lo guarda temporalmente"""
+    """
+    Archivo con el logo para FPDF (que solo acepta rutas).
+
+    El nombre lleva el hash del contenido: se escribe una vez por logo y lo
+    comparten los recibos de todas las sesiones, sin pisarse entre ellas.
+    """
     try:
-        b64 = db["settings"].get("logo_b64")
-        if not b64:
+        raw = logo_bytes(db)
+        if not raw:
             return None
-        raw = base64.b64decode(b64)
-        temp_path = "magnus_logo_tmp.png"
-        with open(temp_path, "wb") as f:
-            f.write(raw)
+        # FPDF decide el formato por la extensión
+        ext = "jpg" if raw[:2] == b"\xff\xd8" else "png"
+        temp_path = os.path.join(tempfile.gettempdir(), f"magnus_logo_{logo_hash(raw)[:16]}.{ext}")
+        if not os.path.exists(temp_path):
+            with open(temp_path, "wb") as f:
+                f.write(raw)
         return temp_path
     except Exception:
         return None
@@ -88,22 +96,13 @@ def build_receipt_pdf(db, *, who_type: str, who_name: str, receipt_id: str,
         # --- RECOGER TODOS LOS PAGOS ---
         payment_history = []
 
-        if who_type == "CLIENTE":
-            for p in db.get("credit_payments", []):
-                if p.get("customer", "").strip().lower() == who_name.strip().lower():
-                    payment_history.append({
-                        "id": p.get("id", ""),
-                        "date": p.get("date", ""),
-                        "amount": float(p.get("amount", 0))
-                    })
-        else:
-            for p in db.get("supplier_payments", []):
-                if p.get("supplier", "").strip().lower() == who_name.strip().lower():
-                    payment_history.append({
-                        "id": p.get("id", ""),
-                        "date": p.get("date", ""),
-                        "amount": float(p.get("amount", 0))
-                    })
+        payments_table = "credit_payments" if who_type == "CLIENTE" else "supplier_payments"
+        for p in party_rows(db, payments_table, who_name):
+            payment_history.append({
+                "id": p.get("id", ""),
+                "date": p.get("date", ""),
+                "amount": float(p.get("amount", 0))
+            })
 
         # ordenar por fecha ASC
         payment_history.sort(key=lambda x: x["date"])
@@ -130,12 +129,4 @@ def build_receipt_pdf(db, *, who_type: str, who_name: str, receipt_id: str,
     pdf.set_font("Helvetica", "I", 9)
     pdf.multi_cell(0, 5, "Este recibo ha sido generado automáticamente por el sistema de gestión de Magnus Parfum.")
 
-    pdf_bytes = pdf.output(dest='S').encode('latin-1')
-
-    try:
-        if logo_path and os.path.exists(logo_path):
-            os.remove(logo_path)
-    except Exception:
-        pass
-
-    return pdf_bytes
+    return pdf.output(dest='S').encode('latin-1')